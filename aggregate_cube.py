@@ -0,0 +1,201 @@
+import pandas as pd
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Optional
+import os
+from schema import fill_category
+
+# Cubes already built in this process, keyed by dataset version, least recently used first.
+# Filtered map variants and applied changes each make a new version, so only a few are kept.
+CUBE_CACHE_SIZE = 8
+_CUBE_CACHE: 'OrderedDict[str, PlanningAreaAggregateCube]' = OrderedDict()
+
+def _remember_cube(version: str, cube: 'PlanningAreaAggregateCube'):
+    _CUBE_CACHE[version] = cube
+    _CUBE_CACHE.move_to_end(version)
+    while len(_CUBE_CACHE) > CUBE_CACHE_SIZE:
+        _CUBE_CACHE.popitem(last=False)
+
+class PlanningAreaAggregateCube:
+    """
+    Materialized planning_area x category aggregate table.
+
+    Every measure is stored as an additive sum or count so the cube can be
+    updated incrementally when rows are added or removed, and averages are
+    derived from the sums only when a report asks for them.
+    """
+    KEYS = ['planning_area', 'category']
+    MEASURES = [
+        'location_count', 'rating_sum', 'rating_count', 'review_total',
+        'income_sum', 'income_count', 'households_sum',
+        'website_count', 'phone_count', 'rated_count'
+    ]
+
+    SOURCE_COLUMNS = [
+        'planning_area', 'category', 'rating', 'user_ratings_total',
+        'weighted_average_income', 'total_households', 'has_website', 'has_phone', 'has_rating'
+    ]
+
+    def __init__(self, table: Optional[pd.DataFrame] = None, version: Optional[str] = None):
+        if table is None:
+            table = pd.DataFrame(columns=self.KEYS + self.MEASURES)
+        self.table = table
+        self.version = version
+
+    @classmethod
+    def dataset_version(cls, df: pd.DataFrame) -> str:
+        """
+        Return a version string for a dataset by hashing the columns the cube reads
+        """
+        if df.empty:
+            return 'empty'
+        columns = [c for c in cls.SOURCE_COLUMNS if c in df.columns]
+        row_hashes = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+        return f"{len(df)}-{int(row_hashes.sum(dtype=np.uint64)):016x}"
+
+    @classmethod
+    def aggregate_rows(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Aggregate location rows into planning_area x category partial sums
+        """
+        if df.empty:
+            return pd.DataFrame(columns=cls.KEYS + cls.MEASURES)
+
+        n = len(df)
+
+        def numeric(column):
+            if column in df.columns:
+                values = pd.to_numeric(df[column], errors='coerce')
+                if values.dtype == np.float32:
+                    # Compact float32 ratings carry one decimal; round off the error from widening them
+                    return np.round(values.to_numpy(dtype=float), 6)
+                return values.to_numpy(dtype=float)
+            return np.full(n, np.nan)
+
+        def flag(column):
+            if column in df.columns:
+                return df[column].fillna(False).astype(bool).to_numpy(dtype=np.int64)
+            return np.zeros(n, dtype=np.int64)
+
+        rating = numeric('rating')
+        reviews = numeric('user_ratings_total')
+        income = numeric('weighted_average_income')
+        households = numeric('total_households')
+
+        # Categorical keys are grouped on their integer codes
+        keys = pd.DataFrame({
+            'planning_area': fill_category(df['planning_area'], 'Unknown').array if 'planning_area' in df.columns else np.full(n, 'Unknown'),
+            'category': fill_category(df['category'], 'Others').array,
+        })
+        parts = keys.assign(
+            location_count=1,
+            rating_sum=np.nan_to_num(rating),
+            rating_count=(~np.isnan(rating)).astype(np.int64),
+            review_total=np.nan_to_num(reviews).astype(np.int64),
+            income_sum=np.nan_to_num(income),
+            income_count=(~np.isnan(income)).astype(np.int64),
+            households_sum=np.nan_to_num(households),
+            website_count=flag('has_website'),
+            phone_count=flag('has_phone'),
+            rated_count=flag('has_rating'),
+        )
+
+        table = parts.groupby(cls.KEYS, sort=False, observed=True, as_index=False)[cls.MEASURES].sum()
+        return table.astype({key: object for key in cls.KEYS})
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, version: Optional[str] = None) -> 'PlanningAreaAggregateCube':
+        """
+        Build a cube from scratch for a full dataset
+        """
+        if version is None:
+            version = cls.dataset_version(df)
+        return cls(cls.aggregate_rows(df), version)
+
+    def apply_changes(self, added: Optional[pd.DataFrame] = None, removed: Optional[pd.DataFrame] = None,
+                      version: Optional[str] = None) -> 'PlanningAreaAggregateCube':
+        """
+        Incrementally update the cube with added and/or removed rows
+
+        Only the changed rows are aggregated; their partial sums are added to
+        or subtracted from the existing cells.
+        """
+        frames = [self.table]
+        if added is not None and not added.empty:
+            frames.append(self.aggregate_rows(added))
+        if removed is not None and not removed.empty:
+            removed_parts = self.aggregate_rows(removed)
+            removed_parts[self.MEASURES] = -removed_parts[self.MEASURES]
+            frames.append(removed_parts)
+
+        if len(frames) > 1:
+            combined = pd.concat([f for f in frames if not f.empty], ignore_index=True)
+            table = combined.groupby(self.KEYS, sort=False, as_index=False)[self.MEASURES].sum()
+            self.table = table[table['location_count'] > 0].reset_index(drop=True)
+
+        if _CUBE_CACHE.get(self.version) is self:
+            del _CUBE_CACHE[self.version]
+        self.version = version
+        if version is not None:
+            _remember_cube(version, self)
+        return self
+
+    def category_totals(self) -> pd.DataFrame:
+        """
+        Roll the cube up to one row per category, sorted by location count
+        """
+        return self._rollup('category')
+
+    def area_totals(self) -> pd.DataFrame:
+        """
+        Roll the cube up to one row per planning area, sorted by location count
+        """
+        return self._rollup('planning_area')
+
+    def _rollup(self, key: str) -> pd.DataFrame:
+        totals = self.table.groupby(key, sort=False)[self.MEASURES].sum()
+        totals['avg_rating'] = totals['rating_sum'] / totals['rating_count'].replace(0, np.nan)
+        totals['avg_income'] = totals['income_sum'] / totals['income_count'].replace(0, np.nan)
+        return totals.sort_values('location_count', ascending=False, kind='stable')
+
+    def overall(self) -> Dict[str, float]:
+        """
+        Return dataset-wide totals derived from the cube
+        """
+        sums = self.table[self.MEASURES].sum()
+        return {
+            'total_locations': int(sums['location_count']),
+            'average_rating': sums['rating_sum'] / sums['rating_count'] if sums['rating_count'] else np.nan,
+            'average_income': sums['income_sum'] / sums['income_count'] if sums['income_count'] else np.nan,
+            'locations_with_websites': int(sums['website_count']),
+            'locations_with_phones': int(sums['phone_count']),
+            'locations_with_ratings': int(sums['rated_count']),
+        }
+
+    def save(self, filepath: str):
+        """
+        Save the cube to CSV with its dataset version
+        """
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        self.table.assign(dataset_version=self.version).to_csv(filepath, index=False)
+        print(f"Saved aggregate cube with {len(self.table)} cells to {filepath}")
+
+    @classmethod
+    def load(cls, filepath: str) -> 'PlanningAreaAggregateCube':
+        """
+        Load a cube previously written by `save`
+        """
+        table = pd.read_csv(filepath)
+        version = str(table['dataset_version'].iloc[0]) if not table.empty else None
+        return cls(table.drop(columns=['dataset_version']), version)
+
+def get_aggregate_cube(df: pd.DataFrame) -> PlanningAreaAggregateCube:
+    """
+    Return the cube for a dataset, building it only once per dataset version
+    """
+    version = PlanningAreaAggregateCube.dataset_version(df)
+    cube = _CUBE_CACHE.get(version)
+    if cube is None:
+        cube = PlanningAreaAggregateCube.build(df, version)
+    _remember_cube(version, cube)
+    return cube
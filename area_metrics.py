@@ -0,0 +1,185 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+from aggregate_cube import get_aggregate_cube
+from area_registry import PLANNING_AREA_REGISTRY
+from geo_projection import project_coordinates
+from schema import load_locations
+from config import COMBINED_DATA_OUTPUT, PLANNING_AREAS_OUTPUT, INCOME_DATA_OUTPUT
+
+METRICS_OUTPUT = "data/planning_area_metrics.csv"
+
+class PlanningAreaMetrics:
+    def __init__(self, default_year: str = "2020"):
+        # Year label used when the income table has no 'year' column
+        self.default_year = default_year
+
+    def polygon_areas_km2(self, planning_areas_df: pd.DataFrame) -> pd.Series:
+        """
+        Calculate the area of every planning area polygon in km²
+
+        All rings are concatenated into one array and the shoelace sums are
+        reduced per polygon with np.add.reduceat, so there is no per-area loop
+        over coordinates.
+        """
+        names = PLANNING_AREA_REGISTRY.canonical(planning_areas_df['planning_area_name'])
+        rings = [json.loads(c) if isinstance(c, str) and c else [] for c in planning_areas_df['polygon_coordinates']]
+        lengths = np.array([len(r) for r in rings])
+
+        areas = np.zeros(len(rings))
+        valid = lengths >= 3
+        if not valid.any():
+            return pd.Series(areas, index=names)
+
+        # Coordinates are stored GeoJSON-style as [lng, lat]
+        coords = np.concatenate([np.asarray(r, dtype=float) for r, ok in zip(rings, valid) if ok])
+        lng, lat = coords[:, 0], coords[:, 1]
+
+        # Project around the polygons' own mean latitude, in kilometres
+        x, y = (project_coordinates(lat, lng, reference_latitude=lat.mean()) / 1000).T
+
+        # Shift each vertex to its successor within its own ring
+        valid_lengths = lengths[valid]
+        starts = np.concatenate([[0], np.cumsum(valid_lengths)[:-1]])
+        successor = np.arange(len(x)) + 1
+        successor[starts + valid_lengths - 1] = starts
+
+        cross = x * y[successor] - x[successor] * y
+        areas[valid] = np.abs(np.add.reduceat(cross, starts)) / 2
+
+        return pd.Series(areas, index=names)
+
+    def income_by_year(self, income_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return income and households per (year, planning area)
+        """
+        df = income_df.dropna(subset=['planning_area'])
+        df = df[['planning_area', 'weighted_average_income', 'total_households']].assign(
+            year=df['year'].astype(str) if 'year' in df.columns else self.default_year
+        )
+        df['planning_area'] = PLANNING_AREA_REGISTRY.canonical(df['planning_area'])
+        return df.drop_duplicates(['year', 'planning_area'], keep='last')
+
+    def compute_metrics(self, fitness_df: pd.DataFrame, planning_areas_df: pd.DataFrame,
+                        income_df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute density, saturation and demand metrics per year, planning area and category
+
+        Rows with category 'All' hold the totals across categories. Metrics:
+        - studios_per_1000_households, studios_per_km2: raw density
+        - category_share: share of the area's studios in this category
+        - saturation_index: density per household relative to the island-wide
+          density for the same year and category (>1 means saturated)
+        - demand_index: studios the area would have if studios were spread in
+          proportion to households x income, divided by (actual studios + 1)
+          (>1 means under-served)
+        """
+        # Studio counts per area x category from the shared aggregate cube
+        counts = get_aggregate_cube(fitness_df).table.pivot_table(
+            index='planning_area', columns='category', values='location_count',
+            aggfunc='sum', fill_value=0
+        )
+        counts.index = PLANNING_AREA_REGISTRY.canonical(counts.index.to_series())
+        counts = counts.groupby(level=0).sum()
+        counts['All'] = counts.sum(axis=1)
+
+        area_km2 = self.polygon_areas_km2(planning_areas_df)
+        area_km2 = area_km2[~area_km2.index.duplicated()]
+        income = self.income_by_year(income_df)
+
+        areas = area_km2.index.union(counts.index).union(pd.Index(income['planning_area'].unique()))
+        years = np.sort(income['year'].unique()) if not income.empty else np.array([self.default_year])
+        categories = counts.columns.to_numpy()
+
+        # Dense year x area x category arrays
+        count_arr = counts.reindex(areas, fill_value=0).to_numpy(dtype=float)[np.newaxis, :, :]
+        km2_arr = area_km2.reindex(areas).to_numpy(dtype=float)[np.newaxis, :, np.newaxis]
+
+        income_wide = income.pivot(index='year', columns='planning_area', values='weighted_average_income')
+        households_wide = income.pivot(index='year', columns='planning_area', values='total_households')
+        income_arr = income_wide.reindex(index=years, columns=areas).to_numpy(dtype=float)[:, :, np.newaxis]
+        households_arr = households_wide.reindex(index=years, columns=areas).to_numpy(dtype=float)[:, :, np.newaxis]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            per_1000_households = np.where(households_arr > 0, count_arr * 1000 / households_arr, np.nan)
+            per_km2 = np.where(km2_arr > 0, count_arr / km2_arr, np.nan)
+
+            all_column = np.flatnonzero(categories == 'All')[0]
+            category_share = count_arr / count_arr[:, :, [all_column]]
+
+            # Island-wide density per year and category, over areas with household data
+            has_households = households_arr > 0
+            island_counts = np.where(has_households, count_arr, 0).sum(axis=1, keepdims=True)
+            island_households = np.where(has_households, households_arr, 0).sum(axis=1, keepdims=True)
+            island_density = island_counts * 1000 / island_households
+            saturation = per_1000_households / island_density
+
+            demand_weight = np.nan_to_num(households_arr * income_arr)
+            demand_share = demand_weight / demand_weight.sum(axis=1, keepdims=True)
+            expected = demand_share * island_counts
+            demand_index = np.where(has_households, expected / (count_arr + 1), np.nan)
+
+        shape = (len(years), len(areas), len(categories))
+
+        def flat(arr):
+            return np.broadcast_to(arr, shape).ravel()
+
+        metrics = pd.DataFrame({
+            'year': np.repeat(years, len(areas) * len(categories)),
+            'planning_area': np.tile(np.repeat(areas.to_numpy(), len(categories)), len(years)),
+            'category': np.tile(categories, len(years) * len(areas)),
+            'studio_count': flat(count_arr).astype(np.int64),
+            'category_share': flat(category_share),
+            'total_households': flat(households_arr),
+            'weighted_average_income': flat(income_arr),
+            'area_km2': flat(km2_arr),
+            'studios_per_1000_households': flat(per_1000_households),
+            'studios_per_km2': flat(per_km2),
+            'saturation_index': flat(saturation),
+            'demand_index': flat(demand_index),
+        })
+
+        return metrics
+
+    def save_to_csv(self, df: pd.DataFrame, filepath: str):
+        """
+        Save DataFrame to CSV file
+        """
+        # Create output directory if it doesn't exist
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+        df.to_csv(filepath, index=False)
+        print(f"Saved {len(df)} metric rows to {filepath}")
+
+def main():
+    """
+    Main function to compute planning area density and saturation metrics
+    """
+    print("Starting planning area metrics computation...")
+
+    for path in [COMBINED_DATA_OUTPUT, PLANNING_AREAS_OUTPUT, INCOME_DATA_OUTPUT]:
+        if not os.path.exists(path):
+            print(f"Required data file not found: {path}")
+            return pd.DataFrame()
+
+    fitness_df = load_locations(COMBINED_DATA_OUTPUT)
+    planning_areas_df = pd.read_csv(PLANNING_AREAS_OUTPUT)
+    income_df = pd.read_csv(INCOME_DATA_OUTPUT)
+
+    calculator = PlanningAreaMetrics()
+    metrics = calculator.compute_metrics(fitness_df, planning_areas_df, income_df)
+    calculator.save_to_csv(metrics, METRICS_OUTPUT)
+
+    # Print the most under-served areas for the latest year
+    latest = metrics[(metrics['year'] == metrics['year'].max()) & (metrics['category'] == 'All')]
+    print("\nMost under-served planning areas (highest demand index):")
+    for _, row in latest.nlargest(10, 'demand_index').iterrows():
+        print(f"  {row['planning_area']}: {row['studio_count']} studios, "
+              f"{row['studios_per_1000_households']:.2f} per 1,000 households, "
+              f"demand index {row['demand_index']:.2f}")
+
+    return metrics
+
+if __name__ == "__main__":
+    main()
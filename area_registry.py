@@ -0,0 +1,130 @@
+"""
+Canonical planning area registry.
+
+Every planning area has a stable small-integer id: its position in
+PLANNING_AREAS, with 0 reserved for 'Unknown'. Names from any source
+(upper-case URA names, title-case census names, snake_case area codes,
+known aliases) resolve to the same id, so datasets are joined on ids with
+integer array takes instead of string normalisation and hash joins.
+
+The registry's categorical dtype uses the canonical names as categories in
+id order, so a planning_area categorical's codes are the area ids.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+UNKNOWN_AREA = 'Unknown'
+UNKNOWN_AREA_ID = 0
+
+# URA Master Plan 2019 planning areas. Ids are positions in this list (from 1),
+# so new areas must be appended at the end to keep existing ids stable.
+PLANNING_AREAS = [
+    'ANG MO KIO', 'BEDOK', 'BISHAN', 'BOON LAY', 'BUKIT BATOK', 'BUKIT MERAH', 'BUKIT PANJANG',
+    'BUKIT TIMAH', 'CENTRAL WATER CATCHMENT', 'CHANGI', 'CHANGI BAY', 'CHOA CHU KANG', 'CLEMENTI',
+    'DOWNTOWN CORE', 'GEYLANG', 'HOUGANG', 'JURONG EAST', 'JURONG WEST', 'KALLANG', 'LIM CHU KANG',
+    'MANDAI', 'MARINA EAST', 'MARINA SOUTH', 'MARINE PARADE', 'MUSEUM', 'NEWTON', 'NORTH-EASTERN ISLANDS',
+    'NOVENA', 'ORCHARD', 'OUTRAM', 'PASIR RIS', 'PAYA LEBAR', 'PIONEER', 'PUNGGOL', 'QUEENSTOWN',
+    'RIVER VALLEY', 'ROCHOR', 'SELETAR', 'SEMBAWANG', 'SENGKANG', 'SERANGOON', 'SIMPANG',
+    'SINGAPORE RIVER', 'SOUTHERN ISLANDS', 'STRAITS VIEW', 'SUNGEI KADUT', 'TAMPINES', 'TANGLIN',
+    'TENGAH', 'TOA PAYOH', 'TUAS', 'WESTERN ISLANDS', 'WESTERN WATER CATCHMENT', 'WOODLANDS', 'YISHUN',
+]
+
+# Other spellings seen in census and OneMap data, by normalised key
+ALIASES = {
+    'KALLANG WHAMPOA': 'KALLANG',
+    'NORTH EAST ISLANDS': 'NORTH-EASTERN ISLANDS',
+    'CENTRAL CATCHMENT': 'CENTRAL WATER CATCHMENT',
+    'WESTERN CATCHMENT': 'WESTERN WATER CATCHMENT',
+}
+
+def normalize_area_key(name: str) -> str:
+    """
+    Upper case with '-', '_' and '/' treated as spaces and whitespace collapsed
+    """
+    return re.sub(r'[\s_\-/]+', ' ', str(name)).strip().upper()
+
+class PlanningAreaRegistry:
+    """
+    Stable integer ids, canonical names and aliases for planning areas
+    """
+    def __init__(self, names: List[str] = PLANNING_AREAS, aliases: Optional[Dict[str, str]] = None):
+        self.names = np.array([UNKNOWN_AREA] + list(names), dtype=object)
+        self.dtype = pd.CategoricalDtype(categories=self.names.tolist())
+        self._ids = {normalize_area_key(name): area_id for area_id, name in enumerate(self.names)}
+        for alias, name in (ALIASES if aliases is None else aliases).items():
+            self._ids[normalize_area_key(alias)] = self._ids[normalize_area_key(name)]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def id_of(self, name) -> int:
+        """
+        Id of one planning area name, or UNKNOWN_AREA_ID
+        """
+        if name is None or (isinstance(name, float) and np.isnan(name)):
+            return UNKNOWN_AREA_ID
+        return self._ids.get(normalize_area_key(name), UNKNOWN_AREA_ID)
+
+    def ids(self, names: Iterable) -> np.ndarray:
+        """
+        Id of every name; each distinct spelling is normalised once
+
+        Categoricals that already use the registry dtype are read straight
+        from their codes.
+        """
+        if isinstance(names, pd.Series) and names.dtype == self.dtype:
+            return np.maximum(names.cat.codes.to_numpy(), UNKNOWN_AREA_ID).astype(np.int16)
+        codes, uniques = pd.factorize(names if isinstance(names, pd.Series) else pd.Series(list(names), dtype=object))
+        # Slot 0 answers missing values, which factorize codes as -1
+        unique_ids = np.array([UNKNOWN_AREA_ID] + [self.id_of(name) for name in uniques], dtype=np.int16)
+        return unique_ids[codes + 1]
+
+    def unmatched(self, names: Iterable) -> List[str]:
+        """
+        Distinct non-missing names the registry does not recognise
+        """
+        uniques = pd.Series(list(names) if not isinstance(names, pd.Series) else names).dropna().unique()
+        return [str(name) for name in uniques
+                if self.id_of(name) == UNKNOWN_AREA_ID and normalize_area_key(name) != normalize_area_key(UNKNOWN_AREA)]
+
+    def canonical(self, names: Iterable) -> np.ndarray:
+        """
+        Canonical upper-case name of every name ('Unknown' where unrecognised)
+        """
+        return self.names[self.ids(names)]
+
+    def categorical(self, names: Iterable, index: Optional[pd.Index] = None) -> pd.Series:
+        """
+        Planning areas as a categorical whose codes are the registry ids
+        """
+        return pd.Series(pd.Categorical.from_codes(self.ids(names), dtype=self.dtype), index=index)
+
+    def dense(self, df: pd.DataFrame, name_column: str, columns: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Per-area lookup arrays indexed by id, built from a table keyed by area name
+
+        Areas missing from the table (and 'Unknown') hold NaN; where a table
+        names an area twice, the first row wins.
+        """
+        ids = self.ids(df[name_column])
+        known = np.flatnonzero(ids != UNKNOWN_AREA_ID)
+        area_ids, first = np.unique(ids[known], return_index=True)
+        rows = known[first]
+        arrays = {}
+        for column in columns:
+            values = np.full(len(self), np.nan)
+            values[area_ids] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=float)[rows]
+            arrays[column] = values
+        return arrays
+
+    def lookup(self, names: Iterable, df: pd.DataFrame, name_column: str, columns: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Values from a per-area table for every name, by integer take
+        """
+        ids = self.ids(names)
+        return {column: values[ids] for column, values in self.dense(df, name_column, columns).items()}
+
+PLANNING_AREA_REGISTRY = PlanningAreaRegistry()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Render many filtered variants of the fitness map in parallel.
+
+A filter spec is a dict naming the variant and the rows it keeps, e.g.
+
+    {'name': 'gym', 'category': 'Gym'}
+    {'name': 'high-income-yoga', 'category': 'Yoga/Pilates Studio', 'income_band': 'High (>$15,000)'}
+    {'name': 'east', 'planning_area': ['Bedok', 'Tampines', 'Pasir Ris'], 'min_rating': 4.0}
+
+The locations and planning area geometry are loaded once in the parent
+process before the pool starts, so forked workers inherit them instead of
+re-reading and re-parsing the CSVs. Each worker writes its own HTML file
+and the batch returns (and saves) a manifest describing every output.
+
+Usage:
+    python batch_render.py --by category --by income_band
+    python batch_render.py --specs specs.json --workers 8 --output-dir map_variants
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from area_registry import PLANNING_AREA_REGISTRY
+from map_engine import get_geo_store
+from report_generator import AnalysisReportGenerator, slugify
+from visualization import FitnessMapVisualizer
+from lazy_popups import popup_sidecar_path
+from schema import load_locations
+from config import PLANNING_AREAS_OUTPUT, INCOME_DATA_OUTPUT
+
+DEFAULT_OUTPUT_DIR = "map_variants"
+MANIFEST_FILENAME = "manifest.json"
+FILTER_KEYS = ['category', 'planning_area', 'income_band']
+
+# Data shared with worker processes, filled in the parent before the pool forks;
+# "key" records which file (path and mtime) "locations" was loaded from
+_SHARED: Dict = {}
+
+def _as_list(value) -> List:
+    return value if isinstance(value, (list, tuple, set)) else [value]
+
+def add_income_band(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Add the household income band column used by income_band filters
+    """
+    if 'income_band' in df.columns:
+        return df
+    income = df['weighted_average_income'] if 'weighted_average_income' in df.columns else pd.Series(0, index=df.index)
+    return df.assign(income_band=AnalysisReportGenerator.income_bands(income.fillna(0)).astype(str))
+
+def apply_filter_spec(df: pd.DataFrame, spec: Dict) -> pd.DataFrame:
+    """
+    Keep the rows matching every filter in a spec
+
+    category, planning_area and income_band accept a single value or a list;
+    planning areas match case-insensitively. min_rating drops rows rated
+    below it.
+    """
+    mask = pd.Series(True, index=df.index)
+    for key in FILTER_KEYS:
+        if spec.get(key) is None:
+            continue
+        values = _as_list(spec[key])
+        if key == 'planning_area':
+            mask &= np.isin(PLANNING_AREA_REGISTRY.ids(df[key]), PLANNING_AREA_REGISTRY.ids(values))
+        else:
+            mask &= df[key].isin(values)
+    if spec.get('min_rating') is not None:
+        mask &= df['rating'].fillna(0) >= spec['min_rating']
+    return df[mask]
+
+def build_filter_specs(df: pd.DataFrame, by: List[str]) -> List[Dict]:
+    """
+    One spec per distinct value of each requested column, e.g. by=['category', 'income_band']
+    """
+    df = add_income_band(df)
+    specs = []
+    for key in by:
+        if key not in FILTER_KEYS:
+            raise ValueError(f"Cannot slice maps by '{key}'; choose from {FILTER_KEYS}")
+        counts = df[key].dropna().value_counts()
+        values = counts[counts > 0].index
+        specs.extend({'name': f"{key}-{slug}", key: value}
+                     for value, slug in zip(values, slugify(pd.Series(values))))
+    return specs
+
+def _data_key(data_path: str) -> tuple:
+    """
+    Identity of a locations file's current contents: its absolute path and modification time
+    """
+    return os.path.abspath(data_path), os.path.getmtime(data_path)
+
+def _init_worker(data_path: str, planning_areas_path: str, income_path: str):
+    """
+    Load shared data in a worker that did not inherit it (spawn start method) or inherited another file's
+    """
+    if _SHARED.get('key') != _data_key(data_path):
+        _load_shared(data_path, planning_areas_path, income_path)
+
+def _load_shared(data_path: str, planning_areas_path: str, income_path: str):
+    df = load_locations(data_path, report=False)
+    _SHARED['locations'] = add_income_band(df)
+    _SHARED['key'] = _data_key(data_path)
+    # Warm the geometry store cache shared by the density layers and the overlays
+    get_geo_store(planning_areas_path, income_path)
+
+def spec_output_file(spec: Dict, output_dir: str) -> str:
+    """
+    HTML file a spec renders to: its output_file, or its slugified name inside output_dir
+    """
+    name = spec.get('name') or 'map'
+    return spec.get('output_file') or os.path.join(output_dir, f"{slugify(pd.Series([name]))[0]}.html")
+
+def _render_spec(spec: Dict, output_dir: str, density_resolution_m: Optional[float],
+                 lazy_popups: bool = False) -> Dict:
+    """
+    Render one map variant in a worker and describe the result
+    """
+    start = time.perf_counter()
+    name = spec.get('name') or 'map'
+    output_file = spec_output_file(spec, output_dir)
+    entry = {
+        'name': name,
+        'filters': {key: value for key, value in spec.items() if key not in ('name', 'output_file')},
+        'output_file': output_file,
+    }
+    try:
+        df = apply_filter_spec(_SHARED['locations'], spec)
+        entry['location_count'] = int(len(df))
+        if df.empty:
+            entry.update(status='empty', bytes=0)
+        else:
+            os.makedirs(os.path.dirname(output_file) or '.', exist_ok=True)
+            FitnessMapVisualizer().render_map(df, output_file, density_resolution_m, lazy_popups)
+            entry.update(status='ok', bytes=os.path.getsize(output_file))
+            if lazy_popups:
+                entry['popup_sidecar'] = popup_sidecar_path(output_file)
+    except Exception as e:
+        entry.update(status='error', error=str(e))
+    entry['seconds'] = round(time.perf_counter() - start, 3)
+    return entry
+
+class BatchMapRenderer:
+    """
+    Render a list of filter specs to HTML maps in a process pool
+    """
+    def __init__(self, data_path: str = "data/final_fitness_locations.csv",
+                 output_dir: str = DEFAULT_OUTPUT_DIR, workers: Optional[int] = None,
+                 density_resolution_m: Optional[float] = 1000, lazy_popups: bool = False):
+        self.data_path = data_path
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count() or 1
+        self.density_resolution_m = density_resolution_m
+        self.lazy_popups = lazy_popups
+
+    def load(self) -> pd.DataFrame:
+        """
+        Load locations and geometry once, in this process, for workers to share
+        """
+        if not os.path.exists(self.data_path):
+            raise FileNotFoundError(f"Final data file not found: {self.data_path}")
+        if _SHARED.get('key') != _data_key(self.data_path):
+            _load_shared(self.data_path, PLANNING_AREAS_OUTPUT, INCOME_DATA_OUTPUT)
+            print(f"Loaded {len(_SHARED['locations'])} fitness locations for batch rendering")
+        return _SHARED['locations']
+
+    def render(self, specs: List[Dict]) -> List[Dict]:
+        """
+        Render every spec and return the manifest, in the order of the specs
+        """
+        names = [spec.get('name') for spec in specs]
+        duplicates = {name for name in names if names.count(name) > 1}
+        if duplicates:
+            raise ValueError(f"Filter spec names must be unique: {sorted(duplicates)}")
+        # Different names can slugify to the same file, which concurrent workers would both write
+        outputs = [os.path.abspath(spec_output_file(spec, self.output_dir)) for spec in specs]
+        clashes = {output for output in outputs if outputs.count(output) > 1}
+        if clashes:
+            raise ValueError(f"Filter specs must render to distinct files: {sorted(clashes)}")
+
+        self.load()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        print(f"Rendering {len(specs)} map variants with {self.workers} workers...")
+        start = time.perf_counter()
+        manifest = [None] * len(specs)
+        if self.workers == 1:
+            for i, spec in enumerate(specs):
+                manifest[i] = _render_spec(spec, self.output_dir, self.density_resolution_m, self.lazy_popups)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.data_path, PLANNING_AREAS_OUTPUT, INCOME_DATA_OUTPUT)
+            ) as executor:
+                futures = {
+                    executor.submit(_render_spec, spec, self.output_dir, self.density_resolution_m,
+                                    self.lazy_popups): i
+                    for i, spec in enumerate(specs)
+                }
+                for future in as_completed(futures):
+                    entry = future.result()
+                    manifest[futures[future]] = entry
+                    print(f"  [{entry['status']}] {entry['name']}: {entry.get('location_count', 0)} locations")
+
+        elapsed = time.perf_counter() - start
+        self.save_manifest(manifest, elapsed)
+        failed = sum(entry['status'] == 'error' for entry in manifest)
+        print(f"Rendered {len(specs) - failed}/{len(specs)} map variants in {elapsed:.1f}s")
+        return manifest
+
+    def save_manifest(self, manifest: List[Dict], elapsed: float) -> str:
+        """
+        Write the manifest next to the rendered maps
+        """
+        filepath = os.path.join(self.output_dir, MANIFEST_FILENAME)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': self.data_path,
+                'workers': self.workers,
+                'seconds': round(elapsed, 3),
+                'maps': manifest,
+            }, f, indent=2)
+        print(f"Manifest saved to {filepath}")
+        return filepath
+
+def main():
+    """
+    Command line entry point for batch map rendering
+    """
+    parser = argparse.ArgumentParser(description='Render filtered map variants in parallel')
+    parser.add_argument('--specs', help='JSON file with a list of filter specs')
+    parser.add_argument('--by', action='append', choices=FILTER_KEYS,
+                       help='Render one map per value of this column (repeatable)')
+    parser.add_argument('--output-dir', default=DEFAULT_OUTPUT_DIR,
+                       help=f'Directory for the maps and manifest (default: {DEFAULT_OUTPUT_DIR})')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--density-resolution', type=float, default=1000,
+                       help='Density grid cell size in metres, 0 to omit the layer (default: 1000)')
+    parser.add_argument('--data', default="data/final_fitness_locations.csv", help='Locations dataset')
+    parser.add_argument('--lazy-popups', action='store_true',
+                       help='Load popup content from a sidecar file on click instead of inlining it')
+
+    args = parser.parse_args()
+
+    if not args.specs and not args.by:
+        parser.error('Provide --specs or at least one --by')
+
+    renderer = BatchMapRenderer(args.data, args.output_dir, args.workers, args.density_resolution or None,
+                                args.lazy_popups)
+    specs = []
+    if args.specs:
+        with open(args.specs, 'r', encoding='utf-8') as f:
+            specs.extend(json.load(f))
+    if args.by:
+        specs.extend(build_filter_specs(renderer.load(), args.by))
+
+    return renderer.render(specs)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+from classification_cache import ClassificationCache, ruleset_hash
 from config import COMBINED_DATA_OUTPUT
 
 def better_data_cleaner():
@@ -91,9 +92,14 @@ def better_data_cleaner():
         # we need to be more careful - let's check the category
         return False
     
-    # Apply the better exclusion logic
-    excluded_df = df[df['name'].apply(should_exclude)].copy()
-    remaining_df = df[~df['name'].apply(should_exclude)].copy()
+    # Apply the better exclusion logic, evaluating only names not seen with these keywords before
+    cache = ClassificationCache()
+    rules = {'keep': legitimate_fitness_keywords, 'exclude': exclusion_keywords}
+    exclude = cache.classify(ruleset_hash('better_data_cleaner.should_exclude', rules),
+                             [df['name']], should_exclude).astype(bool)
+    cache.report("Exclusion check")
+    excluded_df = df[exclude].copy()
+    remaining_df = df[~exclude].copy()
     
     print(f"\nBetter exclusions applied:")
     print(f"Excluded {len(excluded_df)} non-fitness locations")
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Brand and chain detection for fitness locations.
+
+Branches of a chain share the first words of their name and differ in
+what follows ("Anytime Fitness Bukit Timah", "Anytime Fitness Tampines").
+The index finds those prefixes in the data itself:
+
+- distinct normalised names are loaded into a word-level prefix trie that
+  counts the names under every node
+- walking down from the root, the first node shared by enough names that
+  mostly use one website becomes a brand, extended over any words all of
+  its names continue with ("anytime" -> "anytime fitness"); nodes made
+  only of generic words ('the', 'fitness', 'yoga', ...) or place-name
+  words ('bukit', 'tampines', ...) are walked through,
+  and a single word needs enough names on that website to stand alone
+- a leading planning area name and place-name words are skipped, both
+  when seeding and when tagging, so "Bishan ActiveSG Sports Hall" and
+  "Bukit Canberra ActiveSG Gym" are ActiveSG branches
+- tagging walks each distinct name down the brand trie once
+
+Each row gets a small integer brand_id (0 for independents), so chain-level
+analysis is a groupby on an integer column.
+
+Usage:
+    python brand_index.py
+    python brand_index.py --data data/combined_data.csv --min-branches 4
+"""
+
+import argparse
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from area_registry import PLANNING_AREA_REGISTRY, normalize_area_key
+from schema import load_locations
+
+BRANDS_OUTPUT = "data/brands.csv"
+BRAND_FOOTPRINT_OUTPUT = "data/brand_footprint.csv"
+BRAND_AREAS_OUTPUT = "data/brand_area_branches.csv"
+NO_BRAND = 'Independent'
+NO_BRAND_ID = 0
+MIN_BRANCHES = 3
+MAX_BRAND_WORDS = 4
+MIN_DOMAIN_SHARE = 0.5  # Share of a brand's names with websites that must use its most common site
+
+# Words that never make a brand on their own
+GENERIC_WORDS = {
+    'the', 'a', 'an', 'and', '&', 'of', 'by', 'at', 'in', 'sg', 'singapore',
+    'fitness', 'gym', 'yoga', 'pilates', 'studio', 'studios', 'dance', 'martial', 'arts', 'boxing',
+    'academy', 'club', 'centre', 'center', 'school', 'sports', 'sport', 'training', 'fit',
+    'corner', 'park', 'community', 'hall',
+}
+
+# Hosts of pages that say nothing about which business a site belongs to
+SHARED_HOSTS = ('facebook.com', 'instagram.com', 'linktr.ee', 'wa.me', 'business.site', 'google.com',
+                'sites.google.com', 'wixsite.com', 'hitpay.shop', 'linkedin.com', 'tiktok.com')
+
+# Decorations around a business's own name in its site name
+SITE_PREFIXES = ('my', 'the')
+SITE_SUFFIXES = ('circle', 'official', 'singapore', 'sg')
+MIN_SITE_LENGTH = 3
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9'+&]*", re.IGNORECASE)
+
+# Planning area names as word tuples, longest first, for stripping a leading area from a name
+_AREA_PREFIXES = sorted({tuple(normalize_area_key(name).lower().split()) for name in PLANNING_AREA_REGISTRY.names[1:]},
+                        key=len, reverse=True)
+
+# Place-name words that are not planning areas themselves but lead many names ("Bukit Canberra ...")
+COMMON_PLACE_WORDS = {
+    'bukit', 'pulau', 'jalan', 'lorong', 'tanjong', 'kampong', 'kg', 'blk', 'block', 'mount', 'mt',
+    'tiong', 'bahru', 'canberra', 'gombak', 'ubin', 'holland', 'upper', 'lower',
+}
+
+# Words that cannot make a brand without some other word when seeding
+_NON_BRAND_WORDS = GENERIC_WORDS | COMMON_PLACE_WORDS | {word for area in _AREA_PREFIXES for word in area}
+
+def brand_tokens(name) -> List[str]:
+    """
+    Lower-case words of a name; '@', '-', '/' and other punctuation separate words
+    """
+    return [token.lower() for token in TOKEN_PATTERN.findall(str(name))] if pd.notna(name) else []
+
+def strip_area(words: List[str]) -> Tuple[List[str], int]:
+    """
+    Words of a name without a leading planning area name or place-name words, and how many words were dropped
+    """
+    dropped = 0
+    for area in _AREA_PREFIXES:
+        if len(words) > len(area) and tuple(words[:len(area)]) == area:
+            dropped = len(area)
+            break
+    while len(words) > dropped + 1 and words[dropped] in COMMON_PLACE_WORDS:
+        dropped += 1
+    return words[dropped:], dropped
+
+def website_domain(url) -> Optional[str]:
+    """
+    Site name of a website (its first host label after 'www.', without
+    decorations like a leading 'my' or a trailing 'sg'), or None for missing
+    websites and social or shop pages that many businesses share
+
+    bodyfittraining.com and bodyfittraining.au both give 'bodyfittraining';
+    myactivesg.com and activesgcircle.gov.sg both give 'active'.
+    """
+    if pd.isna(url) or not str(url).strip():
+        return None
+    host = re.sub(r'^[a-z]+://', '', str(url).strip().lower()).split('/')[0].split(':')[0]
+    host = host[4:] if host.startswith('www.') else host
+    if any(host == shared or host.endswith('.' + shared) for shared in SHARED_HOSTS):
+        return None
+    site = host.split('.')[0]
+    changed = True
+    while changed:
+        changed = False
+        for prefix in SITE_PREFIXES:
+            if site.startswith(prefix) and len(site) - len(prefix) >= MIN_SITE_LENGTH:
+                site, changed = site[len(prefix):], True
+        for suffix in SITE_SUFFIXES:
+            if site.endswith(suffix) and len(site) - len(suffix) >= MIN_SITE_LENGTH:
+                site, changed = site[:-len(suffix)], True
+    return site or None
+
+def _display_prefix(name: str, skip: int, words: int) -> str:
+    """
+    The original text of a brand prefix within a name
+    """
+    matches = list(TOKEN_PATTERN.finditer(str(name)))
+    if len(matches) < skip + words:
+        return str(name)
+    return str(name)[matches[skip].start():matches[skip + words - 1].end()]
+
+class _TrieNode:
+    __slots__ = ('children', 'members', 'brand_id')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.members: List[int] = []  # Distinct names passing through this node, while building
+        self.brand_id = NO_BRAND_ID
+
+class BrandIndex:
+    """
+    Word-level prefix trie of brand names, tagging location names with brand ids
+    """
+    COLUMNS = ['brand_id', 'brand', 'prefix', 'seed_names']
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table[self.COLUMNS].sort_values('brand_id').reset_index(drop=True)
+        self.names = np.array([NO_BRAND] + self.table['brand'].tolist(), dtype=object)
+        self.root = _TrieNode()
+        for brand_id, prefix in zip(self.table['brand_id'], self.table['prefix']):
+            node = self.root
+            for word in str(prefix).split():
+                node = node.children.setdefault(word, _TrieNode())
+            node.brand_id = int(brand_id)
+
+    @classmethod
+    def build(cls, names: pd.Series, websites: Optional[pd.Series] = None, min_branches: int = MIN_BRANCHES,
+              min_domain_share: float = MIN_DOMAIN_SHARE) -> 'BrandIndex':
+        """
+        Seed brands from name prefixes shared by at least min_branches distinct names
+
+        A prefix is only a brand if most of its names that have a website
+        use the same site. Prefixes of two or more words also qualify when
+        fewer than two of their names have a website; a single word needs
+        min_branches names on its most common site ("Absolute", but not
+        "Core" or "Outdoor").
+        """
+        frame = pd.DataFrame({'name': names.to_numpy(dtype=object),
+                              'domain': (websites.map(website_domain) if websites is not None
+                                         else pd.Series(None, index=names.index)).to_numpy(dtype=object)})
+        frame = frame[frame['name'].notna()].drop_duplicates('name')
+        distinct, domains = frame['name'].tolist(), frame['domain'].tolist()
+        stripped = [strip_area(brand_tokens(name)) for name in distinct]
+        root = _TrieNode()
+        for position, (words, _) in enumerate(stripped):
+            node = root
+            for word in words[:MAX_BRAND_WORDS]:
+                node = node.children.setdefault(word, _TrieNode())
+                node.members.append(position)
+
+        def main_site(members: List[int]) -> Optional[str]:
+            known = Counter(domains[member] for member in members if pd.notna(domains[member]))
+            return known.most_common(1)[0][0] if known else None
+
+        def consistent(members: List[int], prefix: Tuple[str, ...]) -> bool:
+            known = [domains[member] for member in members if pd.notna(domains[member])]
+            if len(known) < 2:
+                return len(prefix) > 1
+            top = Counter(known).most_common(1)[0][1]
+            if len(prefix) == 1 and top < min_branches:
+                return False
+            return top / len(known) >= min_domain_share
+
+        brands = []
+        def walk(node: _TrieNode, path: Tuple[str, ...]):
+            for word, child in node.children.items():
+                if len(child.members) < min_branches:
+                    continue
+                prefix = path + (word,)
+                if not (any(w not in _NON_BRAND_WORDS for w in prefix) and consistent(child.members, prefix)):
+                    walk(child, prefix)
+                    continue
+                # Narrow to the brand's full name while one next word still holds every name
+                # on the main site, or every name when none has a site
+                while len(prefix) < MAX_BRAND_WORDS:
+                    site = main_site(child.members)
+                    held = [m for m in child.members if domains[m] == site] if site else child.members
+                    narrower = [(w, c) for w, c in child.children.items()
+                                if len(c.members) >= min_branches and set(held) <= set(c.members)]
+                    if not narrower:
+                        break
+                    (word, child), = narrower
+                    prefix = prefix + (word,)
+                brands.append((prefix, child.members))
+        walk(root, ())
+
+        rows = []
+        for brand_id, (prefix, members) in enumerate(sorted(brands), start=1):
+            display = Counter(_display_prefix(distinct[member], stripped[member][1], len(prefix))
+                              for member in members).most_common(1)[0][0]
+            rows.append({'brand_id': brand_id, 'brand': display, 'prefix': ' '.join(prefix),
+                         'seed_names': len(members)})
+        return cls(pd.DataFrame(rows, columns=cls.COLUMNS))
+
+    def match(self, words: Sequence[str]) -> int:
+        """
+        Brand id of the longest brand prefix of a name's words (after any leading planning area)
+        """
+        node, found = self.root, NO_BRAND_ID
+        for word in strip_area(list(words))[0]:
+            node = node.children.get(word)
+            if node is None:
+                break
+            if node.brand_id:
+                found = node.brand_id
+        return found
+
+    def tag(self, names: pd.Series) -> np.ndarray:
+        """
+        Brand id of every name, matching each distinct name once
+        """
+        codes, uniques = pd.factorize(names.astype(object))
+        ids = np.array([NO_BRAND_ID] + [self.match(brand_tokens(name)) for name in uniques], dtype=np.int32)
+        return ids[codes + 1]
+
+    def assign(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Add brand_id and a brand categorical whose codes are the ids
+        """
+        ids = self.tag(df['name'])
+        return df.assign(brand_id=ids, brand=pd.Categorical.from_codes(ids, categories=self.names))
+
+    def save(self, filepath: str = BRANDS_OUTPUT):
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        self.table.to_csv(filepath, index=False)
+        print(f"Saved {len(self.table)} brands to {filepath}")
+
+    @classmethod
+    def load(cls, filepath: str = BRANDS_OUTPUT) -> Optional['BrandIndex']:
+        """
+        Load a saved index, or None if it has not been built yet
+        """
+        if not os.path.exists(filepath):
+            return None
+        # All-digit brands or prefixes ('45', '7') must stay text
+        return cls(pd.read_csv(filepath, dtype={'brand': str, 'prefix': str}))
+
+def brand_footprint(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-brand branches, planning areas covered, rating and income coverage
+
+    households_covered sums total_households over the distinct planning
+    areas a brand is in; household_share divides that by all households
+    in the data, so it shows how much of the market a chain reaches.
+    """
+    areas = df[['planning_area', 'total_households']].dropna().drop_duplicates('planning_area')
+    all_households = pd.to_numeric(areas['total_households'], errors='coerce').sum()
+    branded = df[df['brand_id'] != NO_BRAND_ID]
+    grouped = branded.groupby('brand', observed=True)
+    footprint = pd.DataFrame({
+        'branches': grouped.size(),
+        'planning_areas': grouped['planning_area'].nunique(),
+        # Unrated places are stored with rating 0, so they are left out of the average
+        'average_rating': branded.assign(rated=branded['rating'].where(branded['rating'] > 0)).groupby(
+            'brand', observed=True)['rated'].mean().round(2),
+        'average_income': branded.assign(income=branded['weighted_average_income'].where(
+            branded['weighted_average_income'] > 0)).groupby('brand', observed=True)['income'].mean().round(0),
+    })
+    covered = branded[['brand', 'planning_area']].drop_duplicates().merge(areas, on='planning_area', how='left')
+    footprint['households_covered'] = covered.groupby('brand', observed=True)['total_households'].sum()
+    footprint['household_share'] = (footprint['households_covered'] / all_households).round(3) \
+        if all_households else 0.0
+    return footprint.sort_values(['branches', 'planning_areas'], ascending=False)
+
+def brand_area_branches(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Brand x planning area table of branch counts
+    """
+    branded = df[df['brand_id'] != NO_BRAND_ID]
+    return branded.groupby(['brand', 'planning_area'], observed=True).size().unstack(fill_value=0)
+
+def main():
+    """
+    Build the brand index from a locations file and write the chain footprint tables
+    """
+    parser = argparse.ArgumentParser(description='Detect chains and summarise their footprint')
+    parser.add_argument('--data', default="data/final_fitness_locations.csv",
+                       help='Locations to seed and tag (default: data/final_fitness_locations.csv)')
+    parser.add_argument('--min-branches', type=int, default=MIN_BRANCHES,
+                       help=f'Distinct names needed to call a prefix a brand (default: {MIN_BRANCHES})')
+    parser.add_argument('--output', default=BRANDS_OUTPUT, help=f'Brand table (default: {BRANDS_OUTPUT})')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.data):
+        parser.error(f"File not found: {args.data}")
+
+    df = load_locations(args.data, report=False)
+    index = BrandIndex.build(df['name'], df['website'] if 'website' in df.columns else None, args.min_branches)
+    index.save(args.output)
+
+    df = index.assign(df)
+    branded = int((df['brand_id'] != NO_BRAND_ID).sum())
+    print(f"Tagged {branded}/{len(df)} locations as branches of {len(index.table)} brands")
+
+    footprint = brand_footprint(df)
+    footprint.to_csv(BRAND_FOOTPRINT_OUTPUT)
+    brand_area_branches(df).to_csv(BRAND_AREAS_OUTPUT)
+    print(f"Saved brand footprint to {BRAND_FOOTPRINT_OUTPUT} and branches per area to {BRAND_AREAS_OUTPUT}")
+
+    print("\nLargest chains:")
+    print(footprint.head(15).to_string())
+    return footprint
+
+if __name__ == "__main__":
+    main()
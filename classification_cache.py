@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Persistent cache of category and exclusion decisions.
+
+The categorizers and cleaners decide each location from its name (and for
+some, its search query or current category) with keyword scans. Crawls are
+full of repeats - the same studio found by several searches, re-crawls of
+unchanged listings - so each rule set only ever needs to see a given name
+once:
+
+- a decision is keyed by the rule set's hash (its name plus the JSON of its
+  keyword lists, combined with the rule function's bytecode, constants and
+  any plain-data globals, closure values or project helper functions it
+  reads) and the lower-cased, stripped inputs it was made from, so editing
+  a keyword list, the order of the checks, a hard-coded exception or a
+  helper the rule calls starts a fresh set of decisions instead of serving
+  stale ones
+- a run deduplicates its rows by key, answers what it can from an
+  in-memory LRU and then the SQLite store on disk, and only evaluates the
+  rule function for keys neither has seen
+
+Usage:
+    python classification_cache.py
+    python classification_cache.py --clear
+"""
+
+import argparse
+import hashlib
+import json
+import types
+import os
+import sqlite3
+import sysconfig
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+
+CLASSIFICATION_CACHE_PATH = "data/classification_cache.sqlite"
+DEFAULT_LRU_SIZE = 50000
+_LOOKUP_BATCH = 500  # Keys per SQL IN (...) query, under SQLite's variable limit
+_MISSING = '\x00'  # Key part for a missing value, distinct from an empty string
+_SEPARATOR = '\x1f'
+# Functions defined under these directories are library code and are left out of rule fingerprints
+_LIBRARY_PATHS = tuple(sorted({os.path.abspath(path) for key, path in sysconfig.get_paths().items()
+                               if key in ('stdlib', 'platstdlib', 'purelib', 'platlib')}))
+
+def ruleset_hash(name: str, rules: Any) -> str:
+    """
+    Short stable hash of a rule function's name and keyword lists
+    """
+    payload = json.dumps([name, rules], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+_PLAIN_DATA = (str, int, float, bool, list, tuple, dict, set, frozenset, type(None))
+
+def _plain(value) -> Any:
+    """
+    JSON-ready form of a plain data value, or None for anything else (objects, modules, functions)
+    """
+    if not isinstance(value, _PLAIN_DATA):
+        return None
+    try:
+        return json.loads(json.dumps(value, sort_keys=True, default=lambda item: sorted(item, key=repr)
+                                     if isinstance(item, (set, frozenset)) else repr(item)))
+    except (TypeError, ValueError):
+        return None
+
+def _code_parts(code: types.CodeType) -> list:
+    """
+    Bytecode, constants and referenced names of a code object and the functions nested in it
+    """
+    parts = [code.co_code.hex(), list(code.co_names)]
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            parts.append(_code_parts(const))
+        elif isinstance(const, frozenset):
+            # Set literals compile to frozensets, whose repr order changes with string hash seeds
+            parts.append(sorted(repr(item) for item in const))
+        else:
+            parts.append(repr(const))
+    return parts
+
+def _global_names(code: types.CodeType) -> set:
+    """
+    Names a code object and the functions nested in it may look up as globals
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+def _is_library(func: types.FunctionType) -> bool:
+    """
+    Whether a function comes from the standard library or an installed package rather than this project
+    """
+    return os.path.abspath(func.__code__.co_filename).startswith(_LIBRARY_PATHS)
+
+def _function_parts(func: types.FunctionType, seen: set) -> list:
+    """
+    Code, closure values and globals of a function, following the project functions it calls
+    """
+    seen.add(func)
+    values = {}
+    cells = [(str(index), cell.cell_contents) for index, cell in enumerate(func.__closure__ or ())
+             if cell.cell_contents is not func]
+    names = [(name, func.__globals__[name]) for name in sorted(_global_names(func.__code__))
+             if name in func.__globals__]
+    for name, value in cells + names:
+        value = getattr(value, '__func__', value)
+        if isinstance(value, types.FunctionType) and not _is_library(value):
+            values[name] = None if value in seen else _function_parts(value, seen)
+        elif _plain(value) is not None:
+            values[name] = _plain(value)
+    return [func.__qualname__, _code_parts(func.__code__), values]
+
+def logic_fingerprint(decide: Callable) -> str:
+    """
+    Hash of what a rule function does: its code plus the plain-data globals and closure values it reads
+
+    Project helper functions the rule calls by global name are fingerprinted
+    the same way, recursively, so editing one re-evaluates the rule; library
+    functions are not. Bound methods are fingerprinted through their
+    function. The bytecode differs between Python versions, so an upgrade
+    re-evaluates names once.
+    """
+    func = getattr(decide, '__func__', decide)
+    if not isinstance(func, types.FunctionType):
+        return ruleset_hash(getattr(decide, '__qualname__', type(decide).__qualname__), repr(decide))
+    return ruleset_hash(func.__qualname__, _function_parts(func, set()))
+
+def normalize_text(value) -> str:
+    """
+    Key part for one input: lower case and stripped, which keyword matching ignores anyway
+    """
+    return _MISSING if pd.isna(value) else str(value).strip().lower()
+
+def decision_keys(columns: List[pd.Series]) -> pd.Series:
+    """
+    Cache key of every row from the inputs a rule function reads
+    """
+    parts = [column.map(normalize_text).astype(object) for column in columns]
+    keys = parts[0]
+    for part in parts[1:]:
+        keys = keys + _SEPARATOR + part
+    return keys
+
+class ClassificationCache:
+    """
+    In-memory LRU in front of an on-disk store of rule decisions
+    """
+    def __init__(self, path: Optional[str] = CLASSIFICATION_CACHE_PATH, maxsize: int = DEFAULT_LRU_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self.memory: 'OrderedDict[tuple, Any]' = OrderedDict()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'evaluated': 0}
+        self._connection = None
+
+    def __getstate__(self):
+        # Worker processes open their own connection and start with an empty LRU
+        state = self.__dict__.copy()
+        state.update(_connection=None, memory=OrderedDict())
+        return state
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS decisions "
+                "(ruleset TEXT NOT NULL, key TEXT NOT NULL, decision TEXT NOT NULL, PRIMARY KEY (ruleset, key))"
+            )
+        return self._connection
+
+    def _remember(self, ruleset: str, key: str, decision: Any):
+        self.memory[(ruleset, key)] = decision
+        self.memory.move_to_end((ruleset, key))
+        while len(self.memory) > self.maxsize:
+            self.memory.popitem(last=False)
+
+    def lookup(self, ruleset: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Known decisions for keys, from memory first and then from disk
+        """
+        found = {}
+        pending = []
+        for key in keys:
+            if (ruleset, key) in self.memory:
+                self.memory.move_to_end((ruleset, key))
+                found[key] = self.memory[(ruleset, key)]
+            else:
+                pending.append(key)
+        self.stats['memory_hits'] += len(found)
+
+        connection = self._connect()
+        if connection is not None:
+            for start in range(0, len(pending), _LOOKUP_BATCH):
+                batch = pending[start:start + _LOOKUP_BATCH]
+                rows = connection.execute(
+                    f"SELECT key, decision FROM decisions WHERE ruleset = ? AND key IN ({','.join('?' * len(batch))})",
+                    [ruleset] + batch
+                ).fetchall()
+                for key, decision in rows:
+                    found[key] = json.loads(decision)
+                    self._remember(ruleset, key, found[key])
+                self.stats['disk_hits'] += len(rows)
+        return found
+
+    def store(self, ruleset: str, decisions: Dict[str, Any]):
+        """
+        Add new decisions to memory and, in one transaction, to disk
+        """
+        for key, decision in decisions.items():
+            self._remember(ruleset, key, decision)
+        connection = self._connect()
+        if connection is not None and decisions:
+            with connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO decisions (ruleset, key, decision) VALUES (?, ?, ?)",
+                    [(ruleset, key, json.dumps(decision)) for key, decision in decisions.items()]
+                )
+
+    def classify(self, ruleset: str, columns: List[pd.Series], decide: Callable[..., Any]) -> np.ndarray:
+        """
+        Decision for every row, evaluating decide only for keys not seen before
+
+        decide is called with the first row's original values for each new
+        key, so it returns exactly what it would have for any row sharing it.
+        Decisions are stored under the rule set hash combined with decide's
+        logic fingerprint, so changing the function's code invalidates them
+        even when its keyword lists are unchanged.
+        """
+        if len(columns[0]) == 0:
+            return np.array([], dtype=object)
+        ruleset = ruleset_hash(ruleset, logic_fingerprint(decide))
+        keys = decision_keys(columns)
+        codes, uniques = pd.factorize(keys)
+        found = self.lookup(ruleset, uniques)
+
+        missing = [position for position, key in enumerate(uniques) if key not in found]
+        if missing:
+            first_rows = np.unique(codes, return_index=True)[1]
+            values = [column.to_numpy(dtype=object) for column in columns]
+            new = {uniques[position]: decide(*(value[first_rows[position]] for value in values))
+                   for position in missing}
+            self.stats['evaluated'] += len(new)
+            self.store(ruleset, new)
+            found.update(new)
+
+        decisions = np.empty(len(uniques), dtype=object)
+        decisions[:] = [found[key] for key in uniques]
+        return decisions[codes]
+
+    def report(self, label: str):
+        print(f"{label}: {self.stats['evaluated']} names evaluated, "
+              f"{self.stats['memory_hits'] + self.stats['disk_hits']} answered from the cache")
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Stored decisions per rule set
+        """
+        connection = self._connect()
+        if connection is None:
+            return pd.DataFrame(columns=['ruleset', 'decisions'])
+        rows = connection.execute("SELECT ruleset, COUNT(*) FROM decisions GROUP BY ruleset").fetchall()
+        return pd.DataFrame(rows, columns=['ruleset', 'decisions'])
+
+    def clear(self):
+        self.memory.clear()
+        connection = self._connect()
+        if connection is not None:
+            with connection:
+                connection.execute("DELETE FROM decisions")
+
+def main():
+    """
+    Command line entry point: show or clear the stored decisions
+    """
+    parser = argparse.ArgumentParser(description='Inspect the classification decision cache')
+    parser.add_argument('--path', default=CLASSIFICATION_CACHE_PATH,
+                       help=f'Cache file (default: {CLASSIFICATION_CACHE_PATH})')
+    parser.add_argument('--clear', action='store_true', help='Delete every stored decision')
+
+    args = parser.parse_args()
+
+    cache = ClassificationCache(args.path)
+    if args.clear:
+        cache.clear()
+        print(f"Cleared {args.path}")
+        return None
+
+    summary = cache.summary()
+    if summary.empty:
+        print(f"No decisions stored in {args.path}")
+    else:
+        print(summary.to_string(index=False))
+    return summary
+
+if __name__ == "__main__":
+    main()
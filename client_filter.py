@@ -0,0 +1,222 @@
+import base64
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from jinja2 import Template
+from schema import fill_category
+from report_generator import INCOME_BAND_EDGES, INCOME_BAND_LABELS
+
+def _b64(values, dtype: str) -> str:
+    """
+    Base64 of an array's little-endian bytes, decoded in the browser into a typed array
+    """
+    return base64.b64encode(np.ascontiguousarray(values, dtype=dtype).tobytes()).decode('ascii')
+
+def build_search_bundle(df: pd.DataFrame, category_colors: Dict[str, str]) -> Dict:
+    """
+    Pack the locations into a compact bundle for in-browser filtering and search
+
+    Coordinates, ratings and incomes travel as Float32Arrays and categories
+    and planning areas as small integer codes. Ratings and incomes also come
+    pre-sorted with the matching row ids, so a threshold or income band is a
+    binary search. Names are tokenised into a sorted inverted index (token ->
+    row ids) that supports prefix search.
+    """
+    df = df[df['latitude'].notna() & df['longitude'].notna()].reset_index(drop=True)
+
+    category_codes, categories = pd.factorize(fill_category(df['category'], 'Others'), sort=True)
+    area_codes, areas = pd.factorize(fill_category(df['planning_area'], 'Unknown'), sort=True)
+
+    rating = df['rating'].to_numpy(dtype=float)
+    rated = np.flatnonzero(~np.isnan(rating))
+    rating_order = rated[np.argsort(rating[rated], kind='stable')]
+
+    income = df['weighted_average_income'].to_numpy(dtype=float)
+    with_income = np.flatnonzero(income > 0)
+    income_order = with_income[np.argsort(income[with_income], kind='stable')]
+
+    # Inverted name index: one posting per (token, row), grouped by sorted token
+    tokens = df['name'].fillna('').str.lower().str.findall(r'[a-z0-9]+').explode().dropna()
+    postings = (pd.DataFrame({'token': tokens.to_numpy(dtype=str), 'id': tokens.index.to_numpy()})
+                .drop_duplicates().sort_values(['token', 'id'], kind='stable'))
+    index_tokens, token_starts = np.unique(postings['token'].to_numpy(), return_index=True)
+    offsets = np.append(token_starts, len(postings))
+
+    others = category_colors.get('Others', '#F7DC6F')
+    return {
+        'n': len(df),
+        'names': df['name'].fillna('').tolist(),
+        'categories': categories.tolist(),
+        'colors': [category_colors.get(category, others) for category in categories],
+        'areas': areas.tolist(),
+        'income_bands': [
+            {'label': label, 'min': float(low), 'max': None if np.isinf(high) else float(high)}
+            for label, low, high in zip(INCOME_BAND_LABELS, INCOME_BAND_EDGES[:-1], INCOME_BAND_EDGES[1:])
+        ],
+        'lat': _b64(df['latitude'], '<f4'),
+        'lng': _b64(df['longitude'], '<f4'),
+        'category': _b64(category_codes, '<u1'),
+        'area': _b64(area_codes, '<u2'),
+        'rating_order': _b64(rating_order, '<u4'),
+        'sorted_rating': _b64(rating[rating_order], '<f4'),
+        'income_order': _b64(income_order, '<u4'),
+        'sorted_income': _b64(income[income_order], '<f4'),
+        'tokens': index_tokens.tolist(),
+        'offsets': _b64(offsets, '<u4'),
+        'postings': _b64(postings['id'], '<u4'),
+    }
+
+class FilterSearchPanel(MacroElement):
+    """
+    Map control that filters and searches the bundled locations in the browser
+
+    layer_names are the JavaScript names of the map layers holding the
+    regular location markers. While a filter is active those that are
+    visible are taken off the map, so only the matching studios show; they
+    come back when the filter is cleared.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var B = {{ this.bundle|tojson }};
+            var map = {{ this._parent.get_name() }};
+            function decode(b64, Type) {
+                var bin = atob(b64), bytes = new Uint8Array(bin.length);
+                for (var i = 0; i < bin.length; i++) { bytes[i] = bin.charCodeAt(i); }
+                return new Type(bytes.buffer);
+            }
+            var lat = decode(B.lat, Float32Array), lng = decode(B.lng, Float32Array);
+            var category = decode(B.category, Uint8Array), area = decode(B.area, Uint16Array);
+            var ratingOrder = decode(B.rating_order, Uint32Array), sortedRating = decode(B.sorted_rating, Float32Array);
+            var incomeOrder = decode(B.income_order, Uint32Array), sortedIncome = decode(B.sorted_income, Float32Array);
+            var offsets = decode(B.offsets, Uint32Array), postings = decode(B.postings, Uint32Array);
+
+            function lowerBound(arr, value) {
+                var lo = 0, hi = arr.length;
+                while (lo < hi) { var mid = (lo + hi) >> 1; if (arr[mid] < value) { lo = mid + 1; } else { hi = mid; } }
+                return lo;
+            }
+            // Mark ids whose sorted value lies in [low, high); bounds are rounded to float32 like the values
+            function rangeMask(order, sorted, low, high) {
+                var mask = new Uint8Array(B.n), end = lowerBound(sorted, Math.fround(high));
+                for (var i = lowerBound(sorted, Math.fround(low)); i < end; i++) { mask[order[i]] = 1; }
+                return mask;
+            }
+            // Every query term must prefix-match a token of the name
+            function nameMask(query) {
+                var terms = query.toLowerCase().match(/[a-z0-9]+/g), result = null;
+                if (!terms) { return null; }
+                terms.forEach(function (term) {
+                    var hits = new Uint8Array(B.n);
+                    for (var t = lowerBound(B.tokens, term); t < B.tokens.length && B.tokens[t].lastIndexOf(term, 0) === 0; t++) {
+                        for (var p = offsets[t]; p < offsets[t + 1]; p++) { hits[postings[p]] = 1; }
+                    }
+                    if (result) { for (var i = 0; i < B.n; i++) { result[i] &= hits[i]; } } else { result = hits; }
+                });
+                return result;
+            }
+            function options(labels, all) {
+                return '<option value="">' + all + '</option>' + labels.map(function (label, i) {
+                    return '<option value="' + i + '">' + String(label).replace(/</g, '&lt;') + '</option>';
+                }).join('');
+            }
+
+            var renderer = L.canvas();
+            var results = L.layerGroup().addTo(map);
+            var locationLayers = [{{ this.layer_names|join(', ') }}];
+            var hiddenLayers = null;
+            function showLocationLayers(show) {
+                if (show && hiddenLayers) {
+                    hiddenLayers.forEach(function (layer) { map.addLayer(layer); });
+                    hiddenLayers = null;
+                } else if (!show && !hiddenLayers) {
+                    hiddenLayers = locationLayers.filter(function (layer) { return map.hasLayer(layer); });
+                    hiddenLayers.forEach(function (layer) { map.removeLayer(layer); });
+                }
+            }
+            var control = L.control({position: 'bottomleft'});
+            control.onAdd = function () {
+                var div = L.DomUtil.create('div');
+                div.style.cssText = 'background: white; padding: 8px; border: 2px solid grey; border-radius: 5px; font-size: 12px; width: 230px;';
+                div.innerHTML = '<b>Filter &amp; Search</b>'
+                    + '<input data-f="name" type="search" placeholder="Search by name" style="width: 100%; margin: 4px 0;">'
+                    + '<select data-f="category" style="width: 100%; margin: 2px 0;">' + options(B.categories, 'All categories') + '</select>'
+                    + '<select data-f="area" style="width: 100%; margin: 2px 0;">' + options(B.areas, 'All planning areas') + '</select>'
+                    + '<select data-f="band" style="width: 100%; margin: 2px 0;">'
+                    + options(B.income_bands.map(function (b) { return b.label; }), 'All income bands') + '</select>'
+                    + '<label>Min rating <span data-f="rating-label">any</span>'
+                    + '<input data-f="rating" type="range" min="0" max="5" step="0.1" value="0" style="width: 100%;"></label>'
+                    + '<div data-f="count" style="margin-top: 4px;"></div>'
+                    + '<div data-f="list" style="max-height: 150px; overflow-y: auto;"></div>';
+                L.DomEvent.disableClickPropagation(div);
+                L.DomEvent.disableScrollPropagation(div);
+                return div;
+            };
+            control.addTo(map);
+            var panel = control.getContainer();
+            function field(name) { return panel.querySelector('[data-f="' + name + '"]'); }
+
+            function apply() {
+                var query = field('name').value, cat = field('category').value, ar = field('area').value;
+                var band = field('band').value, minRating = parseFloat(field('rating').value);
+                field('rating-label').textContent = minRating > 0 ? minRating.toFixed(1) + '+' : 'any';
+                results.clearLayers();
+                field('list').innerHTML = '';
+                if (!query && cat === '' && ar === '' && band === '' && !(minRating > 0)) {
+                    field('count').textContent = B.n + ' studios';
+                    showLocationLayers(true);
+                    return;
+                }
+                showLocationLayers(false);
+                var masks = [nameMask(query)];
+                if (minRating > 0) { masks.push(rangeMask(ratingOrder, sortedRating, minRating, Infinity)); }
+                if (band !== '') {
+                    var b = B.income_bands[band];
+                    masks.push(rangeMask(incomeOrder, sortedIncome, b.min, b.max === null ? Infinity : b.max));
+                }
+                var matches = [];
+                for (var i = 0; i < B.n; i++) {
+                    if (cat !== '' && category[i] != cat) { continue; }
+                    if (ar !== '' && area[i] != ar) { continue; }
+                    var keep = true;
+                    for (var m = 0; m < masks.length && keep; m++) { keep = masks[m] === null || masks[m][i] === 1; }
+                    if (keep) { matches.push(i); }
+                }
+                field('count').textContent = matches.length + ' of ' + B.n + ' studios';
+                matches.forEach(function (id) {
+                    var marker = L.circleMarker([lat[id], lng[id]], {
+                        renderer: renderer, radius: 6, color: '#333', weight: 1,
+                        fillColor: B.colors[category[id]], fillOpacity: 0.9
+                    });
+                    if (window.fitnessPopups) {
+                        marker.bindPopup('Loading...', {maxWidth: 300}).on('popupopen', fitnessPopups.open);
+                        marker.options.placeId = id;
+                    } else {
+                        marker.bindPopup(B.names[id].replace(/</g, '&lt;'));
+                    }
+                    marker.addTo(results);
+                });
+                field('list').innerHTML = matches.slice(0, 50).map(function (id) {
+                    return '<div data-id="' + id + '" style="cursor: pointer; padding: 1px 0;">'
+                        + B.names[id].replace(/</g, '&lt;') + '</div>';
+                }).join('');
+            }
+
+            ['name', 'category', 'area', 'band', 'rating'].forEach(function (name) {
+                L.DomEvent.on(field(name), 'input change', apply);
+            });
+            L.DomEvent.on(field('list'), 'click', function (e) {
+                var id = e.target.getAttribute('data-id');
+                if (id !== null) { map.setView([lat[id], lng[id]], Math.max(map.getZoom(), 16)); }
+            });
+            apply();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, bundle: Dict, layer_names: Optional[List[str]] = None):
+        super().__init__()
+        self._name = 'FilterSearchPanel'
+        self.bundle = bundle
+        self.layer_names = layer_names or []
@@ -0,0 +1,254 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Sequence, Tuple, Union
+
+# Named palettes, listed from low to high values
+PALETTES = {
+    'blue_cyan_red': ['#0000ff', '#00ffff', '#ff0000'],
+    'blues': ['#ccccff', '#9999ff', '#6666ff', '#0000ff'],
+    'yellow_orange_red': ['#ffffb2', '#fecc5c', '#fd8d3c', '#e31a1c'],
+}
+METHODS = ('linear', 'log', 'quantile', 'jenks', 'manual')
+DEFAULT_NAN_COLOR = '#999999'
+
+# Jenks breaks are computed on at most this many quantiles of the data
+JENKS_MAX_SAMPLE = 1000
+
+# Two-digit hex for every channel value, so colours are built by indexing instead of formatting
+_HEX = np.array([f'{i:02x}' for i in range(256)], dtype=object)
+
+def hex_to_rgb(colors: Sequence[str]) -> np.ndarray:
+    """
+    Convert '#rrggbb' strings to an (n, 3) array of channel values
+    """
+    return np.array([[int(c.lstrip('#')[i:i + 2], 16) for i in (0, 2, 4)] for c in colors], dtype=float)
+
+def rgb_to_hex(rgb: np.ndarray) -> np.ndarray:
+    """
+    Convert an (n, 3) array of channel values to '#rrggbb' strings
+    """
+    rgb = np.clip(np.rint(rgb), 0, 255).astype(int)
+    return '#' + _HEX[rgb[:, 0]] + _HEX[rgb[:, 1]] + _HEX[rgb[:, 2]]
+
+def interpolate_palette(palette: Sequence[str], n: int) -> np.ndarray:
+    """
+    Sample n evenly spaced colours along a palette's gradient
+    """
+    if n == len(palette):
+        return np.asarray(palette, dtype=object)
+    stops = hex_to_rgb(palette)
+    positions = np.linspace(0, 1, len(stops))
+    t = np.linspace(0, 1, n)
+    return rgb_to_hex(np.column_stack([np.interp(t, positions, stops[:, c]) for c in range(3)]))
+
+def jenks_breaks(values: np.ndarray, classes: int) -> np.ndarray:
+    """
+    Fisher-Jenks natural breaks, returned as classes + 1 edges
+
+    Minimises the within-class sum of squared deviations by dynamic
+    programming over the sorted values. Each class step is one vectorised
+    pass over an (n, n) cost matrix, so large inputs are first reduced to
+    JENKS_MAX_SAMPLE evenly spaced quantiles.
+    """
+    values = np.sort(values[~np.isnan(values)])
+    if len(values) > JENKS_MAX_SAMPLE:
+        values = np.quantile(values, np.linspace(0, 1, JENKS_MAX_SAMPLE))
+    n = len(values)
+    classes = min(classes, len(np.unique(values)))
+    if classes < 2:
+        return np.array([values[0], values[-1]]) if n else np.array([])
+
+    # Sum of squared deviations of values[i:j] for every i < j, from prefix sums
+    s1 = np.concatenate([[0.0], np.cumsum(values)])
+    s2 = np.concatenate([[0.0], np.cumsum(values ** 2)])
+    i = np.arange(n + 1)[:, np.newaxis]
+    j = np.arange(n + 1)[np.newaxis, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ssd = s2[j] - s2[i] - (s1[j] - s1[i]) ** 2 / (j - i)
+    ssd[j <= i] = np.inf
+
+    # cost[j] is the best cost of splitting values[:j] into the classes so far
+    cost = ssd[0].copy()
+    starts = []
+    for _ in range(classes - 1):
+        total = cost[:, np.newaxis] + ssd
+        start = np.argmin(total, axis=0)
+        cost = total[start, np.arange(n + 1)]
+        starts.append(start)
+
+    # Walk back from the full range to recover where each class starts
+    edges = [values[-1]]
+    end = n
+    for start in reversed(starts):
+        end = start[end]
+        edges.append(values[end])
+    edges.append(values[0])
+    return np.array(edges[::-1])
+
+class ColorScale:
+    """
+    Map a whole column of values to palette colours at once.
+
+    linear and log scales interpolate continuously along the palette (or use
+    equal-interval classes when `classes` is given); quantile, jenks and
+    manual scales assign each value to a class and colour it with one palette
+    entry. Call the scale on a Series to fit it and colour it in one step, so
+    it can be passed anywhere a colour function is expected.
+    """
+    def __init__(self, palette: Union[str, Sequence[str]] = 'blue_cyan_red', method: str = 'linear',
+                 classes: Optional[int] = None, breaks: Optional[Sequence[float]] = None,
+                 nan_color: str = DEFAULT_NAN_COLOR):
+        if method not in METHODS:
+            raise ValueError(f"Unknown colour scale method '{method}'; choose from {METHODS}")
+        if method == 'manual' and not breaks:
+            raise ValueError("A manual colour scale needs breaks")
+        self.palette = list(PALETTES[palette] if isinstance(palette, str) else palette)
+        self.method = method
+        self.classes = len(breaks) + 1 if method == 'manual' else classes
+        if self.classes is None and method in ('quantile', 'jenks'):
+            self.classes = len(self.palette)
+        self.manual_breaks = np.asarray(breaks, dtype=float) if breaks else None
+        self.nan_color = nan_color
+        self.domain = (np.nan, np.nan)
+        self.edges = np.array([])
+
+    @property
+    def continuous(self) -> bool:
+        return self.classes is None
+
+    def class_colors(self) -> np.ndarray:
+        """
+        One colour per class, from low to high
+        """
+        return interpolate_palette(self.palette, self.classes)
+
+    def _transform(self, values: np.ndarray) -> np.ndarray:
+        if self.method == 'log':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(values > 0, np.log10(values), np.nan)
+        return values
+
+    def fit(self, values) -> 'ColorScale':
+        """
+        Compute the value domain and class edges from the data
+        """
+        values = np.asarray(values, dtype=float)
+        valid = values[~np.isnan(self._transform(values))]
+        if valid.size == 0:
+            self.domain = (np.nan, np.nan)
+            self.edges = np.array([])
+            return self
+        self.domain = (valid.min(), valid.max())
+
+        if self.method == 'manual':
+            self.edges = np.concatenate([[min(self.domain[0], self.manual_breaks[0])], self.manual_breaks,
+                                         [max(self.domain[1], self.manual_breaks[-1])]])
+        elif self.method == 'quantile':
+            self.edges = np.quantile(valid, np.linspace(0, 1, self.classes + 1))
+        elif self.method == 'jenks':
+            self.edges = jenks_breaks(valid, self.classes)
+        elif not self.continuous:
+            low, high = self._transform(np.array(self.domain))
+            self.edges = np.linspace(low, high, self.classes + 1)
+            if self.method == 'log':
+                self.edges = 10 ** self.edges
+        else:
+            self.edges = np.array(self.domain)
+        return self
+
+    def normalize(self, values) -> np.ndarray:
+        """
+        Position of each value between the domain minimum (0) and maximum (1)
+        """
+        transformed = self._transform(np.asarray(values, dtype=float))
+        low, high = self._transform(np.array(self.domain, dtype=float))
+        if not high > low:
+            return np.where(np.isnan(transformed), np.nan, 0.5)
+        return np.clip((transformed - low) / (high - low), 0, 1)
+
+    def classify(self, values) -> np.ndarray:
+        """
+        Class index of each value (0 is the lowest class), or -1 for missing values
+        """
+        values = np.asarray(values, dtype=float)
+        if len(self.edges) < 2:
+            return np.full(len(values), -1)
+        classes = np.searchsorted(self.edges[1:-1], values, side='right')
+        classes = np.minimum(classes, len(self.edges) - 2)
+        return np.where(np.isnan(self._transform(values)), -1, classes)
+
+    def colors(self, values) -> pd.Series:
+        """
+        Colour every value, keeping the input's index when given a Series
+        """
+        index = values.index if isinstance(values, pd.Series) else None
+        if self.continuous:
+            t = self.normalize(values)
+            lut = interpolate_palette(self.palette, 256)
+            positions = np.rint(np.nan_to_num(t) * 255).astype(int)
+            colors = np.where(np.isnan(t), self.nan_color, lut[positions])
+        else:
+            classes = self.classify(values)
+            lookup = np.append(self.class_colors(), self.nan_color)
+            colors = lookup[classes]
+        return pd.Series(colors, index=index, dtype=object)
+
+    def __call__(self, values) -> pd.Series:
+        return self.fit(values).colors(values)
+
+    def legend_entries(self, value_format: str = '${:,.0f}', labels: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+        """
+        (colour, label) pairs from low to high; continuous scales give their end points
+        """
+        if len(self.edges) < 2:
+            return []
+        if self.continuous:
+            return [(self.palette[0], value_format.format(self.edges[0])),
+                    (self.palette[-1], value_format.format(self.edges[-1]))]
+        if labels is None:
+            labels = [f"{value_format.format(low)} - {value_format.format(high)}"
+                      for low, high in zip(self.edges[:-1], self.edges[1:])]
+        return list(zip(self.class_colors(), labels))
+
+    def legend_items_html(self, value_format: str = '${:,.0f}', labels: Optional[List[str]] = None,
+                          swatch_size: int = 15) -> str:
+        """
+        Legend swatches (highest class first) or a gradient bar, for embedding in a panel
+        """
+        entries = self.legend_entries(value_format, labels)
+        if not entries:
+            return ''
+        if self.continuous:
+            gradient = ', '.join(self.palette)
+            return f"""
+            <div style="margin: 5px 0;">
+                <div style="height: {swatch_size}px; background: linear-gradient(to right, {gradient});"></div>
+                <div style="display: flex; justify-content: space-between;">
+                    <span>{entries[0][1]}</span><span>{entries[-1][1]}</span>
+                </div>
+            </div>"""
+        rows = ''.join(
+            f"""
+                <div style="display: flex; align-items: center; margin: 2px 0;">
+                    <div style="width: {swatch_size}px; height: {swatch_size}px; background: {color}; margin-right: 10px;"></div>
+                    <span>{label}</span>
+                </div>"""
+            for color, label in reversed(entries)
+        )
+        return f"""
+            <div style="margin: 5px 0;">{rows}
+            </div>"""
+
+    def legend_html(self, title: str, value_format: str = '${:,.0f}', labels: Optional[List[str]] = None,
+                    position: str = 'bottom: 30px; right: 10px;') -> str:
+        """
+        A fixed-position legend panel for a folium map
+        """
+        return f"""
+        <div style="position: fixed; {position}
+                    background-color: white; border: 2px solid grey; z-index: 1000;
+                    font-size: 12px; padding: 10px; border-radius: 5px; min-width: 160px;
+                    box-shadow: 0 0 10px rgba(0,0,0,0.3);">
+            <h4 style="margin: 0 0 5px 0;">{title}</h4>{self.legend_items_html(value_format, labels)}
+        </div>
+        """
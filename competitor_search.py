@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Nearest-competitor and catchment queries over the final fitness locations.
+
+Studio coordinates are projected to a local equirectangular plane in metres
+and indexed with a KD-tree (one per category, built on first use), so
+batched k-nearest and radius queries run in compiled code.
+
+Usage:
+    python competitor_search.py --lat 1.3048 --lng 103.8318 --category Gym --k 10 --radius 1000
+    python competitor_search.py --queries sites.csv --radius 800 --output catchments.csv
+"""
+
+import argparse
+import os
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from geo_projection import project_coordinates
+from schema import load_locations
+
+FINAL_DATA_PATH = "data/final_fitness_locations.csv"
+
+class CompetitorIndex:
+    def __init__(self, df: pd.DataFrame, category_column: str = 'category'):
+        # Drop rows without usable coordinates (the extractor defaults them to 0)
+        valid = df['latitude'].notna() & df['longitude'].notna() & (df['latitude'] != 0) & (df['longitude'] != 0)
+        self.locations = df.loc[valid].reset_index(drop=True)
+        self.category_column = category_column
+        self.points = project_coordinates(self.locations['latitude'], self.locations['longitude'])
+        self.categories = self.locations[category_column].to_numpy()
+        self._trees: Dict[Optional[str], tuple] = {}
+
+    def _tree(self, category: Optional[str]):
+        """
+        Return (tree, row positions) for a category, or for all rows when category is None
+        """
+        if category not in self._trees:
+            # scipy.spatial is slow to import and only needed once a query runs
+            from scipy.spatial import cKDTree
+            if category is None:
+                positions = np.arange(len(self.points))
+            else:
+                positions = np.flatnonzero(self.categories == category)
+            self._trees[category] = (cKDTree(self.points[positions]), positions)
+        return self._trees[category]
+
+    def _results(self, query_ids: np.ndarray, positions: np.ndarray, distances: np.ndarray,
+                 ranks: np.ndarray) -> pd.DataFrame:
+        matches = self.locations.iloc[positions]
+        return pd.DataFrame({
+            'query_id': query_ids,
+            'rank': ranks,
+            'place_id': matches['place_id'].to_numpy(),
+            'name': matches['name'].to_numpy(),
+            'category': matches[self.category_column].to_numpy(),
+            'distance_m': distances,
+        })
+
+    def nearest(self, lat, lng, k: int = 10, category: Optional[str] = None,
+                max_distance_m: float = np.inf) -> pd.DataFrame:
+        """
+        Find the k nearest competitors for a batch of query points
+
+        Returns one row per (query_id, rank) match, where query_id is the
+        position of the query point in the input arrays. Queries with fewer
+        than k competitors inside max_distance_m return fewer rows.
+        """
+        tree, positions = self._tree(category)
+        queries = project_coordinates(np.atleast_1d(lat), np.atleast_1d(lng))
+        if len(positions) == 0 or len(queries) == 0:
+            return self._results(np.array([], dtype=int), np.array([], dtype=int), np.array([]), np.array([], dtype=int))
+
+        k = min(k, len(positions))
+        distances, indices = tree.query(queries, k=k, distance_upper_bound=max_distance_m)
+        distances = distances.reshape(len(queries), k)
+        indices = indices.reshape(len(queries), k)
+
+        found = np.isfinite(distances)
+        query_ids, ranks = np.nonzero(found)
+        return self._results(query_ids, positions[indices[found]], distances[found], ranks + 1)
+
+    def within_radius(self, lat, lng, radius_m: float, category: Optional[str] = None) -> pd.DataFrame:
+        """
+        Find every competitor within radius_m of each query point (catchment query)
+
+        Returns one row per match, sorted by query and distance.
+        """
+        tree, positions = self._tree(category)
+        queries = project_coordinates(np.atleast_1d(lat), np.atleast_1d(lng))
+        if len(positions) == 0 or len(queries) == 0:
+            return self._results(np.array([], dtype=int), np.array([], dtype=int), np.array([]), np.array([], dtype=int))
+
+        neighbours = tree.query_ball_point(queries, r=radius_m)
+        counts = np.fromiter((len(n) for n in neighbours), dtype=np.int64, count=len(neighbours))
+        query_ids = np.repeat(np.arange(len(queries)), counts)
+        indices = np.fromiter((i for n in neighbours for i in n), dtype=np.int64, count=counts.sum())
+
+        distances = np.hypot(*(self.points[positions[indices]] - queries[query_ids]).T)
+        order = np.lexsort((distances, query_ids))
+        query_ids, indices, distances = query_ids[order], indices[order], distances[order]
+
+        # Rank within each query's group
+        group_starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        ranks = np.arange(len(query_ids)) - np.repeat(group_starts, counts) + 1
+        return self._results(query_ids, positions[indices], distances, ranks)
+
+    def catchment_counts(self, lat, lng, radius_m: float, category: Optional[str] = None) -> np.ndarray:
+        """
+        Count competitors within radius_m of each query point
+        """
+        tree, positions = self._tree(category)
+        queries = project_coordinates(np.atleast_1d(lat), np.atleast_1d(lng))
+        if len(positions) == 0:
+            return np.zeros(len(queries), dtype=np.int64)
+        return np.asarray(tree.query_ball_point(queries, r=radius_m, return_length=True), dtype=np.int64)
+
+def load_competitor_index(filepath: str = FINAL_DATA_PATH, category_column: str = 'category') -> CompetitorIndex:
+    """
+    Load the final locations dataset and build a competitor index over it
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"Final data file not found: {filepath}")
+    df = load_locations(filepath)
+    print(f"Indexed {len(df)} fitness locations from {filepath}")
+    return CompetitorIndex(df, category_column)
+
+def main():
+    """
+    Command line entry point for competitor and catchment queries
+    """
+    parser = argparse.ArgumentParser(description='Nearest-competitor and catchment queries')
+    parser.add_argument('--lat', type=float, help='Latitude of a single query site')
+    parser.add_argument('--lng', type=float, help='Longitude of a single query site')
+    parser.add_argument('--queries', help='CSV of query sites with latitude/longitude columns')
+    parser.add_argument('--category', help='Only consider competitors in this category')
+    parser.add_argument('--k', type=int, default=10, help='Number of nearest competitors (default: 10)')
+    parser.add_argument('--radius', type=float, help='Search radius in metres')
+    parser.add_argument('--catchment', action='store_true',
+                       help='Return every competitor within --radius instead of the k nearest')
+    parser.add_argument('--data', default=FINAL_DATA_PATH, help=f'Locations dataset (default: {FINAL_DATA_PATH})')
+    parser.add_argument('--category-column', default='category', help='Column holding the category')
+    parser.add_argument('--output', help='Write results to this CSV instead of printing them')
+
+    args = parser.parse_args()
+
+    if args.queries:
+        sites = pd.read_csv(args.queries)
+        lat, lng = sites['latitude'].to_numpy(), sites['longitude'].to_numpy()
+    elif args.lat is not None and args.lng is not None:
+        lat, lng = np.array([args.lat]), np.array([args.lng])
+    else:
+        parser.error('Provide either --lat/--lng or --queries')
+
+    if args.catchment and args.radius is None:
+        parser.error('--catchment requires --radius')
+
+    index = load_competitor_index(args.data, args.category_column)
+
+    if args.catchment:
+        results = index.within_radius(lat, lng, args.radius, category=args.category)
+    else:
+        max_distance = args.radius if args.radius is not None else np.inf
+        results = index.nearest(lat, lng, k=args.k, category=args.category, max_distance_m=max_distance)
+
+    if args.output:
+        results.to_csv(args.output, index=False)
+        print(f"Saved {len(results)} matches for {len(lat)} queries to {args.output}")
+    else:
+        for _, row in results.iterrows():
+            print(f"[{row['query_id']}] {row['rank']:2d}. {row['name']} ({row['category']}) - {row['distance_m']:.0f} m")
+
+    return results
+
+if __name__ == "__main__":
+    main()
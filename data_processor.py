@@ -1,12 +1,39 @@
 import pandas as pd
 import numpy as np
 import json
-from typing import Dict, List, Any
+import argparse
+from typing import Dict, List, Any, Optional
 import os
+from concurrent.futures import ProcessPoolExecutor
+from aggregate_cube import get_aggregate_cube, PlanningAreaAggregateCube
+from schema import LOCATION_SCHEMA
+from postal_index import PostalSectorIndex, has_coordinates
+from area_registry import PLANNING_AREA_REGISTRY
+from classification_cache import ClassificationCache, ruleset_hash
 from config import GOOGLE_MAPS_OUTPUT, PLANNING_AREAS_OUTPUT, INCOME_DATA_OUTPUT, COMBINED_DATA_OUTPUT
 
+DEFAULT_CHUNKSIZE = 100000  # Locations per batch in chunked mode
+PARTITIONS_PER_WORKER = 4  # Smaller partitions keep workers busy when some rows are slower
+
+# Rules and reference tables for worker processes, set once per worker by _init_parallel_worker
+_WORKER_STATE: Dict[str, Any] = {}
+
+def _init_parallel_worker(processor: 'DataProcessor', planning_areas_df: pd.DataFrame, income_df: pd.DataFrame):
+    """
+    Keep the processor and reference tables in the worker for every partition it handles
+    
+    With the fork start method these are inherited from the parent rather
+    than pickled; with spawn they are pickled once per worker, not per task.
+    """
+    _WORKER_STATE.update(processor=processor, planning_areas=planning_areas_df, income_data=income_df)
+
+def _process_partition(partition: pd.DataFrame) -> pd.DataFrame:
+    return _WORKER_STATE['processor'].process_locations(
+        partition, _WORKER_STATE['planning_areas'], _WORKER_STATE['income_data'], verbose=False
+    )
+
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, classifier_path: Optional[str] = None):
         self.fitness_categories = {
             'BFT': ['bft', 'bodyfit', 'body fit'],
             'Fitness Studio': ['fitness', 'studio', 'training', 'hiit', 'circuit', 'functional'],
@@ -17,6 +44,16 @@ class DataProcessor:
             'Cycling/Spin': ['spin', 'cycling', 'rhythm cycling', 'indoor cycling'],
             'Others': []  # Catch-all for anything not categorized
         }
+        # Postal sector lookup for locations without coordinates, set by load_reference_data
+        self.postal_index = None
+        # Category decisions by name and search query, kept across runs
+        self.classification_cache = ClassificationCache()
+        # Trained name classifier that replaces the keyword categories when given
+        self.classifier = None
+        if classifier_path:
+            # Imported here so keyword-only runs do not load scipy.optimize and pyarrow.compute
+            from name_classifier import NameClassifier
+            self.classifier = NameClassifier.load(classifier_path)
     
     def categorize_fitness_location(self, name: str, search_query: str) -> str:
         """
@@ -48,6 +85,15 @@ class DataProcessor:
             print("Fitness locations file not found!")
             data['fitness_locations'] = pd.DataFrame()
         
+        data.update(self.load_reference_data())
+        return data
+    
+    def load_reference_data(self) -> Dict[str, pd.DataFrame]:
+        """
+        Load the small planning area and income tables
+        """
+        data = {}
+        
         # Load planning areas
         if os.path.exists(PLANNING_AREAS_OUTPUT):
             data['planning_areas'] = pd.read_csv(PLANNING_AREAS_OUTPUT)
@@ -64,6 +110,11 @@ class DataProcessor:
             print("Income data file not found!")
             data['income_data'] = pd.DataFrame()
         
+        # Load the postal sector index built by postal_index.py, if any
+        self.postal_index = PostalSectorIndex.load()
+        if self.postal_index is not None:
+            print(f"Loaded {len(self.postal_index.table)} postal sectors")
+        
         return data
     
     def assign_planning_areas(self, fitness_df: pd.DataFrame, planning_areas_df: pd.DataFrame) -> pd.DataFrame:
@@ -75,29 +126,28 @@ class DataProcessor:
         
         # Create a copy to avoid modifying original
         df = fitness_df.copy()
-        df['planning_area'] = 'Unknown'
         
-        # For each fitness location, find the planning area it's in
-        for idx, location in df.iterrows():
-            lat = location['latitude']
-            lng = location['longitude']
-            
-            # Simple distance-based assignment (nearest centroid)
-            min_distance = float('inf')
-            nearest_area = 'Unknown'
-            
-            for _, area in planning_areas_df.iterrows():
-                area_lat = area['centroid_latitude']
-                area_lng = area['centroid_longitude']
-                
-                # Calculate simple Euclidean distance
-                distance = np.sqrt((lat - area_lat)**2 + (lng - area_lng)**2)
-                
-                if distance < min_distance:
-                    min_distance = distance
-                    nearest_area = area['planning_area_name']
-            
-            df.at[idx, 'planning_area'] = nearest_area
+        # Simple distance-based assignment (nearest centroid), for all locations at once
+        lat = df['latitude'].to_numpy(dtype=float)[:, np.newaxis]
+        lng = df['longitude'].to_numpy(dtype=float)[:, np.newaxis]
+        area_lat = planning_areas_df['centroid_latitude'].to_numpy(dtype=float)[np.newaxis, :]
+        area_lng = planning_areas_df['centroid_longitude'].to_numpy(dtype=float)[np.newaxis, :]
+        distance = np.sqrt((lat - area_lat)**2 + (lng - area_lng)**2)
+        
+        # Missing or (0, 0) placeholder coordinates never match
+        distance = np.where(np.isnan(distance), np.inf, distance)
+        distance[~has_coordinates(df)] = np.inf
+        nearest = distance.argmin(axis=1)
+        found = np.isfinite(distance[np.arange(len(df)), nearest])
+        names = planning_areas_df['planning_area_name'].to_numpy(dtype=object)
+        areas = np.where(found, names[nearest], 'Unknown')
+        
+        # Fall back to the postal sector in the address for locations without coordinates
+        if self.postal_index is not None and 'formatted_address' in df.columns and not found.all():
+            by_postcode = self.postal_index.assign(df[~found])
+            areas[~found] = np.where(pd.notna(by_postcode), by_postcode, 'Unknown')
+        
+        df['planning_area'] = areas
         
         return df
     
@@ -114,22 +164,12 @@ class DataProcessor:
             fitness_df['total_households'] = 0
             return fitness_df
         
-        # Normalize planning area names for matching
-        fitness_df['planning_area_normalized'] = fitness_df['planning_area'].str.upper()
-        income_df['planning_area_normalized'] = income_df['planning_area'].str.upper()
-        
-        # Merge on normalized planning area
-        merged_df = fitness_df.merge(
-            income_df[['planning_area_normalized', 'weighted_average_income', 'total_households']],
-            left_on='planning_area_normalized',
-            right_on='planning_area_normalized',
-            how='left'
+        # Join on planning area registry ids: one integer take per income column
+        income = PLANNING_AREA_REGISTRY.lookup(
+            fitness_df['planning_area'], income_df, 'planning_area', ['weighted_average_income', 'total_households']
         )
         
-        # Clean up temporary column
-        merged_df = merged_df.drop(columns=['planning_area_normalized'])
-        
-        return merged_df
+        return fitness_df.assign(**income)
     
     def process_and_combine_data(self) -> pd.DataFrame:
         """
@@ -144,31 +184,51 @@ class DataProcessor:
             print("No fitness locations data available!")
             return pd.DataFrame()
         
+        final_df = self.process_locations(data['fitness_locations'], data['planning_areas'], data['income_data'])
+        
+        print(f"Final dataset has {len(final_df)} fitness locations")
+        return final_df
+    
+    def process_locations(self, fitness_df: pd.DataFrame, planning_areas_df: pd.DataFrame,
+                          income_df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+        """
+        Categorize, assign planning areas, merge income and add derived columns
+        
+        Every step only looks at one location at a time, so a batch of rows
+        comes out the same whether it is processed alone or as part of the
+        whole dataset.
+        """
+        fitness_df = fitness_df.copy()
+        
         # Categorize fitness locations
-        print("Categorizing fitness locations...")
-        data['fitness_locations']['category'] = data['fitness_locations'].apply(
-            lambda row: self.categorize_fitness_location(row['name'], row['search_query']),
-            axis=1
-        )
+        if verbose:
+            print("Categorizing fitness locations...")
+        if self.classifier is not None:
+            fitness_df['category'] = self.classifier.predict(fitness_df['name'])
+        else:
+            # Only names and queries not categorized under the current keywords are evaluated
+            fitness_df['category'] = self.classification_cache.classify(
+                ruleset_hash('categorize_fitness_location', self.fitness_categories),
+                [fitness_df['name'], fitness_df['search_query']],
+                self.categorize_fitness_location
+            ) if not fitness_df.empty else pd.Series(dtype=object)
+            if verbose:
+                self.classification_cache.report("Categorized locations")
         
         # Assign planning areas
-        if not data['planning_areas'].empty:
-            print("Assigning planning areas...")
-            data['fitness_locations'] = self.assign_planning_areas(
-                data['fitness_locations'], 
-                data['planning_areas']
-            )
+        if not planning_areas_df.empty:
+            if verbose:
+                print("Assigning planning areas...")
+            fitness_df = self.assign_planning_areas(fitness_df, planning_areas_df)
         
         # Merge income data
-        if not data['income_data'].empty:
-            print("Merging income data...")
-            data['fitness_locations'] = self.merge_income_data(
-                data['fitness_locations'],
-                data['income_data']
-            )
+        if not income_df.empty:
+            if verbose:
+                print("Merging income data...")
+            fitness_df = self.merge_income_data(fitness_df, income_df)
         
         # Final processing
-        final_df = data['fitness_locations'].copy()
+        final_df = fitness_df
         
         # Fill missing values
         if 'weighted_average_income' in final_df.columns:
@@ -192,11 +252,91 @@ class DataProcessor:
         final_df['has_rating'] = final_df['rating'] > 0
         
         # Add search coverage analysis
-        final_df['search_coverage'] = final_df['search_location'].apply(lambda x: 'Local' if x != 'Singapore' else 'General')
+        final_df['search_coverage'] = np.where(final_df['search_location'] != 'Singapore', 'Local', 'General')
+        
+        return final_df
+    
+    def process_in_parallel(self, fitness_df: Optional[pd.DataFrame] = None, workers: Optional[int] = None,
+                            partitions: Optional[int] = None) -> pd.DataFrame:
+        """
+        Run process_locations over row partitions in a process pool
+        
+        Partitions are contiguous slices of the locations and the results are
+        concatenated in their original order, so the output is identical to
+        process_and_combine_data.
+        """
+        workers = workers or os.cpu_count() or 1
+        reference = self.load_reference_data()
+        if fitness_df is None:
+            fitness_df = pd.read_csv(GOOGLE_MAPS_OUTPUT) if os.path.exists(GOOGLE_MAPS_OUTPUT) else pd.DataFrame()
+        if fitness_df.empty:
+            print("No fitness locations data available!")
+            return pd.DataFrame()
+        
+        partitions = max(1, min(partitions or workers * PARTITIONS_PER_WORKER, len(fitness_df)))
+        bounds = np.linspace(0, len(fitness_df), partitions + 1).astype(int)
+        slices = [fitness_df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        print(f"Processing {len(fitness_df)} locations in {partitions} partitions on {workers} workers...")
+        
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_parallel_worker,
+            initargs=(self, reference['planning_areas'], reference['income_data'])
+        ) as executor:
+            results = list(executor.map(_process_partition, slices))
+        
+        final_df = pd.concat(results)
         
         print(f"Final dataset has {len(final_df)} fitness locations")
         return final_df
     
+    def process_in_chunks(self, input_paths: Optional[List[str]] = None, output_path: str = COMBINED_DATA_OUTPUT,
+                          chunksize: int = DEFAULT_CHUNKSIZE) -> Dict[str, Any]:
+        """
+        Stream locations through process_locations in fixed-size batches
+        
+        Only one batch of locations is in memory at a time; the planning area
+        and income tables stay resident. Each processed batch is appended to
+        output_path and folded into an aggregate cube, so the summary counts
+        and means are available without re-reading the output.
+        """
+        input_paths = input_paths or [GOOGLE_MAPS_OUTPUT]
+        print(f"Processing {', '.join(input_paths)} in chunks of {chunksize} rows...")
+        
+        reference = self.load_reference_data()
+        
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        cube = PlanningAreaAggregateCube()
+        columns = None
+        rows = 0
+        chunks = 0
+        
+        for input_path in input_paths:
+            if not os.path.exists(input_path):
+                print(f"Input file not found: {input_path}")
+                continue
+            for chunk in pd.read_csv(input_path, chunksize=chunksize):
+                processed = self.process_locations(chunk, reference['planning_areas'], reference['income_data'],
+                                                   verbose=False)
+                
+                # Keep the column order of the first batch so appended rows line up
+                if columns is None:
+                    columns = list(processed.columns)
+                processed = processed.reindex(columns=columns)
+                processed.to_csv(output_path, mode='w' if chunks == 0 else 'a', header=chunks == 0, index=False)
+                
+                cube.apply_changes(added=processed)
+                rows += len(processed)
+                chunks += 1
+                print(f"  Processed chunk {chunks} ({rows} locations so far)")
+        
+        if chunks == 0:
+            print("No fitness locations data available!")
+            return {'rows': 0, 'chunks': 0, 'output_file': None, 'cube': cube}
+        
+        print(f"Saved {rows} processed locations to {output_path}")
+        return {'rows': rows, 'chunks': chunks, 'output_file': output_path, 'cube': cube}
+    
     def save_combined_data(self, df: pd.DataFrame):
         """
         Save combined data to CSV
@@ -218,20 +358,25 @@ class DataProcessor:
         if df.empty:
             return {}
         
+        # Category/area counts and means come from the shared aggregate cube
+        cube = get_aggregate_cube(df)
+        overall = cube.overall()
+        category_totals = cube.category_totals()
+        
         summary = {
-            'total_locations': len(df),
-            'categories': df['category'].value_counts().to_dict(),
-            'planning_areas': df['planning_area'].value_counts().to_dict(),
-            'average_rating': df['rating'].mean(),
-            'locations_with_websites': df['has_website'].sum(),
-            'locations_with_phones': df['has_phone'].sum(),
-            'locations_with_ratings': df['has_rating'].sum(),
+            'total_locations': overall['total_locations'],
+            'categories': category_totals['location_count'].to_dict(),
+            'planning_areas': cube.area_totals()['location_count'].to_dict(),
+            'average_rating': overall['average_rating'],
+            'locations_with_websites': overall['locations_with_websites'],
+            'locations_with_phones': overall['locations_with_phones'],
+            'locations_with_ratings': overall['locations_with_ratings'],
             'search_coverage': df['search_coverage'].value_counts().to_dict(),
             'unique_search_locations': df['search_location'].nunique(),
-            'average_income_by_category': df.groupby('category')['weighted_average_income'].mean().to_dict(),
+            'average_income_by_category': category_totals['avg_income'].sort_index().to_dict(),
             'top_rated_locations': df.nlargest(10, 'rating')[['name', 'category', 'rating', 'planning_area']].to_dict('records'),
             'income_statistics': {
-                'mean': df['weighted_average_income'].mean(),
+                'mean': overall['average_income'],
                 'median': df['weighted_average_income'].median(),
                 'min': df['weighted_average_income'].min(),
                 'max': df['weighted_average_income'].max()
@@ -240,24 +385,50 @@ class DataProcessor:
         
         return summary
 
-def main():
+def main(chunksize: Optional[int] = None, workers: Optional[int] = None, classifier: Optional[str] = None):
     """
     Main function to process and combine all data
+    
+    With chunksize set, locations are streamed in batches of that many rows
+    and the summary comes from the aggregate cube built along the way. With
+    workers set, locations are processed in parallel across that many processes.
+    With classifier set to a saved name classifier, it assigns the categories
+    instead of the keyword lists.
     """
     print("Starting data processing and combination...")
     
     # Initialize processor
-    processor = DataProcessor()
+    processor = DataProcessor(classifier)
+    
+    if chunksize:
+        result = processor.process_in_chunks(chunksize=chunksize)
+        if result['rows']:
+            overall = result['cube'].overall()
+            print("\n" + "="*50)
+            print("SUMMARY STATISTICS")
+            print("="*50)
+            print(f"Total fitness locations: {overall['total_locations']}")
+            print(f"Average rating: {overall['average_rating']:.2f}")
+            print(f"Locations with websites: {overall['locations_with_websites']}")
+            print(f"Locations with phone numbers: {overall['locations_with_phones']}")
+            
+            print("\nCategories:")
+            for category, count in result['cube'].category_totals()['location_count'].items():
+                print(f"  {category}: {count}")
+        return result
     
     # Process and combine data
-    combined_df = processor.process_and_combine_data()
+    if workers and workers > 1:
+        combined_df = processor.process_in_parallel(workers=workers)
+    else:
+        combined_df = processor.process_and_combine_data()
     
     if not combined_df.empty:
         # Save combined data
         processor.save_combined_data(combined_df)
         
-        # Generate and print summary statistics
-        summary = processor.generate_summary_statistics(combined_df)
+        # Generate and print summary statistics on the compact in-memory form
+        summary = processor.generate_summary_statistics(LOCATION_SCHEMA.apply(combined_df))
         
         print("\n" + "="*50)
         print("SUMMARY STATISTICS")
@@ -284,4 +455,11 @@ def main():
     return combined_df
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Process and combine fitness, planning area and income data')
+    parser.add_argument('--chunksize', type=int,
+                       help=f'Stream locations in batches of this many rows (e.g. {DEFAULT_CHUNKSIZE})')
+    parser.add_argument('--workers', type=int, help='Process locations in parallel on this many processes')
+    parser.add_argument('--classifier', nargs='?', const='data/name_classifier.npz',
+                       help='Categorize with a trained name classifier (default path: data/name_classifier.npz)')
+    args = parser.parse_args()
+    main(args.chunksize, args.workers, args.classifier)
@@ -0,0 +1,157 @@
+import pandas as pd
+import numpy as np
+import os
+from typing import Dict, List, Optional
+from map_engine import get_geo_store
+from geo_projection import meters_per_degree, project_coordinates
+from schema import fill_category, load_locations
+from config import SINGAPORE_BOUNDS
+
+DEFAULT_RESOLUTIONS = [500, 1000, 2000]  # Cell sizes in metres
+DENSITY_GRID_OUTPUT = "data/density_grid_{resolution}m.csv"
+
+class DensityGridBinner:
+    """
+    Bin fitness locations into a square grid over SINGAPORE_BOUNDS.
+
+    Each location is mapped to its cell with integer arithmetic and all
+    per-category counts come from a single np.bincount, so the cost is
+    linear in the number of points with no Python loop over them.
+    """
+    def __init__(self, bounds: Dict[str, float] = SINGAPORE_BOUNDS, category_column: str = 'category'):
+        self.bounds = bounds
+        self.category_column = category_column
+        self.reference_latitude = (bounds['north'] + bounds['south']) / 2
+
+    def grid_shape(self, resolution_m: float):
+        """
+        Return (cell height in degrees, cell width in degrees, rows, cols) for a resolution
+        """
+        meters_lat, meters_lng = meters_per_degree(self.reference_latitude)
+        cell_lat = resolution_m / meters_lat
+        cell_lng = resolution_m / meters_lng
+        rows = int(np.ceil((self.bounds['north'] - self.bounds['south']) / cell_lat))
+        cols = int(np.ceil((self.bounds['east'] - self.bounds['west']) / cell_lng))
+        return cell_lat, cell_lng, rows, cols
+
+    def load_area_income(self) -> Optional[pd.DataFrame]:
+        """
+        Planning area centroids with their weighted average income, from the shared geometry store
+        """
+        store = get_geo_store()
+        if store.empty:
+            print("Planning areas or income data not found. Skipping income interpolation.")
+            return None
+
+        areas = store.areas[store.areas['weighted_average_income'] > 0]
+        return areas[['planning_area_name', 'centroid_latitude', 'centroid_longitude', 'weighted_average_income']]
+
+    def interpolate_income(self, lat: np.ndarray, lng: np.ndarray, area_income: pd.DataFrame,
+                           power: float = 2.0) -> np.ndarray:
+        """
+        Inverse-distance-weighted income at each point from planning area centroids
+        """
+        points = project_coordinates(lat, lng)
+        centroids = project_coordinates(area_income['centroid_latitude'], area_income['centroid_longitude'])
+        distances = np.hypot(
+            points[:, np.newaxis, 0] - centroids[np.newaxis, :, 0],
+            points[:, np.newaxis, 1] - centroids[np.newaxis, :, 1]
+        )
+        weights = 1.0 / np.maximum(distances, 1.0) ** power
+        incomes = area_income['weighted_average_income'].to_numpy(dtype=float)
+        return (weights @ incomes) / weights.sum(axis=1)
+
+    def bin_locations(self, df: pd.DataFrame, resolution_m: float,
+                      area_income: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Aggregate locations into grid cells at one resolution
+
+        Returns one row per non-empty cell with its bounds, centre, total and
+        per-category counts, and the interpolated area income at its centre.
+        """
+        cell_lat, cell_lng, rows, cols = self.grid_shape(resolution_m)
+
+        lat = df['latitude'].to_numpy(dtype=float)
+        lng = df['longitude'].to_numpy(dtype=float)
+        row = np.floor((lat - self.bounds['south']) / cell_lat).astype(np.int64)
+        col = np.floor((lng - self.bounds['west']) / cell_lng).astype(np.int64)
+        inside = (row >= 0) & (row < rows) & (col >= 0) & (col < cols)
+
+        category_codes, categories = pd.factorize(fill_category(df[self.category_column], 'Others'))
+        cell = row[inside] * cols + col[inside]
+        counts = np.bincount(
+            cell * len(categories) + category_codes[inside],
+            minlength=rows * cols * len(categories)
+        ).reshape(rows * cols, len(categories))
+
+        occupied = np.flatnonzero(counts.sum(axis=1))
+        occupied_rows, occupied_cols = np.divmod(occupied, cols)
+        south = self.bounds['south'] + occupied_rows * cell_lat
+        west = self.bounds['west'] + occupied_cols * cell_lng
+
+        grid = pd.DataFrame({
+            'resolution_m': resolution_m,
+            'cell_id': occupied,
+            'row': occupied_rows,
+            'col': occupied_cols,
+            'south': south,
+            'west': west,
+            'north': south + cell_lat,
+            'east': west + cell_lng,
+            'center_latitude': south + cell_lat / 2,
+            'center_longitude': west + cell_lng / 2,
+            'total_count': counts[occupied].sum(axis=1),
+        })
+        category_counts = pd.DataFrame(
+            counts[occupied], columns=[f"count_{category}" for category in categories]
+        )
+        grid = pd.concat([grid, category_counts], axis=1)
+
+        if area_income is not None and not area_income.empty and not grid.empty:
+            grid['interpolated_income'] = self.interpolate_income(
+                grid['center_latitude'].to_numpy(), grid['center_longitude'].to_numpy(), area_income
+            )
+        else:
+            grid['interpolated_income'] = np.nan
+
+        return grid
+
+    def build_grids(self, df: pd.DataFrame, resolutions: List[float] = DEFAULT_RESOLUTIONS) -> Dict[float, pd.DataFrame]:
+        """
+        Bin locations at several resolutions, sharing one income lookup
+        """
+        area_income = self.load_area_income()
+        return {resolution: self.bin_locations(df, resolution, area_income) for resolution in resolutions}
+
+    def save_grids(self, grids: Dict[float, pd.DataFrame]):
+        """
+        Save each resolution's grid to its own CSV file
+        """
+        for resolution, grid in grids.items():
+            filepath = DENSITY_GRID_OUTPUT.format(resolution=int(resolution))
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+            grid.to_csv(filepath, index=False)
+            print(f"Saved {len(grid)} grid cells at {resolution}m to {filepath}")
+
+def main():
+    """
+    Main function to precompute density grids for the final fitness locations
+    """
+    print("Starting density grid binning...")
+
+    final_data_path = "data/final_fitness_locations.csv"
+    if not os.path.exists(final_data_path):
+        print(f"Final data file not found: {final_data_path}")
+        return {}
+
+    df = load_locations(final_data_path)
+    print(f"Loaded {len(df)} fitness locations")
+
+    binner = DensityGridBinner()
+    grids = binner.build_grids(df)
+    binner.save_grids(grids)
+
+    return grids
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Local planar projection shared by the distance and area calculations.
+
+Singapore spans well under one degree, so an equirectangular projection
+around a reference latitude is accurate to a fraction of a percent.
+Latitude and longitude map to metres with two multiplications, which is
+what the KD-tree search, the density grid and the polygon areas need.
+"""
+
+import numpy as np
+
+# Metres per degree for the local equirectangular projection around Singapore
+METERS_PER_DEGREE_LAT = 110574.0
+METERS_PER_DEGREE_LNG = 111320.0
+SINGAPORE_REFERENCE_LATITUDE = 1.3521
+
+def meters_per_degree(reference_latitude: float = SINGAPORE_REFERENCE_LATITUDE):
+    """
+    Return (metres per degree of latitude, metres per degree of longitude) at a reference latitude
+    """
+    return METERS_PER_DEGREE_LAT, METERS_PER_DEGREE_LNG * np.cos(np.radians(reference_latitude))
+
+def project_coordinates(lat, lng, reference_latitude: float = SINGAPORE_REFERENCE_LATITUDE) -> np.ndarray:
+    """
+    Project latitude/longitude arrays to an (n, 2) array of planar metres
+    """
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    meters_lat, meters_lng = meters_per_degree(reference_latitude)
+    return np.column_stack([lng * meters_lng, lat * meters_lat])
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Batch geocoding for locations without coordinates.
+
+Rows added by hand to the final dataset, and crawl results whose geometry
+was missing (extract_location_data defaults them to 0, 0), are geocoded in
+one pass against OneMap's search endpoint:
+
+- each row is searched by the postcode in its address when there is one
+  (OneMap resolves postcodes exactly), otherwise by its address or name
+- identical queries are sent once, through a bounded pool of concurrent
+  requests driven by asyncio, started no faster than OneMap's rate limit
+  allows; each worker thread has its own HTTP session
+- every answer, including "not found", goes into a persistent cache keyed
+  by the normalised query, so re-runs only hit the network for new rows
+
+LocalGeocodeStub answers from locations we already have coordinates for
+and can stand in for OneMap offline or in tests.
+
+Usage:
+    python geocoder.py data/final_fitness_locations.csv
+    python geocoder.py data/final_fitness_locations.csv --offline --output data/geocoded.csv
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import requests
+from postal_index import extract_postal_codes, has_coordinates
+
+ONEMAP_SEARCH_URL = "https://www.onemap.gov.sg/api/common/elastic/search"
+GEOCODE_CACHE_PATH = "data/geocode_cache.json"
+DEFAULT_CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 240  # OneMap allows about 250 requests a minute
+REQUEST_TIMEOUT = 10
+
+def normalize_query(query: str) -> str:
+    """
+    Cache key for a query: lower case with runs of whitespace collapsed
+    """
+    return re.sub(r'\s+', ' ', str(query)).strip().lower()
+
+def geocode_queries(df: pd.DataFrame) -> pd.Series:
+    """
+    Best search string for every row: its postcode, else its address, else its name
+    """
+    postcodes = extract_postal_codes(df['formatted_address']) if 'formatted_address' in df.columns \
+        else pd.Series(pd.NA, index=df.index, dtype='string')
+    queries = postcodes.astype(object)
+    for column in ('formatted_address', 'name'):
+        if column in df.columns:
+            text = df[column].astype(object).where(df[column].notna() & (df[column].astype(str).str.strip() != ''))
+            queries = queries.where(queries.notna(), text)
+    return queries
+
+def search_onemap(query: str, session: Optional[requests.Session] = None) -> Optional[Dict]:
+    """
+    First OneMap search result for a query as {'latitude', 'longitude', 'address'}, or None
+    """
+    params = {'searchVal': query, 'returnGeom': 'Y', 'getAddrDetails': 'Y', 'pageNum': 1}
+    response = (session or requests).get(ONEMAP_SEARCH_URL, params=params, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    results = response.json().get('results', [])
+    if not results:
+        return None
+    best = results[0]
+    return {
+        'latitude': float(best['LATITUDE']),
+        'longitude': float(best['LONGITUDE']),
+        'address': best.get('ADDRESS', ''),
+    }
+
+class LocalGeocodeStub:
+    """
+    Offline geocoder answering from locations that already have coordinates
+
+    Postcodes and full addresses seen in the reference data resolve to
+    their coordinates; anything else is not found.
+    """
+    def __init__(self, reference_df: pd.DataFrame):
+        located = reference_df[has_coordinates(reference_df)]
+        queries = geocode_queries(located).map(normalize_query, na_action='ignore')
+        addresses = located['formatted_address'].astype(object).map(normalize_query, na_action='ignore')
+        keys = pd.concat([queries, addresses])
+        coords = pd.concat([located[['latitude', 'longitude', 'formatted_address']]] * 2)
+        coords = coords.assign(key=keys.to_numpy()).dropna(subset=['key']).drop_duplicates('key')
+        self.answers = {
+            key: {'latitude': float(lat), 'longitude': float(lng), 'address': str(address)}
+            for key, lat, lng, address in zip(coords['key'], coords['latitude'], coords['longitude'],
+                                              coords['formatted_address'])
+        }
+
+    def __call__(self, query: str) -> Optional[Dict]:
+        return self.answers.get(normalize_query(query))
+
+class BatchGeocoder:
+    """
+    Geocode many queries at once through a bounded concurrent pool and a persistent cache
+    """
+    def __init__(self, cache_path: Optional[str] = GEOCODE_CACHE_PATH, concurrency: int = DEFAULT_CONCURRENCY,
+                 fetch: Optional[Callable[[str], Optional[Dict]]] = None,
+                 requests_per_minute: Optional[float] = REQUESTS_PER_MINUTE):
+        self.cache_path = cache_path
+        self.concurrency = max(1, concurrency)
+        # Requests start at least this far apart, however many are in flight
+        self.min_interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._local = threading.local()
+        self.fetch = fetch or (lambda query: search_onemap(query, self._session()))
+        self.cache: Dict[str, Optional[Dict]] = self.load_cache()
+        self.stats = {'cached': 0, 'fetched': 0, 'failed': 0}
+
+    def _session(self) -> requests.Session:
+        """
+        The calling worker thread's own session; requests.Session is not safe to share across threads
+        """
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def load_cache(self) -> Dict[str, Optional[Dict]]:
+        if self.cache_path and os.path.exists(self.cache_path):
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save_cache(self):
+        """
+        Write the cache atomically so an interrupted run never leaves a truncated file
+        """
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, separators=(',', ':'))
+        os.replace(tmp_path, self.cache_path)
+
+    async def _fetch_all(self, queries: List[str]) -> Dict[str, Optional[Dict]]:
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = {}
+        next_start = time.monotonic()
+
+        async def fetch_one(executor: ThreadPoolExecutor, query: str):
+            nonlocal next_start
+            async with semaphore:
+                # Reserve the next start slot; the event loop runs this without interleaving
+                now = time.monotonic()
+                start, next_start = max(now, next_start), max(now, next_start) + self.min_interval
+                if start > now:
+                    await asyncio.sleep(start - now)
+                try:
+                    results[normalize_query(query)] = await loop.run_in_executor(executor, self.fetch, query)
+                    self.stats['fetched'] += 1
+                except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                    # Failures are not cached, so the next run retries them
+                    self.stats['failed'] += 1
+                    print(f"Geocoding failed for '{query}': {e}")
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            await asyncio.gather(*(fetch_one(executor, query) for query in queries))
+        return results
+
+    def geocode(self, queries: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Resolve queries, returning answers keyed by normalised query
+
+        Queries already in the cache are answered from it; the rest are
+        deduplicated and fetched concurrently, then added to the cache.
+        """
+        keys = {normalize_query(query): query for query in queries if pd.notna(query)}
+        missing = [query for key, query in keys.items() if key not in self.cache]
+        self.stats['cached'] += len(keys) - len(missing)
+        if missing:
+            rate = f", {60 / self.min_interval:.0f} a minute" if self.min_interval else ""
+            print(f"Geocoding {len(missing)} new queries with up to {self.concurrency} concurrent requests{rate}...")
+            self.cache.update(asyncio.run(self._fetch_all(missing)))
+            self.save_cache()
+        return {key: self.cache.get(key) for key in keys}
+
+    def fill_coordinates(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Fill latitude and longitude for rows that are missing them or hold the (0, 0) placeholder
+        """
+        df = df.copy()
+        for column in ('latitude', 'longitude'):
+            if column not in df.columns:
+                df[column] = np.nan
+        pending = ~has_coordinates(df)
+        if not pending.any():
+            print("All locations already have coordinates")
+            return df
+
+        queries = geocode_queries(df[pending])
+        answers = self.geocode(queries.dropna().tolist())
+        found = queries.map(lambda query: answers.get(normalize_query(query)) if pd.notna(query) else None)
+        found = found[found.notna()]
+        df.loc[found.index, 'latitude'] = [answer['latitude'] for answer in found]
+        df.loc[found.index, 'longitude'] = [answer['longitude'] for answer in found]
+
+        print(f"Geocoded {len(found)}/{int(pending.sum())} locations without coordinates "
+              f"({self.stats['cached']} cached, {self.stats['fetched']} fetched, {self.stats['failed']} failed)")
+        return df
+
+def main():
+    """
+    Command line entry point: fill missing coordinates in a locations file
+    """
+    parser = argparse.ArgumentParser(description='Geocode locations that have no coordinates')
+    parser.add_argument('filepath', help='Locations CSV to geocode')
+    parser.add_argument('--output', help='Where to write the result (default: overwrite the input)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                       help=f'Concurrent OneMap requests (default: {DEFAULT_CONCURRENCY})')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_MINUTE,
+                       help=f'Maximum OneMap requests a minute (default: {REQUESTS_PER_MINUTE})')
+    parser.add_argument('--cache', default=GEOCODE_CACHE_PATH, help=f'Cache file (default: {GEOCODE_CACHE_PATH})')
+    parser.add_argument('--offline', action='store_true',
+                       help='Answer from the located rows of the same file instead of calling OneMap')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.filepath):
+        parser.error(f"File not found: {args.filepath}")
+
+    df = pd.read_csv(args.filepath)
+    fetch = LocalGeocodeStub(df) if args.offline else None
+    # The offline stub's answers are not cached, so they never mask a real lookup later
+    geocoder = BatchGeocoder(None if args.offline else args.cache, args.concurrency, fetch,
+                             None if args.offline else args.rate)
+    df = geocoder.fill_coordinates(df)
+
+    output = args.output or args.filepath
+    df.to_csv(output, index=False)
+    print(f"Saved {len(df)} locations to {output}")
+    return df
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,24 @@ import requests
 import pandas as pd
 import time
 import json
-from typing import List, Dict, Any
+import argparse
+from typing import List, Dict, Any, Optional
 import os
+from snapshot_store import snapshot_locations
 from config import GOOGLE_MAPS_API_KEY, FITNESS_KEYWORDS, SINGAPORE_BOUNDS, SINGAPORE_SEARCH_LOCATIONS, GOOGLE_MAPS_OUTPUT
 
+# Place Details fields for a full record, and the contact fields Text Search does not return
+DETAILS_FIELDS = 'name,place_id,formatted_address,geometry,rating,user_ratings_total,website,formatted_phone_number'
+CONTACT_FIELDS = 'website,formatted_phone_number'
+DETAILS_BATCH_SIZE = 50  # Places enriched between progress reports
+
 class GoogleMapsExtractor:
     def __init__(self, api_key: str):
         self.api_key = api_key
         self.base_url = "https://maps.googleapis.com/maps/api/place"
         self.locations = []
+        self.session = requests.Session()
+        self.api_calls = {'textsearch': 0, 'details': 0}
         
     def search_places(self, query: str, location: str = "Singapore") -> List[Dict[str, Any]]:
         """
@@ -24,7 +33,8 @@ class GoogleMapsExtractor:
         }
         
         try:
-            response = requests.get(url, params=params)
+            self.api_calls['textsearch'] += 1
+            response = self.session.get(url, params=params)
             response.raise_for_status()
             data = response.json()
             
@@ -38,19 +48,20 @@ class GoogleMapsExtractor:
             print(f"Request error for query '{query}' in {location}: {e}")
             return []
     
-    def get_place_details(self, place_id: str) -> Dict[str, Any]:
+    def get_place_details(self, place_id: str, fields: str = DETAILS_FIELDS) -> Optional[Dict[str, Any]]:
         """
-        Get detailed information for a specific place
+        Get detailed information for a specific place, or None if the request fails
         """
         url = f"{self.base_url}/details/json"
         params = {
             'place_id': place_id,
             'key': self.api_key,
-            'fields': 'name,place_id,formatted_address,geometry,rating,user_ratings_total,website,formatted_phone_number'
+            'fields': fields
         }
         
         try:
-            response = requests.get(url, params=params)
+            self.api_calls['details'] += 1
+            response = self.session.get(url, params=params)
             response.raise_for_status()
             data = response.json()
             
@@ -58,11 +69,11 @@ class GoogleMapsExtractor:
                 return data.get('result', {})
             else:
                 print(f"Details API Error for place_id '{place_id}': {data['status']}")
-                return {}
+                return None
                 
         except requests.exceptions.RequestException as e:
             print(f"Details request error for place_id '{place_id}': {e}")
-            return {}
+            return None
     
     def extract_location_data(self, place_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -85,9 +96,15 @@ class GoogleMapsExtractor:
             'search_location': place_data.get('search_location', '')  # Track which location search found this
         }
     
-    def search_all_fitness_locations(self) -> pd.DataFrame:
+    def search_all_fitness_locations(self, fetch_details: bool = True) -> pd.DataFrame:
         """
         Search for all fitness-related locations using the keyword list across multiple locations
+        
+        Text Search already returns the name, address, coordinates and
+        ratings. With fetch_details off, records are built from the search
+        results alone and marked details_fetched=False, leaving website and
+        phone number for enrich_contact_details to fill in later for just the
+        rows that need them - one API call per place instead of two.
         """
         all_locations = []
         seen_place_ids = set()
@@ -127,6 +144,14 @@ class GoogleMapsExtractor:
                     seen_place_ids.add(place_id)
                     seen_names_addresses.add(name_address_key)
                     
+                    if not fetch_details:
+                        location_data = self.extract_location_data(
+                            dict(place, search_query=keyword, search_location=location)
+                        )
+                        location_data['details_fetched'] = False
+                        all_locations.append(location_data)
+                        continue
+                    
                     # Get detailed information
                     details = self.get_place_details(place_id)
                     if details:
@@ -134,6 +159,7 @@ class GoogleMapsExtractor:
                         details['search_query'] = keyword
                         details['search_location'] = location
                         location_data = self.extract_location_data(details)
+                        location_data['details_fetched'] = True
                         all_locations.append(location_data)
                     
                     # Rate limiting - be respectful to the API
@@ -182,6 +208,51 @@ class GoogleMapsExtractor:
         print(f"Final result: {len(df)} unique fitness locations in Singapore")
         return df
     
+    def enrich_contact_details(self, df: pd.DataFrame, place_ids: Optional[List[str]] = None,
+                               batch_size: int = DETAILS_BATCH_SIZE) -> pd.DataFrame:
+        """
+        Fetch website and phone number for rows that do not have Place Details yet
+        
+        Only the contact fields are requested. place_ids limits enrichment to
+        the places a map, report or cleaned dataset actually uses. Rows from
+        files without a details_fetched column are treated as already
+        enriched. Places whose request fails stay pending for the next run.
+        """
+        df = df.copy()
+        if 'details_fetched' not in df.columns:
+            df['details_fetched'] = True
+        pending = ~df['details_fetched'].fillna(False).astype(bool)
+        if place_ids is not None:
+            pending &= df['place_id'].isin(place_ids)
+        
+        rows = df.index[pending]
+        if len(rows) == 0:
+            print("All requested locations already have contact details")
+            return df
+        
+        df['website'] = df['website'].astype(object)
+        df['phone_number'] = df['phone_number'].astype(object)
+        print(f"Fetching contact details for {len(rows)} locations...")
+        for start in range(0, len(rows), batch_size):
+            for row in rows[start:start + batch_size]:
+                details = self.get_place_details(df.at[row, 'place_id'], fields=CONTACT_FIELDS)
+                if details is not None:
+                    df.at[row, 'website'] = details.get('website', '')
+                    df.at[row, 'phone_number'] = details.get('formatted_phone_number', '')
+                    df.at[row, 'details_fetched'] = True
+                
+                # Rate limiting - be respectful to the API
+                time.sleep(0.1)
+            print(f"  Looked up {min(start + batch_size, len(rows))}/{len(rows)} locations")
+        
+        # Processed files carry flags derived from the contact fields; keep them in step
+        if 'has_website' in df.columns:
+            df['has_website'] = df['website'].notna() & (df['website'] != '')
+        if 'has_phone' in df.columns:
+            df['has_phone'] = df['phone_number'].notna() & (df['phone_number'] != '')
+        
+        return df
+    
     def save_to_csv(self, df: pd.DataFrame, filepath: str):
         """
         Save DataFrame to CSV file
@@ -192,9 +263,25 @@ class GoogleMapsExtractor:
         df.to_csv(filepath, index=False)
         print(f"Saved {len(df)} locations to {filepath}")
 
-def main():
+def enrich_file(filepath: str, place_ids: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Fill in pending contact details for a saved locations file, in place
+    
+    Run this on the cleaned or final dataset after a lazy crawl so Place
+    Details are only requested for locations that survive cleaning.
+    """
+    extractor = GoogleMapsExtractor(GOOGLE_MAPS_API_KEY)
+    df = extractor.enrich_contact_details(pd.read_csv(filepath), place_ids)
+    extractor.save_to_csv(df, filepath)
+    print(f"Place Details requests made: {extractor.api_calls['details']}")
+    return df
+
+def main(lazy_details: bool = False):
     """
     Main function to extract fitness locations from Google Maps
+    
+    With lazy_details set, records come from Text Search alone and contact
+    details are left for enrich_file.
     """
     print("Starting Google Maps fitness location extraction...")
     
@@ -202,19 +289,36 @@ def main():
     extractor = GoogleMapsExtractor(GOOGLE_MAPS_API_KEY)
     
     # Extract all fitness locations
-    df = extractor.search_all_fitness_locations()
+    df = extractor.search_all_fitness_locations(fetch_details=not lazy_details)
     
     # Save to CSV
     extractor.save_to_csv(df, GOOGLE_MAPS_OUTPUT)
     
+    # Keep this crawl in the snapshot history; the CSV above only holds the latest one
+    snapshot_locations(df)
+    
     # Print summary
     print("\nExtraction Summary:")
     print(f"Total locations found: {len(df)}")
     print(f"Average rating: {df['rating'].mean():.2f}")
     print(f"Locations with websites: {df['website'].notna().sum()}")
     print(f"Locations with phone numbers: {df['phone_number'].notna().sum()}")
+    print(f"API requests: {extractor.api_calls['textsearch']} text search, {extractor.api_calls['details']} place details")
     
     return df
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Extract fitness locations from Google Maps')
+    parser.add_argument('--lazy-details', action='store_true',
+                       help='Build records from Text Search only and defer website/phone lookups')
+    parser.add_argument('--enrich', metavar='CSV',
+                       help='Fetch pending contact details for a saved locations file instead of crawling')
+    parser.add_argument('--place-id', action='append', dest='place_ids',
+                       help='With --enrich, only enrich this place (repeatable)')
+    
+    args = parser.parse_args()
+    
+    if args.enrich:
+        enrich_file(args.enrich, args.place_ids)
+    else:
+        main(args.lazy_details)
@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+from classification_cache import ClassificationCache, ruleset_hash
 
 def improve_categorization():
     """
@@ -85,11 +86,13 @@ def improve_categorization():
         
         return current_category
     
-    # Apply improved categorization
-    df['improved_category'] = df.apply(
-        lambda row: categorize_business(row['name'], row['category']), 
-        axis=1
-    )
+    # Apply improved categorization, evaluating only names not seen with these keywords before
+    cache = ClassificationCache()
+    rules = [yoga_pilates_keywords, martial_arts_keywords, cycling_spin_keywords,
+             dance_keywords, bft_keywords, gym_keywords]
+    df['improved_category'] = cache.classify(ruleset_hash('improve_categorization.categorize_business', rules),
+                                             [df['name'], df['category']], categorize_business)
+    cache.report("Categorization")
     
     # Show categorization changes
     print("\nCategorization improvements:")
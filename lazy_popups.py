@@ -0,0 +1,137 @@
+import json
+import os
+from typing import List
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from jinja2 import Template
+
+# Columns carried in the popup sidecar, in the order the client template reads them
+POPUP_COLUMNS = [
+    'name', 'category', 'formatted_address', 'planning_area', 'rating',
+    'user_ratings_total', 'weighted_average_income', 'website', 'phone_number'
+]
+
+def popup_sidecar_path(output_file: str) -> str:
+    """
+    Sidecar file written next to a map, e.g. map.html -> map_popups.js
+    """
+    return f"{os.path.splitext(output_file)[0]}_popups.js"
+
+def write_popup_sidecar(df: pd.DataFrame, filepath: str) -> int:
+    """
+    Write popup fields as one JSON array per column, indexed by marker id
+
+    The payload is wrapped in a script assignment rather than served as bare
+    JSON so the map can load it on demand from file:// as well as over HTTP.
+    Returns the number of bytes written.
+    """
+    columns = {}
+    for column in POPUP_COLUMNS:
+        values = df[column] if column in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if column in ('rating', 'weighted_average_income'):
+            values = values.astype(float).round(2)
+        columns[column] = values.astype(object).where(values.notna(), None).tolist()
+
+    payload = 'window.fitnessPopupData = ' + json.dumps(columns, separators=(',', ':')) + ';\n'
+    os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8') as f:
+        f.write(payload)
+    return len(payload.encode('utf-8'))
+
+class LazyPopupLoader(MacroElement):
+    """
+    Client-side popup template plus a loader that fetches the sidecar on the first click
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var fitnessPopups = (function () {
+            var pending = [];
+            function escape(value) {
+                return String(value).replace(/[&<>"']/g, function (c) {
+                    return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+                });
+            }
+            function render(d, id) {
+                var rating = d.rating[id] === null ? 'n/a' : d.rating[id].toFixed(1);
+                var income = d.weighted_average_income[id] === null ? 'n/a' : Math.round(d.weighted_average_income[id]);
+                var html = '<div style="width: 250px;">'
+                    + '<h4>' + escape(d.name[id]) + '</h4>'
+                    + '<p><strong>Category:</strong> ' + escape(d.category[id]) + '</p>'
+                    + '<p><strong>Address:</strong> ' + escape(d.formatted_address[id]) + '</p>'
+                    + '<p><strong>Planning Area:</strong> ' + escape(d.planning_area[id]) + '</p>'
+                    + '<p><strong>Rating:</strong> ' + rating + ' ⭐ (' + escape(d.user_ratings_total[id]) + ' reviews)</p>'
+                    + '<p><strong>Avg Income:</strong> $' + income + '</p>';
+                if (d.website[id]) {
+                    html += '<p><strong>Website:</strong> <a href="' + escape(d.website[id]) + '" target="_blank">Visit</a></p>';
+                }
+                if (d.phone_number[id]) {
+                    html += '<p><strong>Phone:</strong> ' + escape(d.phone_number[id]) + '</p>';
+                }
+                return html + '</div>';
+            }
+            function load(callback) {
+                if (window.fitnessPopupData) { callback(window.fitnessPopupData); return; }
+                pending.push(callback);
+                if (pending.length > 1) { return; }
+                var script = document.createElement('script');
+                script.src = {{ this.sidecar_src|tojson }};
+                script.onload = function () {
+                    pending.splice(0).forEach(function (cb) { cb(window.fitnessPopupData); });
+                };
+                script.onerror = function () {
+                    pending.splice(0);
+                    document.head.removeChild(script);
+                };
+                document.head.appendChild(script);
+            }
+            return {
+                open: function (e) {
+                    var popup = e.popup, id = e.target.options.placeId;
+                    load(function (data) { popup.setContent(render(data, id)); });
+                }
+            };
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, sidecar_src: str):
+        super().__init__()
+        self._name = 'LazyPopupLoader'
+        self.sidecar_src = sidecar_src
+
+class LazyMarkerGroup(MacroElement):
+    """
+    Markers for one category, embedded as a flat [id, lat, lng, ...] array sharing one icon
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function () {
+            var icon = L.divIcon({
+                html: {{ this.icon_html|tojson }},
+                iconSize: {{ this.icon_size|tojson }},
+                iconAnchor: {{ this.icon_anchor|tojson }},
+                className: 'empty'
+            });
+            var points = {{ this.points|tojson }};
+            var group = {{ this._parent.get_name() }};
+            for (var i = 0; i < points.length; i += 3) {
+                L.marker([points[i + 1], points[i + 2]], {icon: icon, placeId: points[i]})
+                    .bindPopup('Loading...', {maxWidth: 300})
+                    .on('popupopen', fitnessPopups.open)
+                    .addTo(group);
+            }
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, ids: np.ndarray, lat: np.ndarray, lng: np.ndarray, icon_html: str,
+                 icon_size: tuple, icon_anchor: tuple):
+        super().__init__()
+        self._name = 'LazyMarkerGroup'
+        points = np.column_stack([ids, np.round(lat, 6), np.round(lng, 6)]).ravel()
+        # Ids are whole numbers; keep them as ints in the JSON
+        self.points: List = [int(v) if i % 3 == 0 else float(v) for i, v in enumerate(points)]
+        self.icon_html = icon_html
+        self.icon_size = list(icon_size)
+        self.icon_anchor = list(icon_anchor)
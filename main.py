@@ -9,21 +9,81 @@ This script orchestrates the entire pipeline:
 4. Process and combine all data
 5. Create interactive visualization
 
+Stages are registered by name and their modules are only imported when
+the stage runs, so --help, skipped stages and a missing config.py never
+pay for pandas, requests or folium.
+
 Usage:
     python main.py [--skip-google] [--skip-onemap] [--skip-visualization]
+    python main.py --import-times
 """
 
 import argparse
+import importlib
 import sys
 import os
+import time
 from datetime import datetime
 
-# Import our modules
-from google_maps_extractor import main as extract_google_maps
-from onemap_planning_areas import main as extract_planning_areas
-from onemap_income_data import main as extract_income_data
-from data_processor import main as process_data
-from visualization import main as create_visualization
+CONTINUE_WITH_EXISTING = "⚠️  Continuing with existing data if available..."
+
+# Pipeline stages in run order: the module whose main() runs each one, and
+# what happens when it fails (fatal stages stop the pipeline)
+STAGES = {
+    'google_maps': {'title': 'Google Maps Data Extraction', 'module': 'google_maps_extractor',
+                    'error': 'Google Maps extraction', 'fatal': False, 'on_failure': CONTINUE_WITH_EXISTING},
+    'planning_areas': {'title': 'OneMap Planning Areas Extraction', 'module': 'onemap_planning_areas',
+                       'error': 'OneMap planning areas extraction', 'fatal': False,
+                       'on_failure': CONTINUE_WITH_EXISTING},
+    'income_data': {'title': 'OneMap Income Data Extraction', 'module': 'onemap_income_data',
+                    'error': 'OneMap income data extraction', 'fatal': False, 'on_failure': CONTINUE_WITH_EXISTING},
+    'processing': {'title': 'Data Processing and Combination', 'module': 'data_processor',
+                   'error': 'data processing', 'fatal': True,
+                   'on_failure': "❌ Cannot continue without processed data!"},
+    'visualization': {'title': 'Visualization Creation', 'module': 'visualization',
+                      'error': 'visualization creation', 'fatal': False, 'on_failure': None},
+}
+
+def load_stage(name: str):
+    """
+    Import a stage's module and return its main function
+    """
+    return importlib.import_module(STAGES[name]['module']).main
+
+def skipped_stages(args) -> dict:
+    """
+    Stages the command line skips, with the message to print for each
+    """
+    skipped = {}
+    if args.skip_google:
+        skipped['google_maps'] = "Skipping Google Maps extraction (--skip-google)"
+    if args.skip_onemap:
+        skipped['planning_areas'] = "Skipping OneMap planning areas extraction (--skip-onemap)"
+        skipped['income_data'] = "Skipping OneMap income data extraction (--skip-onemap)"
+    if args.skip_visualization or args.data_only:
+        skipped['visualization'] = "Skipping visualization creation"
+    return skipped
+
+def report_import_times():
+    """
+    Import every stage module in run order and print how long each took
+
+    Dependencies shared by several stages (pandas, numpy) are counted
+    against the first stage that imports them.
+    """
+    print("Stage import times:")
+    total = 0.0
+    for name, stage in STAGES.items():
+        start = time.perf_counter()
+        try:
+            importlib.import_module(stage['module'])
+            status = ''
+        except Exception as e:
+            status = f"  (failed: {e})"
+        elapsed = time.perf_counter() - start
+        total += elapsed
+        print(f"   {stage['module']:<24} {elapsed * 1000:8.1f} ms{status}")
+    print(f"   {'total':<24} {total * 1000:8.1f} ms")
 
 def print_banner():
     """Print project banner"""
@@ -48,14 +108,7 @@ def print_step_footer(step_name: str, success: bool):
 
 def check_dependencies():
     """Check if required files exist"""
-    required_files = [
-        'config.py',
-        'google_maps_extractor.py',
-        'onemap_planning_areas.py',
-        'onemap_income_data.py',
-        'data_processor.py',
-        'visualization.py'
-    ]
+    required_files = ['config.py'] + [f"{stage['module']}.py" for stage in STAGES.values()]
     
     missing_files = []
     for file in required_files:
@@ -81,9 +134,15 @@ def main():
                        help='Skip visualization creation')
     parser.add_argument('--data-only', action='store_true', 
                        help='Only extract data, skip visualization')
+    parser.add_argument('--import-times', action='store_true',
+                       help='Print how long each stage module takes to import, then exit')
     
     args = parser.parse_args()
     
+    if args.import_times:
+        report_import_times()
+        return
+    
     # Print banner
     print_banner()
     
@@ -92,95 +151,32 @@ def main():
         print("❌ Please ensure all required files are present.")
         sys.exit(1)
     
-    total_steps = 5
+    skipped = skipped_stages(args)
+    total_steps = len(STAGES)
     current_step = 0
     
     try:
-        # Step 1: Extract Google Maps data
-        if not args.skip_google:
-            current_step += 1
-            print_step_header("Google Maps Data Extraction", current_step, total_steps)
+        for name, stage in STAGES.items():
+            if name in skipped:
+                print(f"⏭️  {skipped[name]}")
+                continue
             
-            success = False
-            try:
-                extract_google_maps()
-                success = True
-            except Exception as e:
-                print(f"Error in Google Maps extraction: {e}")
-            
-            print_step_footer("Google Maps Data Extraction", success)
-            if not success:
-                print("⚠️  Continuing with existing data if available...")
-        else:
-            print("⏭️  Skipping Google Maps extraction (--skip-google)")
-        
-        # Step 2: Extract OneMap planning areas
-        if not args.skip_onemap:
             current_step += 1
-            print_step_header("OneMap Planning Areas Extraction", current_step, total_steps)
+            print_step_header(stage['title'], current_step, total_steps)
             
             success = False
             try:
-                extract_planning_areas()
+                load_stage(name)()
                 success = True
             except Exception as e:
-                print(f"Error in OneMap planning areas extraction: {e}")
+                print(f"Error in {stage['error']}: {e}")
             
-            print_step_footer("OneMap Planning Areas Extraction", success)
+            print_step_footer(stage['title'], success)
             if not success:
-                print("⚠️  Continuing with existing data if available...")
-        else:
-            print("⏭️  Skipping OneMap planning areas extraction (--skip-onemap)")
-        
-        # Step 3: Extract OneMap income data
-        if not args.skip_onemap:
-            current_step += 1
-            print_step_header("OneMap Income Data Extraction", current_step, total_steps)
-            
-            success = False
-            try:
-                extract_income_data()
-                success = True
-            except Exception as e:
-                print(f"Error in OneMap income data extraction: {e}")
-            
-            print_step_footer("OneMap Income Data Extraction", success)
-            if not success:
-                print("⚠️  Continuing with existing data if available...")
-        else:
-            print("⏭️  Skipping OneMap income data extraction (--skip-onemap)")
-        
-        # Step 4: Process and combine data
-        current_step += 1
-        print_step_header("Data Processing and Combination", current_step, total_steps)
-        
-        success = False
-        try:
-            process_data()
-            success = True
-        except Exception as e:
-            print(f"Error in data processing: {e}")
-        
-        print_step_footer("Data Processing and Combination", success)
-        if not success:
-            print("❌ Cannot continue without processed data!")
-            sys.exit(1)
-        
-        # Step 5: Create visualization
-        if not args.skip_visualization and not args.data_only:
-            current_step += 1
-            print_step_header("Visualization Creation", current_step, total_steps)
-            
-            success = False
-            try:
-                create_visualization()
-                success = True
-            except Exception as e:
-                print(f"Error in visualization creation: {e}")
-            
-            print_step_footer("Visualization Creation", success)
-        else:
-            print("⏭️  Skipping visualization creation")
+                if stage['on_failure']:
+                    print(stage['on_failure'])
+                if stage['fatal']:
+                    sys.exit(1)
         
         # Final summary
         print("\n" + "=" * 60)
@@ -0,0 +1,300 @@
+import folium
+import pandas as pd
+import numpy as np
+import json
+import os
+from typing import Callable, List, Optional, Union
+from color_scale import ColorScale
+from area_registry import PLANNING_AREA_REGISTRY
+from config import PLANNING_AREAS_OUTPUT, INCOME_DATA_OUTPUT
+
+SINGAPORE_CENTER = [1.3521, 103.8198]
+
+# Geometry stores already loaded in this process, keyed by source files and their mtimes
+_GEO_STORE_CACHE = {}
+
+# Four income levels with blue shades, shared by the income maps
+INCOME_LEVELS = {
+    'High': {'min': 15000, 'max': 20000, 'color': '#0000ff', 'description': 'High Income (>$15,000)'},
+    'Medium-High': {'min': 12000, 'max': 15000, 'color': '#6666ff', 'description': 'Medium-High Income ($12,000-$15,000)'},
+    'Medium': {'min': 10000, 'max': 12000, 'color': '#9999ff', 'description': 'Medium Income ($10,000-$12,000)'},
+    'Low': {'min': 8000, 'max': 10000, 'color': '#ccccff', 'description': 'Low Income (<$10,000)'}
+}
+
+class GeoDataStore:
+    """
+    Planning area geometry and income, loaded, merged and parsed once.
+
+    `areas` has one row per planning area with its income columns and a
+    `locations` column holding the polygon ring as [lat, lng] pairs, ready
+    for Leaflet.
+    """
+    def __init__(self, planning_areas_path: str = PLANNING_AREAS_OUTPUT,
+                 income_path: str = INCOME_DATA_OUTPUT):
+        self.planning_areas_path = planning_areas_path
+        self.income_path = income_path
+        self.areas = pd.DataFrame()
+        self.income = pd.DataFrame()
+        self.load()
+
+    def load(self):
+        """
+        Load both CSVs, merge income onto planning areas and parse every polygon
+        """
+        if not os.path.exists(self.planning_areas_path) or not os.path.exists(self.income_path):
+            print("Planning areas or income data not found.")
+            return
+
+        planning_areas_df = pd.read_csv(self.planning_areas_path)
+        self.income = pd.read_csv(self.income_path)
+
+        # Join income onto the polygons by planning area registry id
+        area_ids = PLANNING_AREA_REGISTRY.ids(planning_areas_df['planning_area_name'])
+        income = PLANNING_AREA_REGISTRY.dense(self.income, 'planning_area', ['weighted_average_income', 'total_households'])
+        areas = planning_areas_df.assign(
+            planning_area_id=area_ids,
+            weighted_average_income=income['weighted_average_income'][area_ids],
+            total_households=income['total_households'][area_ids]
+        )
+
+        # Coordinates are stored GeoJSON-style as [lng, lat]; swap once for Leaflet
+        areas['locations'] = [
+            [[lat, lng] for lng, lat in json.loads(coords)] if isinstance(coords, str) and coords else []
+            for coords in areas['polygon_coordinates']
+        ]
+        self.areas = areas.drop(columns=['polygon_coordinates'])
+
+        print(f"Loaded {len(self.areas)} planning areas "
+              f"({self.areas['weighted_average_income'].notna().sum()} with income data)")
+
+    @property
+    def empty(self) -> bool:
+        return self.areas.empty
+
+    def areas_with_income(self) -> pd.DataFrame:
+        """
+        Planning areas that have both geometry and income
+        """
+        has_geometry = self.areas['locations'].str.len() > 0
+        return self.areas[has_geometry & self.areas['weighted_average_income'].notna()]
+
+def get_geo_store(planning_areas_path: str = PLANNING_AREAS_OUTPUT,
+                  income_path: str = INCOME_DATA_OUTPUT) -> GeoDataStore:
+    """
+    Return the shared geometry store, reloading only when the source files change
+    """
+    key = tuple(
+        (path, os.path.getmtime(path) if os.path.exists(path) else None)
+        for path in (planning_areas_path, income_path)
+    )
+    store = _GEO_STORE_CACHE.get(key)
+    if store is None:
+        store = GeoDataStore(planning_areas_path, income_path)
+        _GEO_STORE_CACHE[key] = store
+    return store
+
+def gradient_income_scale(method: str = 'linear', classes: Optional[int] = None) -> ColorScale:
+    """
+    Blue (low) through cyan to red (high) income scale
+    """
+    return ColorScale('blue_cyan_red', method=method, classes=classes)
+
+def income_level_scale() -> ColorScale:
+    """
+    Fixed colours for the four INCOME_LEVELS bands
+    """
+    levels = list(INCOME_LEVELS.values())[::-1]
+    return ColorScale([level['color'] for level in levels], method='manual',
+                      breaks=[level['min'] for level in levels[1:]])
+
+def income_level_names(income: pd.Series) -> pd.Series:
+    """
+    Assign each income to one of INCOME_LEVELS
+    """
+    names = np.array(list(INCOME_LEVELS)[::-1] + ['Low'], dtype=object)
+    return pd.Series(names[income_level_scale().fit(income).classify(income)], index=income.index)
+
+def income_level_labels() -> List[str]:
+    """
+    Legend labels for the INCOME_LEVELS bands, from low to high
+    """
+    return [level['description'] for level in list(INCOME_LEVELS.values())[::-1]]
+
+def income_level_popups(areas):
+    """
+    Popup HTML with the area's income and its income level
+    """
+    descriptions = income_level_names(areas['weighted_average_income']).map(
+        {name: level['description'] for name, level in INCOME_LEVELS.items()}
+    )
+    return ("<b>" + areas['planning_area_name'] + "</b><br>Income: <b>$"
+            + areas['weighted_average_income'].map('{:,.0f}'.format) + "</b><br>" + descriptions)
+
+class IncomeChoroplethLayer:
+    """
+    Planning areas filled by household income, drawn as a single GeoJson layer
+
+    `color_scale` is a ColorScale (fitted to the areas drawn) or any function
+    from an income Series to colours. With `legend_title` set, a ColorScale
+    also adds its legend to the map.
+    """
+    def __init__(self, name: str = 'Planning Areas - Household Income',
+                 color_scale: Optional[Union[ColorScale, Callable[[pd.Series], pd.Series]]] = None,
+                 popup: Optional[Callable[[pd.DataFrame], pd.Series]] = None,
+                 border_color: Optional[str] = None, fill_opacity: float = 0.7, weight: float = 3,
+                 area_names: Optional[List[str]] = None, show: bool = True,
+                 legend_title: Optional[str] = None, legend_labels: Optional[List[str]] = None):
+        self.name = name
+        self.color_scale = color_scale if color_scale is not None else gradient_income_scale()
+        self.legend_title = legend_title
+        self.legend_labels = legend_labels
+        self.popup = popup
+        self.border_color = border_color
+        self.fill_opacity = fill_opacity
+        self.weight = weight
+        self.area_names = area_names
+        self.show = show
+
+    def add_to(self, map_obj: folium.Map, store: GeoDataStore) -> folium.Map:
+        areas = store.areas_with_income()
+        if self.area_names is not None:
+            areas = areas[np.isin(areas['planning_area_id'], PLANNING_AREA_REGISTRY.ids(self.area_names))]
+        if areas.empty:
+            print("No planning areas with income data found!")
+            return map_obj
+
+        colors = self.color_scale(areas['weighted_average_income'])
+        if self.popup is not None:
+            popups = self.popup(areas)
+        else:
+            popups = ("<b>" + areas['planning_area_name'] + "</b><br>Avg Income: $"
+                      + areas['weighted_average_income'].map('{:,.0f}'.format))
+
+        features = [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Polygon', 'coordinates': [[[lng, lat] for lat, lng in locations]]},
+                'properties': {'name': name, 'color': color, 'popup': popup}
+            }
+            for name, locations, color, popup in zip(
+                areas['planning_area_name'], areas['locations'], colors, popups
+            )
+        ]
+
+        border_color = self.border_color
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            name=self.name,
+            show=self.show,
+            style_function=lambda feature: {
+                'color': border_color or feature['properties']['color'],
+                'fillColor': feature['properties']['color'],
+                'fillOpacity': self.fill_opacity,
+                'weight': self.weight
+            },
+            popup=folium.GeoJsonPopup(fields=['popup'], labels=False)
+        ).add_to(map_obj)
+
+        if self.legend_title and isinstance(self.color_scale, ColorScale):
+            HtmlOverlay(self.color_scale.legend_html(self.legend_title, labels=self.legend_labels)).add_to(map_obj, store)
+
+        print(f"Added {len(features)} planning area polygons to '{self.name}'")
+        return map_obj
+
+class BoundaryLayer:
+    """
+    Unfilled planning area outlines
+    """
+    def __init__(self, name: str = 'Planning Area Boundaries', color: str = '#555555', show: bool = False):
+        self.name = name
+        self.color = color
+        self.show = show
+
+    def add_to(self, map_obj: folium.Map, store: GeoDataStore) -> folium.Map:
+        areas = store.areas[store.areas['locations'].str.len() > 0]
+        features = [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Polygon', 'coordinates': [[[lng, lat] for lat, lng in locations]]},
+                'properties': {'name': name}
+            }
+            for name, locations in zip(areas['planning_area_name'], areas['locations'])
+        ]
+        color = self.color
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            name=self.name,
+            show=self.show,
+            style_function=lambda feature: {'color': color, 'weight': 1, 'fill': False},
+            tooltip=folium.GeoJsonTooltip(fields=['name'], labels=False)
+        ).add_to(map_obj)
+        return map_obj
+
+class MarkerLayer:
+    """
+    Fitness location pins grouped by category
+    """
+    def __init__(self, df: pd.DataFrame, visualizer=None):
+        self.df = df
+        self.visualizer = visualizer
+
+    def add_to(self, map_obj: folium.Map, store: GeoDataStore) -> folium.Map:
+        # Imported here to avoid a circular import with visualization
+        from visualization import FitnessMapVisualizer
+        visualizer = self.visualizer or FitnessMapVisualizer()
+        return visualizer.add_fitness_locations(map_obj, self.df)
+
+class DensityLayer:
+    """
+    Studio density grid
+    """
+    def __init__(self, df: pd.DataFrame, resolution_m: float = 1000, show: bool = False, visualizer=None):
+        self.df = df
+        self.resolution_m = resolution_m
+        self.show = show
+        self.visualizer = visualizer
+
+    def add_to(self, map_obj: folium.Map, store: GeoDataStore) -> folium.Map:
+        from visualization import FitnessMapVisualizer
+        visualizer = self.visualizer or FitnessMapVisualizer()
+        return visualizer.add_density_grid(map_obj, self.df, self.resolution_m, show=self.show)
+
+class HtmlOverlay:
+    """
+    Fixed-position HTML such as a legend or statistics panel
+    """
+    def __init__(self, html: str):
+        self.html = html
+
+    def add_to(self, map_obj: folium.Map, store: GeoDataStore) -> folium.Map:
+        if self.html:
+            map_obj.get_root().html.add_child(folium.Element(self.html))
+        return map_obj
+
+class MapEngine:
+    """
+    Builds folium maps from composable layers that share one GeoDataStore
+    """
+    def __init__(self, store: Optional[GeoDataStore] = None):
+        self.store = store if store is not None else get_geo_store()
+
+    def build(self, layers: List, tiles: str = 'OpenStreetMap', zoom_start: int = 11,
+              center: List[float] = SINGAPORE_CENTER, layer_control: bool = False) -> folium.Map:
+        """
+        Create a base map and add each layer in order
+        """
+        map_obj = folium.Map(location=center, zoom_start=zoom_start, tiles=tiles)
+        for layer in layers:
+            map_obj = layer.add_to(map_obj, self.store)
+        if layer_control:
+            folium.LayerControl(position='topright', collapsed=False, overlay=True).add_to(map_obj)
+        return map_obj
+
+    def render(self, layers: List, output_file: str, **kwargs) -> str:
+        """
+        Build a map and save it to an HTML file
+        """
+        map_obj = self.build(layers, **kwargs)
+        map_obj.save(output_file)
+        print(f"Map saved to {output_file}")
+        return output_file
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Supervised category classifier for location names.
+
+The curated improved_category in final_fitness_locations.csv labels every
+kept location, so instead of a keyword chain ('pt' matching any name with
+those two letters in a row) a linear model can learn which pieces of a
+name point to which category:
+
+- features are the byte n-grams of the padded, lower-cased name, hashed
+  into a fixed number of buckets (no vocabulary to store or grow) and
+  scaled by the name's n-gram count
+- the model is multinomial logistic regression with an L2 penalty, fitted
+  with L-BFGS on the sparse feature matrix
+- classifying a DataFrame hashes each distinct name once, with numpy
+  over the names' bytes, and scores each batch of up to PREDICT_BATCH
+  distinct names with one sparse matrix multiply
+
+The fitted model is saved as a compressed .npz and loaded by
+DataProcessor when it is given a classifier path.
+
+Usage:
+    python name_classifier.py train
+    python name_classifier.py train --folds 5
+    python name_classifier.py classify data/fitness_locations.csv --output data/classified_locations.csv
+"""
+
+import argparse
+import os
+from typing import List, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy import sparse
+from scipy.optimize import minimize
+
+MODEL_PATH = "data/name_classifier.npz"
+TRAINING_DATA_PATH = "data/final_fitness_locations.csv"
+LABEL_COLUMN = 'improved_category'
+N_FEATURES = 2 ** 18
+NGRAM_RANGE = (2, 5)
+L2_PENALTY = 1e-5
+MAX_ITERATIONS = 300
+PREDICT_BATCH = 50000  # Distinct names featurized per sparse multiply, bounding memory
+_PRIME = np.uint32(16777619)
+_MIX = np.uint32(0x9E3779B1)
+
+def normalize_names(names: Sequence[str]) -> pa.StringArray:
+    """
+    Lower-cased names with whitespace collapsed and a space either side, so word starts and ends are n-grams
+    """
+    values = pa.array(pd.Series(list(names), dtype=object).fillna('').astype(str).tolist(), type=pa.string())
+    values = pc.binary_join(pc.utf8_split_whitespace(pc.utf8_lower(values)), ' ')
+    return pc.binary_join_element_wise('', values, '', ' ')
+
+class NgramHasher:
+    """
+    Hash the byte n-grams of names into a fixed-width sparse feature matrix
+
+    Every n-gram is hashed with a rolling polynomial over the names' UTF-8
+    bytes, computed for all positions of a batch at once with numpy, so no
+    Python code runs per name or per n-gram.
+    """
+    def __init__(self, n_features: int = N_FEATURES, ngram_range: Tuple[int, int] = NGRAM_RANGE):
+        if n_features & (n_features - 1):
+            raise ValueError(f"n_features must be a power of two, not {n_features}")
+        self.n_features = n_features
+        self.ngram_range = tuple(ngram_range)
+        self._shift = np.uint32(32 - (n_features.bit_length() - 1))
+
+    def transform(self, names: Sequence[str]) -> sparse.csr_matrix:
+        """
+        One row per name: counts of each hashed n-gram, scaled by 1/sqrt of the name's n-gram count
+        """
+        blocks = self.blocks(names)
+        return sum(blocks[1:], blocks[0])
+
+    def blocks(self, names: Sequence[str]) -> List[sparse.csr_matrix]:
+        """
+        The feature matrix split by n-gram length; their sum is transform(names)
+        """
+        values = normalize_names(names)
+        offsets = np.frombuffer(values.buffers()[1], dtype=np.int32)[values.offset:values.offset + len(values) + 1]
+        data = np.frombuffer(values.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]].astype(np.uint32)
+        offsets = (offsets - offsets[0]).astype(np.int64)
+        lengths = np.diff(offsets)
+        row_of_byte = np.repeat(np.arange(len(values)), lengths)
+        bytes_left = offsets[1:][row_of_byte] - np.arange(len(data))
+
+        low, high = self.ngram_range
+        counts = np.maximum(lengths[:, np.newaxis] - np.arange(low, high + 1) + 1, 0)
+        scale = 1 / np.sqrt(np.maximum(counts.sum(axis=1), 1))
+        # One matrix per n-gram length: positions come in row order, so each is CSR without a sort
+        matrices = []
+        rolling = np.zeros(len(data), dtype=np.uint32)
+        with np.errstate(over='ignore'):
+            for n in range(1, high + 1):
+                # rolling[p] becomes the hash of the n bytes starting at p (wrapping at 32 bits)
+                rolling[:len(data) - n + 1] = rolling[:len(data) - n + 1] * _PRIME + data[n - 1:]
+                if n >= low:
+                    starts = bytes_left >= n
+                    buckets = (rolling[starts] * _MIX) >> self._shift
+                    indptr = np.concatenate([[0], np.cumsum(counts[:, n - low])])
+                    matrices.append(sparse.csr_matrix(
+                        (np.repeat(scale, counts[:, n - low]).astype(np.float32), buckets, indptr),
+                        shape=(len(values), self.n_features)))
+        return matrices
+
+def _softmax(scores: np.ndarray) -> np.ndarray:
+    scores = scores - scores.max(axis=1, keepdims=True)
+    exp = np.exp(scores)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class NameClassifier:
+    """
+    Linear model over hashed character n-grams, predicting a category per name
+    """
+    def __init__(self, classes: Sequence[str], weights: np.ndarray, bias: np.ndarray,
+                 n_features: int = N_FEATURES, ngram_range: Tuple[int, int] = NGRAM_RANGE):
+        self.classes = np.asarray(classes, dtype=object)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.hasher = NgramHasher(n_features, ngram_range)
+
+    @classmethod
+    def train(cls, names: pd.Series, labels: pd.Series, n_features: int = N_FEATURES,
+              ngram_range: Tuple[int, int] = NGRAM_RANGE, l2_penalty: float = L2_PENALTY,
+              max_iterations: int = MAX_ITERATIONS) -> 'NameClassifier':
+        """
+        Fit multinomial logistic regression on labelled names
+        """
+        labelled = names.notna() & labels.notna()
+        names, labels = names[labelled].astype(str), labels[labelled].astype(str)
+        classes, y = np.unique(labels.to_numpy(), return_inverse=True)
+        hasher = NgramHasher(n_features, ngram_range)
+        features = hasher.transform(names)
+        features.sum_duplicates()
+        # Only buckets some training name hits can get a non-zero weight, so fit those alone
+        used = np.unique(features.indices)
+        X = features[:, used].tocsr().astype(np.float64)
+        targets = np.zeros((len(y), len(classes)))
+        targets[np.arange(len(y)), y] = 1
+        n_rows, n_classes = len(y), len(classes)
+
+        def loss_and_gradient(params: np.ndarray):
+            W = params[:-n_classes].reshape(len(used), n_classes)
+            b = params[-n_classes:]
+            probabilities = _softmax(X @ W + b)
+            loss = -np.log(probabilities[np.arange(n_rows), y] + 1e-12).mean() + 0.5 * l2_penalty * (W ** 2).sum()
+            error = (probabilities - targets) / n_rows
+            gradient = np.concatenate([(X.T @ error + l2_penalty * W).ravel(), error.sum(axis=0)])
+            return loss, gradient
+
+        result = minimize(loss_and_gradient, np.zeros(len(used) * n_classes + n_classes), jac=True,
+                          method='L-BFGS-B', options={'maxiter': max_iterations})
+        weights = np.zeros((n_features, n_classes), dtype=np.float32)
+        weights[used] = result.x[:-n_classes].reshape(len(used), n_classes)
+        return cls(classes, weights, result.x[-n_classes:], n_features, ngram_range)
+
+    def _scores(self, names: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row -> distinct name codes and the class scores of every distinct name
+        """
+        codes, uniques = pd.factorize(names.astype(object).where(names.notna(), ''))
+        scores = np.empty((len(uniques), len(self.classes)), dtype=np.float32)
+        for start in range(0, len(uniques), PREDICT_BATCH):
+            batch = uniques[start:start + PREDICT_BATCH]
+            # Scoring each n-gram length's block separately skips merging them into one matrix
+            scores[start:start + len(batch)] = sum(block @ self.weights for block in self.hasher.blocks(batch)) + self.bias
+        return codes, scores
+
+    def predict_proba(self, names: pd.Series) -> pd.DataFrame:
+        """
+        Class probabilities for every name
+        """
+        codes, scores = self._scores(names)
+        return pd.DataFrame(_softmax(scores)[codes], index=names.index, columns=self.classes)
+
+    def predict(self, names: pd.Series) -> np.ndarray:
+        """
+        Most likely category of every name
+        """
+        codes, scores = self._scores(names)
+        return self.classes[np.argmax(scores, axis=1)][codes]
+
+    def save(self, filepath: str = MODEL_PATH):
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        np.savez_compressed(filepath, classes=self.classes.astype(str), weights=self.weights, bias=self.bias,
+                            n_features=self.hasher.n_features, ngram_range=np.array(self.hasher.ngram_range))
+        print(f"Saved name classifier ({len(self.classes)} categories) to {filepath}")
+
+    @classmethod
+    def load(cls, filepath: str = MODEL_PATH) -> 'NameClassifier':
+        with np.load(filepath) as saved:
+            return cls(saved['classes'].tolist(), saved['weights'], saved['bias'],
+                       int(saved['n_features']), tuple(int(n) for n in saved['ngram_range']))
+
+def cross_validate(names: pd.Series, labels: pd.Series, folds: int = 5, seed: int = 0, **train_options) -> np.ndarray:
+    """
+    Out-of-fold predictions for every labelled name, for an honest accuracy estimate
+    """
+    order = np.random.default_rng(seed).permutation(len(names))
+    predicted = np.empty(len(names), dtype=object)
+    for fold in range(folds):
+        held_out = order[fold::folds]
+        training = np.setdiff1d(order, held_out)
+        model = NameClassifier.train(names.iloc[training], labels.iloc[training], **train_options)
+        predicted[held_out] = model.predict(names.iloc[held_out])
+    return predicted
+
+def main():
+    """
+    Command line entry point: train the classifier or classify a locations file
+    """
+    parser = argparse.ArgumentParser(description='Train or apply the location name classifier')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help='Fit the model on the curated locations')
+    train_parser.add_argument('--data', default=TRAINING_DATA_PATH, help=f'Labelled CSV (default: {TRAINING_DATA_PATH})')
+    train_parser.add_argument('--label', default=LABEL_COLUMN, help=f'Label column (default: {LABEL_COLUMN})')
+    train_parser.add_argument('--model', default=MODEL_PATH, help=f'Where to save the model (default: {MODEL_PATH})')
+    train_parser.add_argument('--folds', type=int, default=0,
+                              help='Also report cross-validated accuracy against the keyword categories')
+
+    classify_parser = subparsers.add_parser('classify', help='Add a predicted_category column to a CSV')
+    classify_parser.add_argument('filepath', help='Locations CSV')
+    classify_parser.add_argument('--model', default=MODEL_PATH, help=f'Saved model (default: {MODEL_PATH})')
+    classify_parser.add_argument('--output', help='Where to write the result (default: overwrite the input)')
+
+    args = parser.parse_args()
+
+    if args.command == 'train':
+        if not os.path.exists(args.data):
+            parser.error(f"File not found: {args.data}")
+        df = pd.read_csv(args.data)
+        df = df[df['name'].notna() & df[args.label].notna()].reset_index(drop=True)
+        print(f"Training on {len(df)} labelled locations...")
+
+        if args.folds > 1:
+            predicted = cross_validate(df['name'], df[args.label], args.folds)
+            accuracy = (predicted == df[args.label].to_numpy()).mean()
+            print(f"{args.folds}-fold accuracy: {accuracy:.3f}")
+            if 'category' in df.columns:
+                print(f"Keyword categories agree with {args.label} on {(df['category'] == df[args.label]).mean():.3f}")
+
+        model = NameClassifier.train(df['name'], df[args.label])
+        model.save(args.model)
+        return model
+
+    if not os.path.exists(args.filepath):
+        parser.error(f"File not found: {args.filepath}")
+    if not os.path.exists(args.model):
+        parser.error(f"Model not found: {args.model} (run 'python name_classifier.py train' first)")
+    df = pd.read_csv(args.filepath)
+    df['predicted_category'] = NameClassifier.load(args.model).predict(df['name'])
+    print("Predicted categories:")
+    for category, count in df['predicted_category'].value_counts().items():
+        print(f"- {category}: {count}")
+    output = args.output or args.filepath
+    df.to_csv(output, index=False)
+    print(f"Saved {len(df)} locations to {output}")
+    return df
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ import json
 import time
 from typing import List, Dict, Any
 import os
+from snapshot_store import snapshot_income
 from config import ONEMAP_BASE_URL, ONEMAP_ACCESS_TOKEN, INCOME_DATA_OUTPUT
 
 class OneMapIncomeDataExtractor:
@@ -189,7 +190,7 @@ class OneMapIncomeDataExtractor:
         df.to_csv(filepath, index=False)
         print(f"Saved {len(df)} income records to {filepath}")
 
-def main():
+def main(year: str = "2020"):
     """
     Main function to extract household income data from OneMap
     """
@@ -199,12 +200,15 @@ def main():
     extractor = OneMapIncomeDataExtractor()
     
     # Process all income data
-    df = extractor.process_all_income_data()
+    df = extractor.process_all_income_data(year)
     
     if not df.empty:
         # Save to CSV
         extractor.save_to_csv(df, INCOME_DATA_OUTPUT)
         
+        # Keep every income year in the snapshot history
+        snapshot_income(df, year)
+        
         # Print summary
         print("\nExtraction Summary:")
         print(f"Total planning areas with income data: {len(df)}")
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Postal codes and a postal sector -> planning area lookup.
+
+Almost every formatted_address ends in "Singapore NNNNNN", and the first
+two digits of a postcode (its postal sector) pin a location down to one or
+a few planning areas. The index is built from locations we have already
+placed: each record's coordinates are located inside the planning area
+polygons (falling back to its assigned planning_area), and every sector
+takes the area most of its records fall in, along with that area's share.
+
+Lookups are array takes on a 100-entry table, so assigning a planning area
+needs no coordinates and no network calls, and comparing the two sources
+flags records whose coordinates and postcode disagree.
+
+Usage:
+    python postal_index.py
+    python postal_index.py --data data/final_fitness_locations.csv --min-share 0.8
+"""
+
+import argparse
+import json
+import os
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+from config import COMBINED_DATA_OUTPUT, PLANNING_AREAS_OUTPUT
+
+POSTAL_INDEX_OUTPUT = "data/postal_sectors.csv"
+INCONSISTENCIES_OUTPUT = "data/postal_inconsistencies.csv"
+
+# The last six-digit group after "Singapore" in an address
+POSTAL_CODE_PATTERN = r'(?i)singapore\s*(\d{6})(?!.*\d{6})'
+
+# Only flag disagreements in sectors where at least this share of records agree on one area
+MIN_CONSISTENCY_SHARE = 0.75
+
+def extract_postal_codes(addresses: pd.Series) -> pd.Series:
+    """
+    Six-digit postcode of every address as a string, or missing
+    """
+    return addresses.astype('string').str.extract(POSTAL_CODE_PATTERN, expand=False)
+
+def postal_sectors(postal_codes: pd.Series) -> np.ndarray:
+    """
+    Postal sector (first two digits) of every postcode, -1 where missing
+    """
+    sectors = pd.to_numeric(postal_codes.astype('string').str[:2], errors='coerce')
+    return sectors.fillna(-1).to_numpy(dtype=np.int64)
+
+def has_coordinates(df: pd.DataFrame) -> np.ndarray:
+    """
+    Rows with usable coordinates; missing and (0, 0) placeholders do not count
+    """
+    lat = df['latitude'].to_numpy(dtype=float)
+    lng = df['longitude'].to_numpy(dtype=float)
+    return ~np.isnan(lat) & ~np.isnan(lng) & ~((lat == 0) & (lng == 0))
+
+def locate_in_polygons(lat: np.ndarray, lng: np.ndarray, planning_areas_df: pd.DataFrame) -> np.ndarray:
+    """
+    Name of the planning area polygon containing each point, or None
+
+    Ray casting, vectorised over all edges of a polygon for the points inside
+    its bounding box.
+    """
+    found = np.full(len(lat), None, dtype=object)
+    for name, coords in zip(planning_areas_df['planning_area_name'], planning_areas_df['polygon_coordinates']):
+        ring = np.asarray(json.loads(coords), dtype=float) if isinstance(coords, str) and coords else np.empty((0, 2))
+        if len(ring) < 3:
+            continue
+        # Coordinates are stored GeoJSON-style as [lng, lat]
+        x0, y0 = ring[:, 0], ring[:, 1]
+        x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+        candidates = np.flatnonzero(pd.isna(found) & (lng >= x0.min()) & (lng <= x0.max())
+                                    & (lat >= y0.min()) & (lat <= y0.max()))
+        if len(candidates) == 0:
+            continue
+        px, py = lng[candidates, np.newaxis], lat[candidates, np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crosses = ((y0 > py) != (y1 > py)) & (px < (x1 - x0) * (py - y0) / (y1 - y0) + x0)
+        inside = crosses.sum(axis=1) % 2 == 1
+        found[candidates[inside]] = name
+    return found
+
+def coordinate_areas(df: pd.DataFrame, planning_areas_df: Optional[pd.DataFrame] = None) -> np.ndarray:
+    """
+    Planning area of every row from its coordinates: the polygon containing
+    it where polygons are given, otherwise (or outside every polygon) the
+    row's assigned planning_area
+    """
+    areas = df['planning_area'].astype(object).where(df['planning_area'].notna(), None).to_numpy() \
+        if 'planning_area' in df.columns else np.full(len(df), None, dtype=object)
+    if planning_areas_df is not None and not planning_areas_df.empty:
+        located = has_coordinates(df)
+        inside = np.full(len(df), None, dtype=object)
+        inside[located] = locate_in_polygons(df['latitude'].to_numpy(dtype=float)[located],
+                                             df['longitude'].to_numpy(dtype=float)[located],
+                                             planning_areas_df)
+        areas = np.where(pd.notna(inside), inside, areas)
+    return areas
+
+class PostalSectorIndex:
+    """
+    Postal sector -> planning area table with O(1), vectorised lookups
+    """
+    COLUMNS = ['postal_sector', 'planning_area', 'share', 'count']
+
+    def __init__(self, table: pd.DataFrame):
+        self.table = table[self.COLUMNS].reset_index(drop=True)
+        # Dense arrays indexed by sector number; the extra last slot answers sector -1
+        self._areas = np.full(101, None, dtype=object)
+        self._shares = np.zeros(101)
+        sectors = self.table['postal_sector'].to_numpy(dtype=np.int64)
+        self._areas[sectors] = self.table['planning_area'].to_numpy(dtype=object)
+        self._shares[sectors] = self.table['share'].to_numpy(dtype=float)
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, planning_areas_df: Optional[pd.DataFrame] = None) -> 'PostalSectorIndex':
+        """
+        Build the table from located records, preferring polygon containment to the assigned area
+        """
+        codes = extract_postal_codes(df['formatted_address'])
+        areas = coordinate_areas(df, planning_areas_df)
+        records = pd.DataFrame({'postal_sector': postal_sectors(codes), 'planning_area': areas})
+        records = records[(records['postal_sector'] >= 0) & records['planning_area'].notna()
+                          & (records['planning_area'] != 'Unknown')]
+        counts = records.groupby(['postal_sector', 'planning_area']).size().rename('area_count').reset_index()
+        counts['count'] = counts.groupby('postal_sector')['area_count'].transform('sum')
+        best = counts.sort_values(['postal_sector', 'area_count'], ascending=[True, False], kind='stable') \
+            .drop_duplicates('postal_sector')
+        best['share'] = (best['area_count'] / best['count']).round(3)
+        return cls(best)
+
+    def lookup(self, postal_codes: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Planning area and sector share for every postcode (None and 0 where unknown)
+        """
+        sectors = postal_sectors(postal_codes)
+        sectors = np.where((sectors >= 0) & (sectors < 100), sectors, 100)
+        return self._areas[sectors], self._shares[sectors]
+
+    def assign(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Planning area of every row from the postcode in its address alone
+        """
+        return self.lookup(extract_postal_codes(df['formatted_address']))[0]
+
+    def check_consistency(self, df: pd.DataFrame, planning_areas_df: Optional[pd.DataFrame] = None,
+                          min_share: float = MIN_CONSISTENCY_SHARE) -> pd.DataFrame:
+        """
+        Compare the planning area at each row's coordinates with its postal sector's
+
+        Adds coordinate_area, postal_code, postal_sector_area,
+        postal_sector_share and postal_consistent, which is False where the
+        sector is dominated by a different area, True where they agree, and
+        missing where there is no postcode or the sector is too mixed to judge.
+        """
+        codes = extract_postal_codes(df['formatted_address'])
+        sector_areas, shares = self.lookup(codes)
+        assigned = coordinate_areas(df, planning_areas_df)
+        judged = pd.notna(sector_areas) & (shares >= min_share) & pd.notna(assigned)
+        consistent = pd.Series(pd.array(np.where(judged, assigned == sector_areas, False), dtype='boolean'),
+                               index=df.index).where(judged)
+        return df.assign(coordinate_area=assigned, postal_code=codes, postal_sector_area=sector_areas,
+                         postal_sector_share=shares, postal_consistent=consistent)
+
+    def save(self, filepath: str = POSTAL_INDEX_OUTPUT):
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        self.table.to_csv(filepath, index=False)
+        print(f"Saved {len(self.table)} postal sectors to {filepath}")
+
+    @classmethod
+    def load(cls, filepath: str = POSTAL_INDEX_OUTPUT) -> Optional['PostalSectorIndex']:
+        """
+        Load a saved index, or None if it has not been built yet
+        """
+        if not os.path.exists(filepath):
+            return None
+        return cls(pd.read_csv(filepath))
+
+def main():
+    """
+    Build the postal sector index and report records whose coordinates and postcode disagree
+    """
+    parser = argparse.ArgumentParser(description='Build the postal sector -> planning area index')
+    parser.add_argument('--data', default=COMBINED_DATA_OUTPUT,
+                       help=f'Locations with planning areas (default: {COMBINED_DATA_OUTPUT})')
+    parser.add_argument('--output', default=POSTAL_INDEX_OUTPUT, help=f'Index file (default: {POSTAL_INDEX_OUTPUT})')
+    parser.add_argument('--min-share', type=float, default=MIN_CONSISTENCY_SHARE,
+                       help=f'Only judge sectors this dominated by one area (default: {MIN_CONSISTENCY_SHARE})')
+
+    args = parser.parse_args()
+
+    print("Building postal sector index...")
+    if not os.path.exists(args.data):
+        print(f"Data file not found: {args.data}")
+        return None
+
+    df = pd.read_csv(args.data)
+    planning_areas_df = pd.read_csv(PLANNING_AREAS_OUTPUT) if os.path.exists(PLANNING_AREAS_OUTPUT) else None
+    codes = extract_postal_codes(df['formatted_address'])
+    print(f"Found postcodes in {codes.notna().sum()}/{len(df)} addresses")
+
+    index = PostalSectorIndex.build(df, planning_areas_df)
+    index.save(args.output)
+
+    checked = index.check_consistency(df, planning_areas_df, args.min_share)
+    flagged = checked[~checked['postal_consistent'].fillna(True)]
+    print(f"{checked['postal_consistent'].notna().sum()} records checked, "
+          f"{len(flagged)} where coordinates and postal sector disagree")
+    if not flagged.empty:
+        flagged.to_csv(INCONSISTENCIES_OUTPUT, index=False)
+        print(f"Saved flagged records to {INCONSISTENCIES_OUTPUT}")
+        for _, row in flagged.head(10).iterrows():
+            print(f"  {row['name']}: {row['coordinate_area']} by coordinates, "
+                  f"{row['postal_sector_area']} by postcode {row['postal_code']}")
+
+    return index
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import pandas as pd
+import numpy as np
+import os
+from typing import Dict, List
+from jinja2 import Environment, DictLoader, select_autoescape
+from aggregate_cube import get_aggregate_cube
+from schema import fill_category
+
+# Household income bands, matching the levels used by the income maps
+INCOME_BAND_EDGES = [0, 10000, 12000, 15000, np.inf]
+INCOME_BAND_LABELS = ['Low (<$10,000)', 'Medium ($10,000-$12,000)', 'Medium-High ($12,000-$15,000)', 'High (>$15,000)']
+UNKNOWN_INCOME_BAND = 'Unknown'
+
+TEMPLATES = {
+    'base.html': """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{{ title }}</title>
+    <style>
+        body { font-family: Arial, sans-serif; margin: 20px; }
+        table { border-collapse: collapse; width: 100%; margin: 20px 0; }
+        th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
+        th { background-color: #f2f2f2; }
+        .highlight { background-color: #e6f3ff; }
+        nav a { margin-right: 12px; }
+    </style>
+</head>
+<body>
+    {% if home %}<nav><a href="{{ home }}">&larr; Report index</a></nav>{% endif %}
+    <h1>{{ title }}</h1>
+    {% block content %}{% endblock %}
+</body>
+</html>
+""",
+    'macros.html': """{% macro summary(stats) -%}
+    <h2>Summary Statistics</h2>
+    <p><strong>Total Locations:</strong> {{ stats.total_locations }}</p>
+    <p><strong>Average Rating:</strong> {{ "%.2f"|format(stats.average_rating) }} ⭐</p>
+    <p><strong>Average Household Income:</strong> ${{ "%.0f"|format(stats.average_income) }}</p>
+{%- endmacro %}
+
+{% macro breakdown(heading, label, rows) -%}
+    <h2>{{ heading }}</h2>
+    <table>
+        <tr>
+            <th>{{ label }}</th>
+            <th>Count</th>
+            <th>Percentage</th>
+            <th>Avg Rating</th>
+            <th>Avg Income</th>
+            <th>Total Reviews</th>
+        </tr>
+        {% for row in rows %}
+        <tr>
+            <td>{% if row.link %}<a href="{{ row.link }}">{{ row.key }}</a>{% else %}{{ row.key }}{% endif %}</td>
+            <td>{{ row.count }}</td>
+            <td>{{ "%.1f"|format(row.percentage) }}%</td>
+            <td>{{ "%.1f"|format(row.avg_rating) }} ⭐</td>
+            <td>${{ "%.0f"|format(row.avg_income) }}</td>
+            <td>{{ row.total_reviews }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+{%- endmacro %}
+
+{% macro top_rated(heading, rows) -%}
+    <h2>{{ heading }}</h2>
+    <table>
+        <tr>
+            <th>Rank</th>
+            <th>Name</th>
+            <th>Category</th>
+            <th>Rating</th>
+            <th>Planning Area</th>
+            <th>Avg Income</th>
+        </tr>
+        {% for row in rows %}
+        <tr class="highlight">
+            <td>{{ loop.index }}</td>
+            <td>{{ row.name }}</td>
+            <td>{{ row.category }}</td>
+            <td>{{ "%.1f"|format(row.rating) }} ⭐</td>
+            <td>{{ row.planning_area }}</td>
+            <td>${{ "%.0f"|format(row.weighted_average_income) }}</td>
+        </tr>
+        {% endfor %}
+    </table>
+{%- endmacro %}
+""",
+    'index.html': """{% extends "base.html" %}
+{% import "macros.html" as m %}
+{% block content %}
+    {{ m.summary(stats) }}
+    <p><a href="{{ income_bands_link }}">Income band analysis</a></p>
+    {{ m.breakdown("Category Breakdown", "Category", categories) }}
+    {{ m.top_rated("Top 10 Rated Locations", top_rated) }}
+    {{ m.breakdown("Planning Area Breakdown", "Planning Area", areas) }}
+{% endblock %}
+""",
+    'group.html': """{% extends "base.html" %}
+{% import "macros.html" as m %}
+{% block content %}
+    {{ m.summary(stats) }}
+    {{ m.breakdown(breakdown_heading, breakdown_label, breakdown) }}
+    {% if top_rated %}{{ m.top_rated("Top 10 Rated Locations", top_rated) }}{% endif %}
+{% endblock %}
+""",
+}
+
+# Templates are compiled once at import and reused for every page
+_ENVIRONMENT = Environment(loader=DictLoader(TEMPLATES), autoescape=select_autoescape(['html']))
+INDEX_TEMPLATE = _ENVIRONMENT.get_template('index.html')
+GROUP_TEMPLATE = _ENVIRONMENT.get_template('group.html')
+
+def slugify(values: pd.Series) -> pd.Series:
+    """
+    Turn names into file-name-safe slugs
+    """
+    return values.astype(str).str.lower().str.replace(r'[^a-z0-9]+', '-', regex=True).str.strip('-')
+
+def unique_slugs(values: pd.Index) -> pd.Series:
+    """
+    Distinct, non-empty slugs indexed by the original values
+
+    A value whose slug is empty falls back to its position code, and repeated
+    slugs get a numeric suffix (-2, -3, ...) so no two pages share a file.
+    """
+    used = set()
+    unique = []
+    for code, slug in enumerate(slugify(values.to_series())):
+        base = slug or str(code)
+        slug, suffix = base, 2
+        while slug in used:
+            slug, suffix = f"{base}-{suffix}", suffix + 1
+        used.add(slug)
+        unique.append(slug)
+    return pd.Series(unique, index=values, dtype=object)
+
+class AnalysisReportGenerator:
+    """
+    Multi-page HTML analysis report rendered from aggregated tables.
+
+    The index page is written to `output_file`; per-category, per-planning-area
+    and income band pages go in a sibling `<name>_pages` directory. Every page
+    is streamed to disk from precompiled templates.
+    """
+    def __init__(self, output_file: str = "fitness_analysis_report.html", top_n: int = 10):
+        self.output_file = output_file
+        self.top_n = top_n
+        stem = os.path.splitext(os.path.basename(output_file))[0]
+        self.pages_dirname = f"{stem}_pages"
+        self.pages_dir = os.path.join(os.path.dirname(output_file), self.pages_dirname)
+
+    def _stream(self, template, filepath: str, **context):
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            template.stream(**context).dump(f)
+
+    @staticmethod
+    def _breakdown_rows(totals: pd.DataFrame, total_locations: int, links: pd.Series = None) -> List[Dict]:
+        """
+        Turn rolled-up cube sums into template rows
+        """
+        rows = pd.DataFrame({
+            'key': totals.index,
+            'count': totals['location_count'].to_numpy(),
+            'percentage': totals['location_count'].to_numpy() / max(total_locations, 1) * 100,
+            'avg_rating': totals['avg_rating'].fillna(0).to_numpy(),
+            'avg_income': totals['avg_income'].fillna(0).to_numpy(),
+            'total_reviews': totals['review_total'].to_numpy(),
+            'link': links.reindex(totals.index).to_numpy() if links is not None else None,
+        })
+        return rows.to_dict('records')
+
+    @staticmethod
+    def _rollup(table: pd.DataFrame, key: str) -> pd.DataFrame:
+        totals = table.groupby(key, sort=False, observed=True)[['location_count', 'rating_sum', 'rating_count',
+                                                  'review_total', 'income_sum', 'income_count']].sum()
+        totals['avg_rating'] = totals['rating_sum'] / totals['rating_count'].replace(0, np.nan)
+        totals['avg_income'] = totals['income_sum'] / totals['income_count'].replace(0, np.nan)
+        return totals.sort_values('location_count', ascending=False, kind='stable')
+
+    @staticmethod
+    def _stats(totals: pd.DataFrame) -> Dict:
+        sums = totals[['location_count', 'rating_sum', 'rating_count', 'income_sum', 'income_count']].sum()
+        return {
+            'total_locations': int(sums['location_count']),
+            'average_rating': sums['rating_sum'] / sums['rating_count'] if sums['rating_count'] else 0,
+            'average_income': sums['income_sum'] / sums['income_count'] if sums['income_count'] else 0,
+        }
+
+    def _top_rated_by(self, df: pd.DataFrame, key: str) -> Dict[str, List[Dict]]:
+        """
+        Top rated locations per group, from one sort and one groupby.head
+        """
+        columns = ['name', 'category', 'rating', 'planning_area', 'weighted_average_income']
+        ranked = df.sort_values('rating', ascending=False, kind='stable').groupby(key, sort=False, observed=True).head(self.top_n)
+        return {group: rows[columns].to_dict('records') for group, rows in ranked.groupby(key, sort=False, observed=True)}
+
+    @staticmethod
+    def income_bands(income: pd.Series) -> pd.Series:
+        """
+        Assign each income value to a household income band
+        """
+        bands = pd.cut(income, bins=INCOME_BAND_EDGES, labels=INCOME_BAND_LABELS, right=False)
+        bands = bands.cat.add_categories([UNKNOWN_INCOME_BAND])
+        return bands.where(income > 0, UNKNOWN_INCOME_BAND)
+
+    def generate(self, df: pd.DataFrame) -> str:
+        """
+        Generate the full report and return the index page path
+        """
+        if df.empty:
+            return ""
+
+        df = df.assign(
+            planning_area=fill_category(df['planning_area'], 'Unknown'),
+            category=fill_category(df['category'], 'Others'),
+        )
+        cube_table = get_aggregate_cube(df).table
+        stats = self._stats(cube_table)
+        total = stats['total_locations']
+
+        category_totals = self._rollup(cube_table, 'category')
+        area_totals = self._rollup(cube_table, 'planning_area')
+
+        category_slugs = unique_slugs(category_totals.index)
+        area_slugs = unique_slugs(area_totals.index)
+        category_links = f"{self.pages_dirname}/category-" + category_slugs + ".html"
+        area_links = f"{self.pages_dirname}/area-" + area_slugs + ".html"
+
+        top_overall = df.nlargest(self.top_n, 'rating')[
+            ['name', 'category', 'rating', 'planning_area', 'weighted_average_income']
+        ].to_dict('records')
+
+        self._stream(
+            INDEX_TEMPLATE, self.output_file,
+            title='Singapore Fitness Studios Analysis',
+            home=None,
+            stats=stats,
+            income_bands_link=f"{self.pages_dirname}/income-bands.html",
+            categories=self._breakdown_rows(category_totals, total, category_links),
+            areas=self._breakdown_rows(area_totals, total, area_links),
+            top_rated=top_overall,
+        )
+
+        home = "../" + os.path.basename(self.output_file)
+        top_by_category = self._top_rated_by(df, 'category')
+        top_by_area = self._top_rated_by(df, 'planning_area')
+
+        # Per-category pages: breakdown by planning area
+        for category, cells in cube_table.groupby('category', sort=False):
+            area_breakdown = self._rollup(cells, 'planning_area')
+            self._stream(
+                GROUP_TEMPLATE, os.path.join(self.pages_dir, f"category-{category_slugs[category]}.html"),
+                title=f"Category: {category}",
+                home=home,
+                stats=self._stats(area_breakdown),
+                breakdown_heading='Planning Area Breakdown',
+                breakdown_label='Planning Area',
+                breakdown=self._breakdown_rows(area_breakdown, area_breakdown['location_count'].sum(),
+                                               "area-" + area_slugs + ".html"),
+                top_rated=top_by_category.get(category, []),
+            )
+
+        # Per-planning-area pages: breakdown by category
+        for area, cells in cube_table.groupby('planning_area', sort=False):
+            category_breakdown = self._rollup(cells, 'category')
+            self._stream(
+                GROUP_TEMPLATE, os.path.join(self.pages_dir, f"area-{area_slugs[area]}.html"),
+                title=f"Planning Area: {area}",
+                home=home,
+                stats=self._stats(category_breakdown),
+                breakdown_heading='Category Breakdown',
+                breakdown_label='Category',
+                breakdown=self._breakdown_rows(category_breakdown, category_breakdown['location_count'].sum(),
+                                               "category-" + category_slugs + ".html"),
+                top_rated=top_by_area.get(area, []),
+            )
+
+        # Income band page: the cube cells carry each area's income, so bands are assigned per cell
+        cells = cube_table.assign(
+            area_income=cube_table['income_sum'] / cube_table['income_count'].replace(0, np.nan)
+        )
+        cells['income_band'] = self.income_bands(cells['area_income'].fillna(0))
+        band_totals = self._rollup(cells, 'income_band')
+        self._stream(
+            GROUP_TEMPLATE, os.path.join(self.pages_dir, "income-bands.html"),
+            title="Household Income Bands",
+            home=home,
+            stats=stats,
+            breakdown_heading='Income Band Breakdown',
+            breakdown_label='Income Band',
+            breakdown=self._breakdown_rows(band_totals, total),
+            top_rated=[],
+        )
+
+        page_count = len(category_totals) + len(area_totals) + 1
+        print(f"Analysis report saved to {self.output_file} ({page_count} detail pages in {self.pages_dir})")
+        return self.output_file
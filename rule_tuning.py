@@ -0,0 +1,405 @@
+#!/usr/bin/env python3
+"""
+Score keyword rule sets against the hand-curated locations.
+
+final_fitness_locations.csv is the curated answer: a location in
+combined_data.csv that did not make it into the final file should be
+excluded, and the ones that did carry their corrected improved_category.
+Rather than editing a cleaner, rerunning it and eyeballing its output,
+candidate keyword lists are scored here directly:
+
+- every distinct name (or name + search query) is matched against every
+  keyword once, into a sparse document x keyword matrix; new keywords add a
+  column, nothing is ever rescanned
+- a batch of rule sets becomes a sparse keyword x rule-set indicator
+  matrix, so one matrix product gives every rule set's matches at once
+- documents carry how many curated rows are excluded or kept, so
+  exclusion scores are dot products; category confusion tables are one
+  bincount over integer label codes per rule set
+
+Rules are keyword substring matches, as in the cleaners: a location is
+excluded when its name contains an 'exclude' keyword and no 'keep'
+keyword, and is given the first category with a keyword in its text.
+Hand-written special cases (better_data_cleaner's exceptions for 'club',
+'bar', ...) are not modelled.
+
+Usage:
+    python rule_tuning.py
+    python rule_tuning.py --rules candidate_rules.json
+    python rule_tuning.py --search --candidates "sports centre,country club" --max-size 2
+"""
+
+import argparse
+import itertools
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from clean_data import EXCLUDE_KEYWORDS
+from data_processor import DataProcessor
+from config import COMBINED_DATA_OUTPUT
+
+FINAL_DATA_PATH = "data/final_fitness_locations.csv"
+EXCLUDED_DATA_PATH = "data/excluded_locations.csv"
+FALLBACK_CATEGORY = 'Others'
+SCORE_BATCH = 256  # Rule sets per matrix product, bounding the dense match block
+_FIELD_SEPARATOR = '\x1f'  # Never part of a keyword, so no match spans two fields
+
+class KeywordMatchMatrix:
+    """
+    Sparse document x keyword substring-match matrix, one column per keyword ever asked for
+    """
+    def __init__(self, documents: Sequence[str]):
+        self.documents = pd.Series(list(documents), dtype=object)
+        self.vocabulary: Dict[str, int] = {}
+        self._columns: List[np.ndarray] = []
+        self._matrix = None
+
+    def add(self, keywords: Iterable[str]):
+        """
+        Match any keywords not yet in the vocabulary against every document
+        """
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if keyword not in self.vocabulary:
+                self.vocabulary[keyword] = len(self._columns)
+                self._columns.append(np.flatnonzero(self.documents.str.contains(keyword, regex=False).to_numpy()))
+                self._matrix = None
+
+    @property
+    def matrix(self) -> sparse.csr_matrix:
+        if self._matrix is None:
+            rows = np.concatenate(self._columns) if self._columns else np.array([], dtype=np.int64)
+            columns = np.repeat(np.arange(len(self._columns)), [len(c) for c in self._columns])
+            self._matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                                             shape=(len(self.documents), len(self._columns)))
+        return self._matrix
+
+    def indicator(self, keyword_sets: Sequence[Iterable[str]]) -> sparse.csc_matrix:
+        """
+        Keyword x set 0/1 matrix, one column per keyword set
+        """
+        keyword_sets = [{keyword.lower() for keyword in keywords} for keywords in keyword_sets]
+        self.add(keyword for keywords in keyword_sets for keyword in keywords)
+        rows = [self.vocabulary[keyword] for keywords in keyword_sets for keyword in keywords]
+        columns = [position for position, keywords in enumerate(keyword_sets) for _ in keywords]
+        return sparse.csc_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                                 shape=(len(self.vocabulary), len(keyword_sets)))
+
+    def any_match(self, keyword_sets: Sequence[Iterable[str]]) -> np.ndarray:
+        """
+        Document x set booleans: does the document contain any keyword of the set
+        """
+        indicator = self.indicator(keyword_sets)
+        return (self.matrix @ indicator).toarray() > 0
+
+def _documents(df: pd.DataFrame, fields: Tuple[str, ...]) -> pd.Series:
+    text = df[fields[0]].astype(object).fillna('').astype(str).str.lower()
+    for field in fields[1:]:
+        text = text + _FIELD_SEPARATOR + df[field].astype(object).fillna('').astype(str).str.lower()
+    return text
+
+def _metrics(tp: np.ndarray, fp: np.ndarray, fn: np.ndarray) -> Dict[str, np.ndarray]:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {'precision': precision.round(4), 'recall': recall.round(4), 'f1': f1.round(4)}
+
+class RuleTuner:
+    """
+    Precision, recall and confusion tables for keyword rule sets against curated labels
+    """
+    def __init__(self, df: pd.DataFrame, excluded: np.ndarray, categories: pd.Series):
+        """
+        df holds one row per location, excluded the curated exclusion label of
+        every row, and categories its curated category (missing where excluded)
+        """
+        self.df = df.reset_index(drop=True)
+        self.excluded = np.asarray(excluded, dtype=bool)
+        self.categories = pd.Series(categories).reset_index(drop=True)
+        self._indexes: Dict[Tuple[str, ...], Tuple[np.ndarray, KeywordMatchMatrix]] = {}
+
+    @classmethod
+    def from_files(cls, combined_path: str = COMBINED_DATA_OUTPUT, final_path: str = FINAL_DATA_PATH) -> 'RuleTuner':
+        """
+        Label every combined location by whether, and as what, it survived into the final file
+        """
+        combined = pd.read_csv(combined_path)
+        final = pd.read_csv(final_path)
+        category_column = 'improved_category' if 'improved_category' in final.columns else 'category'
+        curated = final.drop_duplicates('place_id').set_index('place_id')[category_column]
+        excluded = ~combined['place_id'].isin(curated.index).to_numpy()
+        return cls(combined, excluded, combined['place_id'].map(curated))
+
+    def index(self, fields: Tuple[str, ...] = ('name',)) -> Tuple[np.ndarray, KeywordMatchMatrix]:
+        """
+        Row -> document codes and the match matrix for the given text fields, built once
+        """
+        if fields not in self._indexes:
+            codes, documents = pd.factorize(_documents(self.df, fields))
+            self._indexes[fields] = (codes, KeywordMatchMatrix(documents))
+        return self._indexes[fields]
+
+    def predict_exclusions(self, rule_sets: Sequence[Dict[str, List[str]]]) -> np.ndarray:
+        """
+        Document x rule set exclusion decisions
+        """
+        _, matches = self.index(('name',))
+        excluded = matches.any_match([rules.get('exclude', []) for rules in rule_sets])
+        keep = matches.any_match([rules.get('keep', []) for rules in rule_sets])
+        return excluded & ~keep
+
+    def score_exclusions(self, rule_sets: Sequence[Dict[str, List[str]]]) -> pd.DataFrame:
+        """
+        Precision, recall and F1 of every rule set's exclusions, one row per rule set
+        """
+        codes, matches = self.index(('name',))
+        positives = np.bincount(codes, weights=self.excluded, minlength=len(matches.documents))
+        negatives = np.bincount(codes, weights=~self.excluded, minlength=len(matches.documents))
+        tp, fp = [], []
+        for start in range(0, len(rule_sets), SCORE_BATCH):
+            predicted = self.predict_exclusions(rule_sets[start:start + SCORE_BATCH])
+            tp.append(positives @ predicted)
+            fp.append(negatives @ predicted)
+        tp = np.concatenate(tp) if tp else np.array([])
+        fp = np.concatenate(fp) if fp else np.array([])
+        fn = self.excluded.sum() - tp
+        scores = pd.DataFrame({'excluded': tp + fp, 'true_positives': tp, 'false_positives': fp,
+                               'false_negatives': fn, **_metrics(tp, fp, fn)})
+        return scores.astype({column: int for column in ('excluded', 'true_positives', 'false_positives',
+                                                         'false_negatives')})
+
+    def exclusion_confusion(self, rules: Dict[str, List[str]]) -> pd.DataFrame:
+        """
+        Curated label against predicted label for one rule set
+        """
+        codes, _ = self.index(('name',))
+        predicted = self.predict_exclusions([rules])[:, 0][codes]
+        labels = np.array(['kept', 'excluded'])
+        return pd.crosstab(pd.Series(labels[self.excluded.astype(int)], name='curated'),
+                           pd.Series(labels[predicted.astype(int)], name='predicted'))
+
+    def _category_codes(self, rule_sets: Sequence[Dict[str, List[str]]], fields: Tuple[str, ...], fallback: str,
+                        label_index: Dict[str, int]) -> List[np.ndarray]:
+        """
+        Label code of every curated row's predicted category under each rule set
+        """
+        codes, matches = self.index(fields)
+        kept_codes = codes[~self.excluded]
+        order = [list(rules) for rules in rule_sets]
+        hits = matches.any_match([rules[category] for rules, categories in zip(rule_sets, order)
+                                  for category in categories])
+        predictions = []
+        offset = 0
+        for categories in order:
+            block = hits[:, offset:offset + len(categories)]
+            offset += len(categories)
+            targets = np.array([label_index[category] for category in categories] + [label_index[fallback]])
+            first = np.where(block.any(axis=1), block.argmax(axis=1), len(categories))
+            predictions.append(targets[first][kept_codes])
+        return predictions
+
+    def _labels(self, rule_sets: Sequence[Dict[str, List[str]]], fallback: str) -> Tuple[List[str], np.ndarray]:
+        """
+        Every category named by the curated data or the rule sets, and the curated rows' codes into them
+        """
+        truth = self.categories[~self.excluded].astype(object).fillna(fallback).astype(str).to_numpy()
+        labels = sorted(set(truth) | {category for rules in rule_sets for category in rules} | {fallback})
+        label_index = {label: code for code, label in enumerate(labels)}
+        return labels, np.array([label_index[label] for label in truth], dtype=np.int64)
+
+    def predict_categories(self, rule_sets: Sequence[Dict[str, List[str]]], fields: Tuple[str, ...] = ('name',),
+                           fallback: str = FALLBACK_CATEGORY) -> List[np.ndarray]:
+        """
+        Category of every curated row under each rule set: the first category with a match
+        """
+        labels, _ = self._labels(rule_sets, fallback)
+        label_index = {label: code for code, label in enumerate(labels)}
+        names = np.array(labels, dtype=object)
+        return [names[codes] for codes in self._category_codes(rule_sets, fields, fallback, label_index)]
+
+    @staticmethod
+    def _category_table(truth: np.ndarray, predicted: np.ndarray, labels: List[str]) -> pd.DataFrame:
+        """
+        Per-category counts, precision, recall and F1 from curated and predicted label codes
+
+        Categories neither curated nor predicted are left out.
+        """
+        confusion = np.bincount(truth * len(labels) + predicted,
+                                minlength=len(labels) ** 2).reshape(len(labels), len(labels))
+        curated, predicted_counts = confusion.sum(axis=1), confusion.sum(axis=0)
+        tp = np.diag(confusion).astype(float)
+        table = pd.DataFrame({'curated': curated, 'predicted': predicted_counts, 'correct': tp.astype(int),
+                              **_metrics(tp, predicted_counts - tp, curated - tp)},
+                             index=pd.Index(labels, name='category'))
+        return table[(curated > 0) | (predicted_counts > 0)]
+
+    def score_categories(self, rule_sets: Sequence[Dict[str, List[str]]], fields: Tuple[str, ...] = ('name',),
+                         fallback: str = FALLBACK_CATEGORY) -> pd.DataFrame:
+        """
+        Accuracy and macro-averaged precision, recall and F1 of every category rule set
+        """
+        labels, truth = self._labels(rule_sets, fallback)
+        label_index = {label: code for code, label in enumerate(labels)}
+        rows = []
+        for start in range(0, len(rule_sets), SCORE_BATCH):
+            for predicted in self._category_codes(rule_sets[start:start + SCORE_BATCH], fields, fallback,
+                                                  label_index):
+                report = self._category_table(truth, predicted, labels)
+                rows.append({'accuracy': round(float((truth == predicted).mean()), 4),
+                             'macro_precision': round(report['precision'].mean(), 4),
+                             'macro_recall': round(report['recall'].mean(), 4),
+                             'macro_f1': round(report['f1'].mean(), 4)})
+        return pd.DataFrame(rows)
+
+    def category_report(self, rules: Dict[str, List[str]], fields: Tuple[str, ...] = ('name',),
+                        fallback: str = FALLBACK_CATEGORY) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Per-category precision and recall, and the curated x predicted confusion table, for one rule set
+        """
+        labels, truth = self._labels([rules], fallback)
+        label_index = {label: code for code, label in enumerate(labels)}
+        predicted = self._category_codes([rules], fields, fallback, label_index)[0]
+        names = np.array(labels, dtype=object)
+        confusion = pd.crosstab(pd.Series(names[truth], name='curated'), pd.Series(names[predicted], name='predicted'))
+        return self._category_table(truth, predicted, labels), confusion
+
+def exclusion_candidates(base: Dict[str, List[str]], candidates: Sequence[str] = (), max_size: int = 1,
+                         removals: bool = True) -> Tuple[List[Dict[str, List[str]]], List[Dict[str, str]]]:
+    """
+    The base rule set, the base plus every combination of up to max_size
+    candidates, and (with removals) the base without each of its keywords
+    """
+    rule_sets = [base]
+    changes = [{'added': '', 'removed': ''}]
+    for size in range(1, max_size + 1):
+        for added in itertools.combinations([c for c in candidates if c not in base['exclude']], size):
+            rule_sets.append({**base, 'exclude': list(base['exclude']) + list(added)})
+            changes.append({'added': ', '.join(added), 'removed': ''})
+    if removals:
+        for keyword in dict.fromkeys(base['exclude']):
+            rule_sets.append({**base, 'exclude': [k for k in base['exclude'] if k != keyword]})
+            changes.append({'added': '', 'removed': keyword})
+    return rule_sets, changes
+
+def search_exclusions(tuner: RuleTuner, base: Dict[str, List[str]], candidates: Sequence[str] = (),
+                      max_size: int = 1, removals: bool = True) -> pd.DataFrame:
+    """
+    Score every candidate change to an exclusion list, best F1 first
+    """
+    rule_sets, changes = exclusion_candidates(base, candidates, max_size, removals)
+    started = time.perf_counter()
+    scores = tuner.score_exclusions(rule_sets)
+    elapsed = time.perf_counter() - started
+    print(f"Scored {len(rule_sets)} exclusion rule sets in {elapsed * 1000:.0f} ms "
+          f"({len(rule_sets) / max(elapsed, 1e-9):.0f} per second)")
+    return pd.concat([pd.DataFrame(changes), scores], axis=1) \
+        .sort_values(['f1', 'precision'], ascending=False, kind='stable')
+
+def search_category_keywords(tuner: RuleTuner, rules: Dict[str, List[str]], candidates: Sequence[str],
+                             fields: Tuple[str, ...] = ('name',)) -> pd.DataFrame:
+    """
+    Score adding each candidate keyword to each category, best macro F1 first
+    """
+    rule_sets = [rules]
+    changes = [{'category': '', 'added': ''}]
+    for category in rules:
+        for keyword in candidates:
+            if keyword not in rules[category]:
+                rule_sets.append({**rules, category: list(rules[category]) + [keyword]})
+                changes.append({'category': category, 'added': keyword})
+    started = time.perf_counter()
+    scores = tuner.score_categories(rule_sets, fields)
+    elapsed = time.perf_counter() - started
+    print(f"Scored {len(rule_sets)} category rule sets in {elapsed * 1000:.0f} ms "
+          f"({len(rule_sets) / max(elapsed, 1e-9):.0f} per second)")
+    return pd.concat([pd.DataFrame(changes), scores], axis=1) \
+        .sort_values(['macro_f1', 'accuracy'], ascending=False, kind='stable')
+
+def load_rules(filepath: Optional[str]) -> Tuple[Dict[str, List[str]], Dict[str, List[str]], Tuple[str, ...]]:
+    """
+    Exclusion rules, category rules and the fields categories match on
+
+    Defaults are clean_data's exclusion keywords and DataProcessor's
+    categories (matched on name and search query); a JSON file may override
+    'exclude', 'keep' and 'categories' (then matched on name only, unless it
+    sets 'category_fields').
+    """
+    exclusion = {'exclude': list(EXCLUDE_KEYWORDS), 'keep': []}
+    categories = {category: keywords for category, keywords in DataProcessor().fitness_categories.items()
+                  if keywords}
+    fields = ('name', 'search_query')
+    if filepath:
+        with open(filepath, 'r', encoding='utf-8') as f:
+            overrides = json.load(f)
+        exclusion = {'exclude': overrides.get('exclude', exclusion['exclude']), 'keep': overrides.get('keep', [])}
+        if 'categories' in overrides:
+            categories = overrides['categories']
+            fields = tuple(overrides.get('category_fields', ['name']))
+    return exclusion, categories, fields
+
+def main():
+    """
+    Command line entry point: score the current or given rules, optionally searching for better ones
+    """
+    parser = argparse.ArgumentParser(description='Score keyword rules against the curated final locations')
+    parser.add_argument('--rules', help="JSON file with 'exclude', 'keep' and/or 'categories' keyword lists")
+    parser.add_argument('--combined', default=COMBINED_DATA_OUTPUT,
+                       help=f'All locations (default: {COMBINED_DATA_OUTPUT})')
+    parser.add_argument('--final', default=FINAL_DATA_PATH, help=f'Curated locations (default: {FINAL_DATA_PATH})')
+    parser.add_argument('--search', action='store_true',
+                       help='Grid search exclusion changes and category keyword additions')
+    parser.add_argument('--candidates', default='', help='Comma-separated keywords to try adding')
+    parser.add_argument('--max-size', type=int, default=1, help='Most candidates added at once (default: 1)')
+    parser.add_argument('--top', type=int, default=15, help='Search results to show (default: 15)')
+
+    args = parser.parse_args()
+
+    for path in (args.combined, args.final):
+        if not os.path.exists(path):
+            parser.error(f"File not found: {path}")
+
+    tuner = RuleTuner.from_files(args.combined, args.final)
+    exclusion, categories, fields = load_rules(args.rules)
+    print(f"Loaded {len(tuner.df)} locations: {int(tuner.excluded.sum())} curated out, "
+          f"{int((~tuner.excluded).sum())} kept")
+
+    started = time.perf_counter()
+    tuner.index(('name',))[1].add(exclusion['exclude'] + exclusion['keep'])
+    tuner.index(fields)[1].add(k for keywords in categories.values() for k in keywords)
+    print(f"Built keyword match matrices in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    print("\nExclusion rules:")
+    print(tuner.score_exclusions([exclusion]).to_string(index=False))
+    print(tuner.exclusion_confusion(exclusion).to_string())
+    if not args.rules and os.path.exists(EXCLUDED_DATA_PATH):
+        # The default rules are clean_data's, so they should reproduce its last output
+        codes, _ = tuner.index(('name',))
+        predicted = set(tuner.df['place_id'][tuner.predict_exclusions([exclusion])[:, 0][codes]])
+        written = set(pd.read_csv(EXCLUDED_DATA_PATH)['place_id'])
+        print(f"{EXCLUDED_DATA_PATH}: {len(written & predicted)}/{len(written)} rows reproduced, "
+              f"{len(predicted - written)} not in the file")
+
+    table, confusion = tuner.category_report(categories, fields)
+    print(f"\nCategory rules (matching {' + '.join(fields)}):")
+    print(table.to_string())
+    print(confusion.to_string())
+
+    if args.search:
+        candidates = [c.strip().lower() for c in args.candidates.split(',') if c.strip()]
+        print("\nExclusion search:")
+        results = search_exclusions(tuner, exclusion, candidates, args.max_size)
+        print(results.head(args.top).to_string(index=False))
+        if candidates:
+            print("\nCategory keyword search:")
+            results = search_category_keywords(tuner, categories, candidates, fields)
+            print(results.head(args.top).to_string(index=False))
+
+    return tuner
+
+if __name__ == "__main__":
+    main()
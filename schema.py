@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Compact, explicit dtypes for the pipeline datasets.
+
+A plain read_csv keeps every text column as Python string objects, stores
+flags that had a gap as object columns of True/False/NaN, and widens every
+number to 64 bits. The schemas here load the same files with:
+
+- categoricals for low-cardinality labels (category, search_query,
+  search_location, ...), which also makes groupbys on them work on integer
+  codes; planning_area uses the area registry's categorical, so its codes
+  are the stable planning area ids and names are canonical
+- Arrow-backed strings for free text (names, addresses, websites, phones)
+- float32 where one decimal of precision is all the data carries (ratings)
+- nullable integers, and real booleans for flags that came back as objects
+  (nullable only when a flag has gaps), so a missing value does not widen
+  the column
+
+Coordinates and incomes stay float64: float32 steps near 104 degrees are
+about 0.8 m, enough to move a studio across a nearest-centroid boundary,
+and incomes are summed across thousands of rows in the aggregate cube.
+
+Usage:
+    python schema.py data/final_fitness_locations.csv
+    python schema.py data/household_income.csv --schema income
+"""
+
+import argparse
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+import pandas as pd
+from area_registry import PLANNING_AREA_REGISTRY
+from config import SINGAPORE_BOUNDS
+
+STRING = 'string[pyarrow]'
+# Categorical of canonical planning area names whose codes are registry ids
+PLANNING_AREA = 'planning_area'
+
+_TRUE_VALUES = {'true': True, '1': True, '1.0': True, 'yes': True,
+                'false': False, '0': False, '0.0': False, 'no': False}
+
+class SchemaError(ValueError):
+    """
+    Raised when a dataset is missing required columns, or fails validation in strict mode
+    """
+
+def fill_category(values: pd.Series, fallback: str) -> pd.Series:
+    """
+    fillna that also works on categoricals that do not yet have the fallback as a category
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype) and fallback not in values.cat.categories:
+        values = values.cat.add_categories([fallback])
+    return values.fillna(fallback)
+
+def memory_mb(df: pd.DataFrame) -> float:
+    """
+    Deep in-memory size of a DataFrame in megabytes
+    """
+    return df.memory_usage(deep=True, index=False).sum() / 1e6
+
+def _to_bool(values: pd.Series) -> Tuple[pd.Series, int]:
+    """
+    Parse True/False flags however the CSV round-trip left them; gaps give a nullable boolean
+    """
+    if pd.api.types.is_bool_dtype(values.dtype):
+        return values, 0
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        result = values.map({1: True, 0: False})
+    else:
+        result = values.astype(str).str.strip().str.lower().map(_TRUE_VALUES)
+    invalid = int((values.notna() & result.isna()).sum())
+    return result.astype('boolean' if result.isna().any() else bool), invalid
+
+class DatasetSchema:
+    """
+    Column dtypes, required columns and valid value ranges for one dataset.
+
+    Columns the schema does not mention are left as read_csv parsed them,
+    and schema columns missing from a file are skipped unless required.
+    """
+    def __init__(self, name: str, dtypes: Dict[str, str], required: Sequence[str] = (),
+                 ranges: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.name = name
+        self.dtypes = dtypes
+        self.required = list(required)
+        self.ranges = ranges or {}
+
+    def cast(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Convert columns to their schema dtypes, returning the new frame and any problems
+
+        Values that cannot be parsed become missing and are reported; a
+        column that cannot take its dtype at all (e.g. fractional household
+        counts for an integer column) keeps its original dtype.
+        """
+        missing = [column for column in self.required if column not in df.columns]
+        if missing:
+            raise SchemaError(f"{self.name}: missing required columns {missing}")
+
+        columns = {}
+        problems = []
+        for column, dtype in self.dtypes.items():
+            if column not in df.columns:
+                continue
+            values = df[column]
+            invalid = 0
+            try:
+                if dtype == 'bool':
+                    converted, invalid = _to_bool(values)
+                elif dtype == PLANNING_AREA:
+                    converted = PLANNING_AREA_REGISTRY.categorical(values, index=values.index)
+                    invalid = int(values.isin(PLANNING_AREA_REGISTRY.unmatched(values)).sum())
+                elif dtype in ('category', STRING):
+                    converted = values.astype(dtype)
+                else:
+                    numeric = pd.to_numeric(values, errors='coerce')
+                    invalid = int((values.notna() & numeric.isna()).sum())
+                    converted = numeric.astype(dtype)
+            except (TypeError, ValueError) as e:
+                problems.append(f"{column}: kept {values.dtype}, cannot convert to {dtype} ({e})")
+                continue
+            if invalid:
+                problems.append(f"{column}: {invalid} values could not be read as {dtype}")
+            columns[column] = converted
+
+        return df.assign(**columns), problems
+
+    def validate(self, df: pd.DataFrame) -> List[str]:
+        """
+        Check value ranges, returning a description of every violation
+        """
+        problems = []
+        for column, (low, high) in self.ranges.items():
+            if column not in df.columns or not pd.api.types.is_numeric_dtype(df[column].dtype):
+                continue
+            outside = int((~df[column].between(low, high) & df[column].notna()).sum())
+            if outside:
+                problems.append(f"{column}: {outside} values outside [{low}, {high}]")
+        return problems
+
+    def apply(self, df: pd.DataFrame, strict: bool = False) -> pd.DataFrame:
+        """
+        Cast and validate an already loaded DataFrame, printing any problems
+        """
+        df, problems = self.cast(df)
+        problems += self.validate(df)
+        if problems and strict:
+            raise SchemaError(f"{self.name}: " + '; '.join(problems))
+        for problem in problems:
+            print(f"  Schema warning ({self.name}) - {problem}")
+        return df
+
+    def load(self, filepath: str, strict: bool = False, report: bool = True) -> pd.DataFrame:
+        """
+        Read a CSV with this schema's dtypes and report the memory saved
+        """
+        raw = pd.read_csv(filepath)
+        df = self.apply(raw, strict)
+        if report:
+            before, after = memory_mb(raw), memory_mb(df)
+            print(f"Compact dtypes for {filepath}: {before:.2f} MB as read -> {after:.2f} MB in memory "
+                  f"({before / max(after, 1e-9):.1f}x smaller)")
+        return df
+
+    def memory_table(self, raw: pd.DataFrame, compact: pd.DataFrame) -> pd.DataFrame:
+        """
+        Per-column dtypes and bytes before and after applying the schema
+        """
+        table = pd.DataFrame({
+            'raw_dtype': raw.dtypes.astype(str),
+            'raw_bytes': raw.memory_usage(deep=True, index=False),
+            'dtype': compact.dtypes.astype(str),
+            'bytes': compact.memory_usage(deep=True, index=False),
+        })
+        table['ratio'] = (table['raw_bytes'] / table['bytes']).round(1)
+        return table
+
+# Fitness locations at every stage: the extractor output, combined data and the final edited file
+LOCATION_SCHEMA = DatasetSchema('locations', {
+    'name': STRING,
+    'place_id': STRING,
+    'formatted_address': STRING,
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'rating': 'float32',
+    'user_ratings_total': 'Int32',
+    'website': STRING,
+    'phone_number': STRING,
+    'search_query': 'category',
+    'search_location': 'category',
+    'category': 'category',
+    'planning_area': PLANNING_AREA,
+    'weighted_average_income': 'float64',
+    'total_households': 'Int32',
+    'has_website': 'bool',
+    'has_phone': 'bool',
+    'has_rating': 'bool',
+    'search_coverage': 'category',
+    'improved_category': 'category',
+    'details_fetched': 'bool',
+}, required=['name', 'latitude', 'longitude'], ranges={
+    'latitude': (SINGAPORE_BOUNDS['south'], SINGAPORE_BOUNDS['north']),
+    'longitude': (SINGAPORE_BOUNDS['west'], SINGAPORE_BOUNDS['east']),
+    'rating': (0, 5),
+    'user_ratings_total': (0, float('inf')),
+})
+
+PLANNING_AREA_SCHEMA = DatasetSchema('planning_areas', {
+    'planning_area_name': STRING,
+    'planning_area_code': STRING,
+    'centroid_latitude': 'float64',
+    'centroid_longitude': 'float64',
+    'polygon_coordinates': STRING,
+    'total_coordinates': 'Int32',
+}, required=['planning_area_name', 'centroid_latitude', 'centroid_longitude'])
+
+INCOME_SCHEMA = DatasetSchema('income', {
+    'planning_area': PLANNING_AREA,
+    'total_households': 'Int32',
+    'weighted_average_income': 'float64',
+    'income_distribution': STRING,
+}, required=['planning_area', 'weighted_average_income'], ranges={
+    'weighted_average_income': (0, float('inf')),
+    'total_households': (0, float('inf')),
+})
+
+SCHEMAS = {schema.name: schema for schema in (LOCATION_SCHEMA, PLANNING_AREA_SCHEMA, INCOME_SCHEMA)}
+
+def load_locations(filepath: str, strict: bool = False, report: bool = True) -> pd.DataFrame:
+    """
+    Load a fitness locations CSV with compact dtypes
+    """
+    return LOCATION_SCHEMA.load(filepath, strict, report)
+
+def main():
+    """
+    Command line entry point: show the per-column memory saved by a schema
+    """
+    parser = argparse.ArgumentParser(description='Load a dataset with compact dtypes and report memory use')
+    parser.add_argument('filepath', help='CSV file to load')
+    parser.add_argument('--schema', choices=sorted(SCHEMAS), default='locations',
+                       help='Schema to apply (default: locations)')
+    parser.add_argument('--strict', action='store_true', help='Fail on any validation problem')
+
+    args = parser.parse_args()
+
+    if not os.path.exists(args.filepath):
+        parser.error(f"File not found: {args.filepath}")
+
+    schema = SCHEMAS[args.schema]
+    raw = pd.read_csv(args.filepath)
+    compact = schema.apply(raw, args.strict)
+    print(schema.memory_table(raw, compact).to_string())
+    before, after = memory_mb(raw), memory_mb(compact)
+    print(f"\nTotal: {before:.2f} MB -> {after:.2f} MB ({before / max(after, 1e-9):.1f}x smaller)")
+    return compact
+
+if __name__ == "__main__":
+    main()
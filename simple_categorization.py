@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+from classification_cache import ClassificationCache, ruleset_hash
 
 def simple_categorization():
     """
@@ -16,38 +17,34 @@ def simple_categorization():
     df = pd.read_csv(cleaned_data_path)
     print(f"Loaded {len(df)} cleaned locations")
     
+    # Categories checked in order of specificity; the first with a keyword in the name wins
+    name_rules = [
+        ('Yoga/Pilates Studio', ['yoga', 'pilates', 'reformer', 'megaformer', 'lagree', 'bikram', 'yin', 'aerial yoga', 'hot yoga', 'power yoga', 'hatha', 'vinyasa', 'ashtanga', 'iyengar', 'kundalini', 'meditation', 'mindfulness']),
+        ('Martial Arts', ['martial', 'karate', 'taekwondo', 'judo', 'jiu-jitsu', 'bjj', 'muay thai', 'kickboxing', 'boxing', 'mma', 'krav maga', 'silat', 'kung fu', 'wing chun', 'aikido', 'hapkido', 'wrestling', 'grappling', 'combat', 'fight']),
+        ('Dance Studio', ['dance', 'zumba', 'contemporary', 'pole', 'aerial', 'ballet', 'jazz', 'hip hop', 'salsa', 'bachata', 'kizomba', 'ballroom', 'latin', 'street dance', 'urban dance', 'barre', 'ballet barre', 'choreography']),
+        ('Cycling/Spin', ['cycling', 'spin', 'rhythm', 'indoor cycling', 'bike', 'peloton', 'soulcycle', 'flywheel', 'cyclebar', 'spinning', 'bicycle', 'wheel', 'pedal']),
+        ('BFT', ['bft', 'body fit training', 'bodyfit', 'body fit', 'bf training']),
+        ('Gym', ['gym', 'fitness center', 'fitness centre', 'health club', 'sports club', 'athletic club', 'fitness club', 'gymnasium', 'weight room', 'strength training', 'powerlifting', 'weightlifting', 'bodybuilding', 'crossfit', 'functional training', 'strength', 'power', 'muscle']),
+        ('Fitness Studio', ['fitness', 'training', 'workout', 'exercise', 'cardio', 'hiit', 'personal training', 'pt', 'trainer', 'coach']),
+    ]
+    
     def categorize_by_name(name):
         if pd.isna(name):
             return 'Others'
         
         name_lower = str(name).lower()
         
-        # Check for specific keywords in order of specificity
-        if any(keyword in name_lower for keyword in ['yoga', 'pilates', 'reformer', 'megaformer', 'lagree', 'bikram', 'yin', 'aerial yoga', 'hot yoga', 'power yoga', 'hatha', 'vinyasa', 'ashtanga', 'iyengar', 'kundalini', 'meditation', 'mindfulness']):
-            return 'Yoga/Pilates Studio'
-        
-        if any(keyword in name_lower for keyword in ['martial', 'karate', 'taekwondo', 'judo', 'jiu-jitsu', 'bjj', 'muay thai', 'kickboxing', 'boxing', 'mma', 'krav maga', 'silat', 'kung fu', 'wing chun', 'aikido', 'hapkido', 'wrestling', 'grappling', 'combat', 'fight']):
-            return 'Martial Arts'
-        
-        if any(keyword in name_lower for keyword in ['dance', 'zumba', 'contemporary', 'pole', 'aerial', 'ballet', 'jazz', 'hip hop', 'salsa', 'bachata', 'kizomba', 'ballroom', 'latin', 'street dance', 'urban dance', 'barre', 'ballet barre', 'choreography']):
-            return 'Dance Studio'
-        
-        if any(keyword in name_lower for keyword in ['cycling', 'spin', 'rhythm', 'indoor cycling', 'bike', 'peloton', 'soulcycle', 'flywheel', 'cyclebar', 'spinning', 'bicycle', 'wheel', 'pedal']):
-            return 'Cycling/Spin'
-        
-        if any(keyword in name_lower for keyword in ['bft', 'body fit training', 'bodyfit', 'body fit', 'bf training']):
-            return 'BFT'
-        
-        if any(keyword in name_lower for keyword in ['gym', 'fitness center', 'fitness centre', 'health club', 'sports club', 'athletic club', 'fitness club', 'gymnasium', 'weight room', 'strength training', 'powerlifting', 'weightlifting', 'bodybuilding', 'crossfit', 'functional training', 'strength', 'power', 'muscle']):
-            return 'Gym'
-        
-        if any(keyword in name_lower for keyword in ['fitness', 'training', 'workout', 'exercise', 'cardio', 'hiit', 'personal training', 'pt', 'trainer', 'coach']):
-            return 'Fitness Studio'
+        for category, keywords in name_rules:
+            if any(keyword in name_lower for keyword in keywords):
+                return category
         
         return 'Others'
     
-    # Apply simple categorization
-    df['simple_category'] = df['name'].apply(categorize_by_name)
+    # Apply simple categorization, evaluating only names not seen with these keywords before
+    cache = ClassificationCache()
+    df['simple_category'] = cache.classify(ruleset_hash('simple_categorization.categorize_by_name', name_rules),
+                                           [df['name']], categorize_by_name)
+    cache.report("Categorization")
     
     # Show categorization results
     print("\nSimple categorization results:")
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Append-only history of location crawls and household income years.
+
+Every crawl is written as its own Parquet file under a date partition and
+is never rewritten:
+
+    data/snapshots/locations/snapshot_date=2024-05-01/20240501T093000.parquet
+    data/snapshots/income/year=2020/snapshot_date=2024-05-01/20240501T094500.parquet
+
+The diff engine reads only the two snapshots being compared, and only the
+columns it needs, so history can grow without growing the cost of a diff.
+
+Usage:
+    python snapshot_store.py list
+    python snapshot_store.py add-locations [--file data/fitness_locations.csv]
+    python snapshot_store.py add-income --year 2020 [--file data/household_income.csv]
+    python snapshot_store.py diff <old_snapshot_id> <new_snapshot_id> [--output-dir data/diffs]
+    python snapshot_store.py income-diff 2015 2020
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+SNAPSHOT_ROOT = "data/snapshots"
+SNAPSHOT_ID_FORMAT = "%Y%m%dT%H%M%S"
+SNAPSHOT_ID_SUFFIX = '_'  # Separates a sequence number when two snapshots are taken in the same second
+DIFF_COLUMNS = ['place_id', 'name', 'formatted_address', 'latitude', 'longitude', 'rating', 'user_ratings_total']
+
+class SnapshotStore:
+    """
+    Date-partitioned Parquet snapshots of location crawls and income years
+    """
+    def __init__(self, root: str = SNAPSHOT_ROOT):
+        self.root = root
+        self.locations_dir = os.path.join(root, 'locations')
+        self.income_dir = os.path.join(root, 'income')
+
+    @staticmethod
+    def _to_table(df: pd.DataFrame) -> pa.Table:
+        """
+        Convert a frame to Arrow, storing nested values (e.g. income distributions) as JSON text
+        """
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            if df[column].map(lambda v: isinstance(v, (dict, list))).any():
+                df[column] = df[column].map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) else v)
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+    def _write(self, partition_dir: str, df: pd.DataFrame, taken_at: Optional[datetime]) -> str:
+        taken_at = taken_at or datetime.now()
+        base_id = snapshot_id = taken_at.strftime(SNAPSHOT_ID_FORMAT)
+        directory = os.path.join(partition_dir, f"snapshot_date={taken_at:%Y-%m-%d}")
+        filepath = os.path.join(directory, f"{snapshot_id}.parquet")
+        # Snapshots are append-only, so a second one in the same second gets a numbered id
+        sequence = 1
+        while os.path.exists(filepath):
+            sequence += 1
+            snapshot_id = f"{base_id}{SNAPSHOT_ID_SUFFIX}{sequence}"
+            filepath = os.path.join(directory, f"{snapshot_id}.parquet")
+
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temporary name first so a crashed write never leaves a partial snapshot
+        temp_path = filepath + '.tmp'
+        pq.write_table(self._to_table(df), temp_path, compression='zstd')
+        os.replace(temp_path, filepath)
+        return snapshot_id
+
+    def append_locations(self, df: pd.DataFrame, taken_at: Optional[datetime] = None) -> str:
+        """
+        Store a location crawl as a new snapshot and return its id
+        """
+        snapshot_id = self._write(self.locations_dir, df, taken_at)
+        print(f"Saved location snapshot {snapshot_id} ({len(df)} locations)")
+        return snapshot_id
+
+    def append_income(self, df: pd.DataFrame, year: str, taken_at: Optional[datetime] = None) -> str:
+        """
+        Store one income year's extraction as a new snapshot and return its id
+        """
+        snapshot_id = self._write(os.path.join(self.income_dir, f"year={year}"), df, taken_at)
+        print(f"Saved income snapshot {snapshot_id} for {year} ({len(df)} planning areas)")
+        return snapshot_id
+
+    @staticmethod
+    def _scan(directory: str) -> List[Dict]:
+        entries = []
+        if not os.path.isdir(directory):
+            return entries
+        for partition in sorted(os.listdir(directory)):
+            if not partition.startswith('snapshot_date='):
+                continue
+            for filename in sorted(os.listdir(os.path.join(directory, partition))):
+                if filename.endswith('.parquet'):
+                    filepath = os.path.join(directory, partition, filename)
+                    entries.append({
+                        'snapshot_id': filename[:-len('.parquet')],
+                        'snapshot_date': partition.split('=', 1)[1],
+                        'rows': pq.ParquetFile(filepath).metadata.num_rows,
+                        'path': filepath,
+                    })
+        return entries
+
+    def list_location_snapshots(self) -> pd.DataFrame:
+        """
+        Every location snapshot, oldest first, read from file metadata only
+        """
+        return pd.DataFrame(self._scan(self.locations_dir), columns=['snapshot_id', 'snapshot_date', 'rows', 'path'])
+
+    def list_income_snapshots(self) -> pd.DataFrame:
+        """
+        Every income snapshot with its year, oldest first
+        """
+        entries = []
+        if os.path.isdir(self.income_dir):
+            for partition in sorted(os.listdir(self.income_dir)):
+                if partition.startswith('year='):
+                    year = partition.split('=', 1)[1]
+                    entries.extend(dict(entry, year=year) for entry in self._scan(os.path.join(self.income_dir, partition)))
+        return pd.DataFrame(entries, columns=['year', 'snapshot_id', 'snapshot_date', 'rows', 'path'])
+
+    def _location_path(self, snapshot_id: str) -> str:
+        taken_at = datetime.strptime(snapshot_id.split(SNAPSHOT_ID_SUFFIX)[0], SNAPSHOT_ID_FORMAT)
+        filepath = os.path.join(self.locations_dir, f"snapshot_date={taken_at:%Y-%m-%d}", f"{snapshot_id}.parquet")
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Location snapshot not found: {snapshot_id}")
+        return filepath
+
+    def load_locations(self, snapshot_id: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Load one location snapshot, optionally only some of its columns
+        """
+        filepath = self._location_path(snapshot_id)
+        if columns is not None:
+            available = set(pq.ParquetFile(filepath).schema_arrow.names)
+            columns = [column for column in columns if column in available]
+        return pq.read_table(filepath, columns=columns).to_pandas()
+
+    def load_income(self, year: str, snapshot_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Load an income year, from its latest snapshot unless one is named
+        """
+        snapshots = self.list_income_snapshots()
+        snapshots = snapshots[snapshots['year'] == str(year)]
+        if snapshot_id is not None:
+            snapshots = snapshots[snapshots['snapshot_id'] == snapshot_id]
+        if snapshots.empty:
+            raise FileNotFoundError(f"No income snapshot for year {year}")
+        return pq.read_table(snapshots.iloc[-1]['path']).to_pandas()
+
+    def diff_locations(self, old_id: str, new_id: str, min_rating_change: float = 0.1) -> Dict[str, pd.DataFrame]:
+        """
+        Compare two location snapshots by place_id
+
+        Returns 'openings' (only in the new snapshot), 'closures' (only in the
+        old one) and 'rating_changes' (in both, with the rating moved by at
+        least min_rating_change, or rated on only one side), each as a
+        DataFrame. A missing or zero rating counts as unrated; rating_status
+        is 'changed', 'gained' or 'lost', and places that gained or lost a
+        rating have no rating_change and are listed first.
+        """
+        old = self.load_locations(old_id, DIFF_COLUMNS).drop_duplicates('place_id')
+        new = self.load_locations(new_id, DIFF_COLUMNS).drop_duplicates('place_id')
+
+        openings = new[~new['place_id'].isin(old['place_id'])].reset_index(drop=True)
+        closures = old[~old['place_id'].isin(new['place_id'])].reset_index(drop=True)
+
+        both = old[['place_id', 'rating', 'user_ratings_total']].merge(
+            new[['place_id', 'name', 'rating', 'user_ratings_total']], on='place_id', suffixes=('_old', '_new')
+        )
+        for column in ('rating_old', 'rating_new'):
+            both[column] = both[column].where(both[column] > 0)
+        rated_old, rated_new = both['rating_old'].notna(), both['rating_new'].notna()
+        both['rating_status'] = np.select([rated_old & rated_new, rated_new], ['changed', 'gained'], 'lost')
+        both['rating_change'] = both['rating_new'] - both['rating_old']
+        both['review_change'] = both['user_ratings_total_new'] - both['user_ratings_total_old']
+        rating_changes = both[(both['rating_change'].abs() >= min_rating_change - 1e-9) | (rated_old != rated_new)]
+        rating_changes = rating_changes.sort_values('rating_change', key=lambda change: change.abs().fillna(np.inf),
+                                                    ascending=False, kind='stable')
+
+        print(f"Diff {old_id} -> {new_id}: {len(openings)} openings, {len(closures)} closures, "
+              f"{len(rating_changes)} rating changes")
+        return {
+            'openings': openings,
+            'closures': closures,
+            'rating_changes': rating_changes[['place_id', 'name', 'rating_status', 'rating_old', 'rating_new',
+                                              'rating_change', 'user_ratings_total_old', 'user_ratings_total_new',
+                                              'review_change']].reset_index(drop=True),
+        }
+
+    def diff_income(self, old_year: str, new_year: str) -> pd.DataFrame:
+        """
+        Change in households and weighted average income per planning area between two years
+        """
+        columns = ['planning_area', 'total_households', 'weighted_average_income']
+        old = self.load_income(old_year)[columns].dropna(subset=['planning_area'])
+        new = self.load_income(new_year)[columns].dropna(subset=['planning_area'])
+        diff = old.merge(new, on='planning_area', how='outer', suffixes=(f'_{old_year}', f'_{new_year}'))
+        diff['income_change'] = diff[f'weighted_average_income_{new_year}'] - diff[f'weighted_average_income_{old_year}']
+        diff['household_change'] = diff[f'total_households_{new_year}'] - diff[f'total_households_{old_year}']
+        return diff.sort_values('income_change', ascending=False, kind='stable').reset_index(drop=True)
+
+def snapshot_locations(df: pd.DataFrame, root: str = SNAPSHOT_ROOT) -> Optional[str]:
+    """
+    Snapshot a crawl without letting a storage error stop the pipeline
+    """
+    try:
+        return SnapshotStore(root).append_locations(df)
+    except Exception as e:
+        print(f"Could not save location snapshot: {e}")
+        return None
+
+def snapshot_income(df: pd.DataFrame, year: str, root: str = SNAPSHOT_ROOT) -> Optional[str]:
+    """
+    Snapshot an income extraction without letting a storage error stop the pipeline
+    """
+    try:
+        return SnapshotStore(root).append_income(df, year)
+    except Exception as e:
+        print(f"Could not save income snapshot: {e}")
+        return None
+
+def main():
+    """
+    Command line entry point for the snapshot store
+    """
+    parser = argparse.ArgumentParser(description='Versioned location and income snapshots')
+    parser.add_argument('--root', default=SNAPSHOT_ROOT, help=f'Snapshot directory (default: {SNAPSHOT_ROOT})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    subparsers.add_parser('list', help='List all snapshots')
+
+    add_locations = subparsers.add_parser('add-locations', help='Snapshot a location crawl CSV')
+    add_locations.add_argument('--file', default='data/fitness_locations.csv')
+
+    add_income = subparsers.add_parser('add-income', help='Snapshot an income CSV for a year')
+    add_income.add_argument('--year', required=True)
+    add_income.add_argument('--file', default='data/household_income.csv')
+
+    diff = subparsers.add_parser('diff', help='Openings, closures and rating changes between two snapshots')
+    diff.add_argument('old_id')
+    diff.add_argument('new_id')
+    diff.add_argument('--min-rating-change', type=float, default=0.1)
+    diff.add_argument('--output-dir', help='Write openings/closures/rating_changes CSVs here')
+
+    income_diff = subparsers.add_parser('income-diff', help='Income change per planning area between two years')
+    income_diff.add_argument('old_year')
+    income_diff.add_argument('new_year')
+
+    args = parser.parse_args()
+    store = SnapshotStore(args.root)
+
+    if args.command == 'list':
+        print("Location snapshots:")
+        print(store.list_location_snapshots().drop(columns='path').to_string(index=False))
+        print("\nIncome snapshots:")
+        print(store.list_income_snapshots().drop(columns='path').to_string(index=False))
+    elif args.command == 'add-locations':
+        store.append_locations(pd.read_csv(args.file))
+    elif args.command == 'add-income':
+        store.append_income(pd.read_csv(args.file), args.year)
+    elif args.command == 'diff':
+        results = store.diff_locations(args.old_id, args.new_id, args.min_rating_change)
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+            for name, frame in results.items():
+                filepath = os.path.join(args.output_dir, f"{args.old_id}_{args.new_id}_{name}.csv")
+                frame.to_csv(filepath, index=False)
+                print(f"Saved {len(frame)} {name.replace('_', ' ')} to {filepath}")
+        else:
+            for name, frame in results.items():
+                print(f"\n{name.replace('_', ' ').title()} ({len(frame)}):")
+                print(frame.head(20).to_string(index=False))
+    elif args.command == 'income-diff':
+        print(store.diff_income(args.old_year, args.new_year).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import pandas as pd
 import os
+from classification_cache import ClassificationCache, ruleset_hash
+from token_mining import NgramDocumentTermMatrix, suggest_exclusions
 from config import COMBINED_DATA_OUTPUT
 
 def targeted_data_cleaner():
@@ -28,9 +30,13 @@ def targeted_data_cleaner():
         name_lower = str(name).lower()
         return any(keyword in name_lower for keyword in user_exclude_keywords)
     
-    # Apply user exclusions
-    excluded_df = df[df['name'].apply(should_exclude)].copy()
-    remaining_df = df[~df['name'].apply(should_exclude)].copy()
+    # Apply user exclusions, evaluating only names not seen with these keywords before
+    cache = ClassificationCache()
+    exclude = cache.classify(ruleset_hash('targeted_data_cleaner.should_exclude', user_exclude_keywords),
+                             [df['name']], should_exclude).astype(bool)
+    cache.report("Exclusion check")
+    excluded_df = df[exclude].copy()
+    remaining_df = df[~exclude].copy()
     
     print(f"\nUser exclusions applied:")
     print(f"Excluded {len(excluded_df)} locations with user-specified keywords")
@@ -76,9 +82,14 @@ def targeted_data_cleaner():
         'indoor', 'studio', 'space', 'venue', 'facility'
     ]
     
+    # Tokenize every name once; patterns are then checked against the distinct terms
+    longest = max(2, max(len(pattern.split()) for pattern in non_fitness_patterns))
+    dtm = NgramDocumentTermMatrix(df['name'], ngrams=(1, longest))
+    remaining = ~exclude
+    
     # Check which patterns appear in the remaining data
     for pattern in non_fitness_patterns:
-        pattern_matches = remaining_df[remaining_df['name'].str.lower().str.contains(pattern, na=False)]
+        pattern_matches = df[dtm.pattern_rows(pattern) & remaining]
         if len(pattern_matches) > 0:
             potential_exclusions.append({
                 'pattern': pattern,
@@ -96,6 +107,16 @@ def targeted_data_cleaner():
         print(f"    Examples: {', '.join(item['examples'])}")
         print()
     
+    # Mine terms that separate the excluded names from the kept ones, beyond any list above
+    mined = suggest_exclusions(dtm, exclude, top=20, known=user_exclude_keywords)
+    print(f"\nMined exclusion suggestions from {len(dtm.vocabulary)} name terms (showing top {len(mined)}):")
+    print("=" * 80)
+    for i, item in enumerate(mined):
+        print(f"{i+1:2d}. '{item['pattern']}' - {item['count']} remaining, {item['excluded_count']} excluded")
+        print(f"    Remaining: {', '.join(item['examples'])}")
+        print(f"    Excluded: {', '.join(item['excluded_examples'])}")
+        print()
+    
     # Save results
     excluded_output = "data/targeted_excluded_locations.csv"
     excluded_df.to_csv(excluded_output, index=False)
@@ -105,13 +126,17 @@ def targeted_data_cleaner():
     remaining_df.to_csv(remaining_output, index=False)
     print(f"Cleaned locations saved to: {remaining_output}")
     
+    suggestions_output = "data/targeted_exclusion_suggestions.csv"
+    pd.DataFrame(mined).to_csv(suggestions_output, index=False)
+    print(f"Mined suggestions saved to: {suggestions_output}")
+    
     # Show category distribution after cleaning
     print(f"\nCategory distribution after targeted cleaning:")
     category_counts = remaining_df['category'].value_counts()
     for category, count in category_counts.items():
         print(f"- {category}: {count}")
     
-    return remaining_df, excluded_df, potential_exclusions
+    return remaining_df, excluded_df, potential_exclusions, mined
 
 if __name__ == "__main__":
     targeted_data_cleaner()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Static tile export for the fitness map.
+
+Writes a z/x/y pyramid of JSON tiles plus a small Leaflet HTML shell that
+fetches only the tiles in view. Below POINT_ZOOM each tile holds studio
+counts binned to a coarse pixel grid; from POINT_ZOOM up it holds the
+individual studios as tile pixel offsets. Planning-area polygons are written
+once per area and referenced by id from the tiles they overlap, so the page
+loads in the same time however large the dataset is.
+
+The shell uses fetch(), so serve the output directory over HTTP, e.g.
+    python -m http.server --directory map_tiles
+
+Usage:
+    python tile_export.py [--output-dir map_tiles] [--min-zoom 10] [--max-zoom 16]
+"""
+
+import argparse
+import json
+import os
+import shutil
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+from color_scale import ColorScale
+from schema import fill_category
+
+TILE_SIZE = 256
+POINT_ZOOM = 14  # First zoom level with individual studios instead of binned counts
+BIN_PIXELS = 32  # Size of a count bin below POINT_ZOOM
+
+# What an export writes inside its output directory; only these are replaced on re-export
+EXPORT_DIRECTORIES = ('tiles', 'areas', 'area_tiles')
+SHELL_FILE = 'index.html'
+
+def lat_lng_to_pixels(lat, lng, zoom: int):
+    """
+    Project latitude/longitude arrays to global Web Mercator pixel coordinates at a zoom level
+    """
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -85.05112878, 85.05112878))
+    lng = np.asarray(lng, dtype=float)
+    scale = TILE_SIZE * 2 ** zoom
+    x = (lng + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * scale
+    return x, y
+
+class MapTileExporter:
+    def __init__(self, output_dir: str = "map_tiles", min_zoom: int = 10, max_zoom: int = 16,
+                 category_colors: Dict[str, str] = None, income_scale: ColorScale = None):
+        self.output_dir = output_dir
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+        self.category_colors = category_colors or {}
+        self.income_scale = income_scale or ColorScale('blue_cyan_red')
+
+    def _write_json(self, relative_path: str, payload) -> None:
+        filepath = os.path.join(self.output_dir, relative_path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, separators=(',', ':'))
+
+    def _group_by_tile(self, tile_x: np.ndarray, tile_y: np.ndarray):
+        """
+        Yield (x, y, row positions) for every tile, using one sort instead of a scan per tile
+        """
+        keys = tile_x.astype(np.int64) << 32 | tile_y.astype(np.int64)
+        order = np.argsort(keys, kind='stable')
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+        for key, start, end in zip(unique_keys, starts, ends):
+            yield int(key >> 32), int(key & 0xFFFFFFFF), order[start:end]
+
+    def export_points(self, df: pd.DataFrame, categories: List[str]) -> int:
+        """
+        Write the studio point tiles for every zoom level, returning the number of tiles written
+        """
+        lat = df['latitude'].to_numpy(dtype=float)
+        lng = df['longitude'].to_numpy(dtype=float)
+        # Missing categories would get code -1, which neither bincount nor the shell's colour list accepts
+        category_codes = pd.Categorical(fill_category(df['category'], 'Others'), categories=categories).codes
+        names = df['name'].fillna('').to_numpy()
+
+        tiles_written = 0
+        for zoom in range(self.min_zoom, self.max_zoom + 1):
+            px, py = lat_lng_to_pixels(lat, lng, zoom)
+            tile_x = (px // TILE_SIZE).astype(np.int64)
+            tile_y = (py // TILE_SIZE).astype(np.int64)
+            offset_x = (px - tile_x * TILE_SIZE).astype(np.int64)
+            offset_y = (py - tile_y * TILE_SIZE).astype(np.int64)
+
+            if zoom < POINT_ZOOM:
+                # Bin to a coarse pixel grid per tile and per category
+                bins_per_side = TILE_SIZE // BIN_PIXELS
+                bin_index = (offset_y // BIN_PIXELS) * bins_per_side + offset_x // BIN_PIXELS
+                for x, y, rows in self._group_by_tile(tile_x, tile_y):
+                    counts = np.bincount(
+                        bin_index[rows] * len(categories) + category_codes[rows],
+                        minlength=bins_per_side ** 2 * len(categories)
+                    ).reshape(bins_per_side ** 2, len(categories))
+                    occupied = np.flatnonzero(counts.sum(axis=1))
+                    bins = [
+                        [int(b % bins_per_side * BIN_PIXELS + BIN_PIXELS // 2),
+                         int(b // bins_per_side * BIN_PIXELS + BIN_PIXELS // 2),
+                         counts[b].tolist()]
+                        for b in occupied
+                    ]
+                    self._write_json(f"tiles/{zoom}/{x}/{y}.json", {'bins': bins})
+                    tiles_written += 1
+            else:
+                for x, y, rows in self._group_by_tile(tile_x, tile_y):
+                    points = np.column_stack([offset_x[rows], offset_y[rows], category_codes[rows]]).tolist()
+                    self._write_json(f"tiles/{zoom}/{x}/{y}.json", {
+                        'points': points,
+                        'names': names[rows].tolist()
+                    })
+                    tiles_written += 1
+
+        return tiles_written
+
+    def export_areas(self, planning_areas_df: pd.DataFrame) -> int:
+        """
+        Write one file per planning area and a tile -> area index, returning the number of areas
+        """
+        income = planning_areas_df.get('weighted_average_income', pd.Series(np.nan, index=planning_areas_df.index))
+        income = income.to_numpy(dtype=float)
+        colors = self.income_scale(income)
+
+        tile_areas: Dict[tuple, List[int]] = {}
+        area_count = 0
+        for area_id, (name, locations, area_income, color) in enumerate(zip(
+                planning_areas_df['planning_area_name'], planning_areas_df['locations'],
+                income, colors)):
+            # Rings come from the geometry store already parsed as [lat, lng]
+            coords = np.asarray(locations, dtype=float)
+            if coords.ndim != 2 or len(coords) < 3:
+                continue
+
+            self._write_json(f"areas/{area_id}.json", {
+                'name': name,
+                'income': None if np.isnan(area_income) else round(float(area_income)),
+                'color': color,
+                'coordinates': np.round(coords, 6).tolist()
+            })
+            area_count += 1
+
+            # The area index is only written at min_zoom; deeper tiles map onto it by bit shifting
+            px, py = lat_lng_to_pixels(coords[:, 0], coords[:, 1], self.min_zoom)
+            for x in range(int(px.min() // TILE_SIZE), int(px.max() // TILE_SIZE) + 1):
+                for y in range(int(py.min() // TILE_SIZE), int(py.max() // TILE_SIZE) + 1):
+                    tile_areas.setdefault((x, y), []).append(area_id)
+
+        for (x, y), area_ids in tile_areas.items():
+            self._write_json(f"area_tiles/{x}/{y}.json", area_ids)
+
+        return area_count
+
+    def write_shell(self, categories: List[str], center: List[float], stats_panel: str = "") -> str:
+        """
+        Write the HTML shell that loads tiles on demand
+        """
+        colors = [self.category_colors.get(c, self.category_colors.get('Others', '#F7DC6F')) for c in categories]
+        config = {
+            'center': center,
+            'minZoom': self.min_zoom,
+            'maxZoom': self.max_zoom,
+            'pointZoom': POINT_ZOOM,
+            'categories': categories,
+            'colors': colors
+        }
+        html = SHELL_TEMPLATE.replace('__CONFIG__', json.dumps(config)).replace('__STATS_PANEL__', stats_panel)
+        filepath = os.path.join(self.output_dir, SHELL_FILE)
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(html)
+        return filepath
+
+    def clear(self) -> None:
+        """
+        Remove a previous export's tiles and shell, leaving anything else in the output directory alone
+        """
+        for directory in EXPORT_DIRECTORIES:
+            path = os.path.join(self.output_dir, directory)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+        shell = os.path.join(self.output_dir, SHELL_FILE)
+        if os.path.isfile(shell):
+            os.remove(shell)
+
+    def export(self, df: pd.DataFrame, planning_areas_df: pd.DataFrame = None,
+               center: List[float] = None, stats_panel: str = "") -> str:
+        """
+        Export the full tile pyramid and HTML shell, returning the shell path
+        """
+        self.clear()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        valid = df['latitude'].notna() & df['longitude'].notna() & (df['latitude'] != 0)
+        df = df[valid].assign(category=lambda frame: fill_category(frame['category'], 'Others'))
+        categories = df['category'].value_counts()[lambda counts: counts > 0].index.tolist()
+
+        tiles = self.export_points(df, categories)
+        print(f"Wrote {tiles} point tiles for zoom {self.min_zoom}-{self.max_zoom}")
+
+        if planning_areas_df is not None and not planning_areas_df.empty:
+            areas = self.export_areas(planning_areas_df)
+            print(f"Wrote {areas} planning area geometries")
+            stats_panel += self.income_scale.legend_html('Household Income')
+
+        shell = self.write_shell(categories, center or [1.3521, 103.8198], stats_panel)
+        print(f"Tiled map shell saved to {shell}")
+        return shell
+
+SHELL_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Singapore Fitness Studios</title>
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+<style>html, body, #map { height: 100%; margin: 0; }</style>
+</head>
+<body>
+<div id="map"></div>
+__STATS_PANEL__
+<script>
+var CONFIG = __CONFIG__;
+var map = L.map('map', {minZoom: CONFIG.minZoom, maxZoom: CONFIG.maxZoom}).setView(CONFIG.center, 11);
+L.tileLayer('https://{s}.basemaps.cartocdn.com/light_all/{z}/{x}/{y}.png', {
+    attribution: '&copy; OpenStreetMap contributors &copy; CARTO'
+}).addTo(map);
+
+function fetchJson(url) {
+    return fetch(url).then(function (r) { return r.ok ? r.json() : null; }).catch(function () { return null; });
+}
+
+var StudioLayer = L.GridLayer.extend({
+    createTile: function (coords, done) {
+        var tile = document.createElement('canvas');
+        tile.width = tile.height = 256;
+        var ctx = tile.getContext('2d');
+        fetchJson('tiles/' + coords.z + '/' + coords.x + '/' + coords.y + '.json').then(function (data) {
+            if (data && data.bins) {
+                data.bins.forEach(function (b) {
+                    var total = 0, best = 0;
+                    b[2].forEach(function (n, i) { total += n; if (n > b[2][best]) best = i; });
+                    ctx.fillStyle = CONFIG.colors[best];
+                    ctx.globalAlpha = 0.75;
+                    ctx.beginPath();
+                    ctx.arc(b[0], b[1], Math.min(14, 3 + 2 * Math.sqrt(total)), 0, 2 * Math.PI);
+                    ctx.fill();
+                });
+            } else if (data && data.points) {
+                ctx.globalAlpha = 0.9;
+                data.points.forEach(function (p) {
+                    ctx.fillStyle = CONFIG.colors[p[2]];
+                    ctx.beginPath();
+                    ctx.arc(p[0], p[1], 5, 0, 2 * Math.PI);
+                    ctx.fill();
+                });
+            }
+            done(null, tile);
+        });
+        return tile;
+    }
+});
+
+var loadedAreas = {};
+var areaGroup = L.featureGroup();
+
+var AreaLayer = L.GridLayer.extend({
+    createTile: function (coords) {
+        var shift = Math.max(0, coords.z - CONFIG.minZoom);
+        fetchJson('area_tiles/' + (coords.x >> shift) + '/' + (coords.y >> shift) + '.json').then(function (ids) {
+            (ids || []).forEach(function (id) {
+                if (loadedAreas[id]) { return; }
+                loadedAreas[id] = true;
+                fetchJson('areas/' + id + '.json').then(function (area) {
+                    if (!area) { return; }
+                    L.polygon(area.coordinates, {color: area.color, fillColor: area.color, fillOpacity: 0.35, weight: 1})
+                        .bindPopup('<b>' + area.name + '</b>' + (area.income === null ? '' : '<br>Avg Income: $' + area.income.toLocaleString()))
+                        .addTo(areaGroup);
+                });
+            });
+        });
+        return document.createElement('div');
+    }
+});
+
+var studios = new StudioLayer().addTo(map);
+var areaTiles = new AreaLayer();
+map.on('overlayadd', function (e) { if (e.layer === areaGroup) { areaTiles.addTo(map); } });
+map.on('overlayremove', function (e) { if (e.layer === areaGroup) { map.removeLayer(areaTiles); } });
+L.control.layers(null, {'Fitness Studios': studios, 'Planning Areas - Household Income': areaGroup},
+                 {collapsed: false}).addTo(map);
+</script>
+</body>
+</html>
+"""
+
+def main():
+    """
+    Main function to export the fitness map as static tiles
+    """
+    parser = argparse.ArgumentParser(description='Export the fitness map as a static tile pyramid')
+    parser.add_argument('--output-dir', default='map_tiles', help='Output directory (default: map_tiles)')
+    parser.add_argument('--min-zoom', type=int, default=10, help='Lowest zoom level (default: 10)')
+    parser.add_argument('--max-zoom', type=int, default=16, help='Highest zoom level (default: 16)')
+    args = parser.parse_args()
+
+    # Imported here to avoid a circular import with visualization
+    from visualization import FitnessMapVisualizer
+
+    visualizer = FitnessMapVisualizer()
+    return visualizer.create_tiled_visualization(args.output_dir, args.min_zoom, args.max_zoom)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Mine location names for tokens that separate two sets of rows.
+
+Names are tokenized once into a sparse document-term matrix of word
+n-grams (unigrams and bigrams by default). Everything else is matrix
+arithmetic on it:
+
+- how many rows of each set contain a term is one sparse product with
+  the set's row weights, for every term at once
+- terms are ranked by a smoothed log-odds ratio between the two sets,
+  scaled by its standard error so rare terms do not dominate
+- keyword patterns are checked against the vocabulary rather than the
+  names: a pattern of k words is in a name exactly when it is inside one
+  of the name's k-grams, so a pattern costs a scan of the distinct terms
+  instead of every row
+
+Usage:
+    python token_mining.py data/targeted_excluded_locations.csv data/targeted_cleaned_locations.csv
+"""
+
+import argparse
+import os
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+DEFAULT_NGRAMS = (1, 2)
+MIN_COUNT = 2  # Terms in fewer rows than this are not suggested
+SMOOTHING = 0.5  # Added to every cell of a term's 2x2 table before taking log odds
+EXAMPLES_PER_TERM = 3
+
+def tokenize(name: str) -> List[str]:
+    """
+    Lower-case, whitespace-separated words of a name; punctuation stays attached
+    """
+    return str(name).lower().split()
+
+class NgramDocumentTermMatrix:
+    """
+    Sparse name x n-gram matrix over the distinct names of a column
+    """
+    def __init__(self, names: pd.Series, ngrams: Sequence[int] = DEFAULT_NGRAMS):
+        self.ngrams = tuple(ngrams)
+        values = names.astype(object).where(names.notna(), '')
+        # Distinct names are tokenized once; rows map onto them through codes
+        self.codes, self.names = pd.factorize(values)
+        self.vocabulary: Dict[str, int] = {}
+        indptr, indices = [0], []
+        for name in self.names:
+            words = tokenize(name)
+            terms = {' '.join(words[start:start + n]) for n in range(self.ngrams[0], self.ngrams[1] + 1)
+                     for start in range(len(words) - n + 1)}
+            indices.extend(self.vocabulary.setdefault(term, len(self.vocabulary)) for term in terms)
+            indptr.append(len(indices))
+        self.terms = np.array(list(self.vocabulary), dtype=object)
+        self.matrix = sparse.csr_matrix((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                                        shape=(len(self.names), len(self.vocabulary)))
+        self._by_term = None
+
+    def row_counts(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Rows selected by mask that contain each term
+        """
+        weights = np.bincount(self.codes[np.asarray(mask, dtype=bool)], minlength=len(self.names))
+        return self.matrix.T @ weights
+
+    def documents_with(self, term_ids: Iterable[int]) -> np.ndarray:
+        """
+        Distinct names containing any of the terms
+        """
+        if self._by_term is None:
+            self._by_term = self.matrix.tocsc()
+        term_ids = list(term_ids)
+        if not term_ids:
+            return np.array([], dtype=np.int64)
+        return np.unique(self._by_term[:, term_ids].indices)
+
+    def pattern_rows(self, pattern: str) -> np.ndarray:
+        """
+        Row mask of names containing a pattern, found through the vocabulary
+
+        Exact for patterns of up to the longest n-gram's number of words,
+        on names whose words are separated by single spaces.
+        """
+        size = len(pattern.split())
+        if not self.ngrams[0] <= size <= self.ngrams[1]:
+            raise ValueError(f"'{pattern}' has {size} words; the matrix holds {self.ngrams[0]}-{self.ngrams[1]}-grams")
+        pattern = pattern.lower()
+        term_ids = [term_id for term, term_id in self.vocabulary.items()
+                    if term.count(' ') == size - 1 and pattern in term]
+        found = np.zeros(len(self.names), dtype=bool)
+        found[self.documents_with(term_ids)] = True
+        return found[self.codes]
+
+    def examples(self, term_id: int, mask: np.ndarray, limit: int = EXAMPLES_PER_TERM) -> List[str]:
+        """
+        First few names among the masked rows that contain a term
+        """
+        documents = np.zeros(len(self.names), dtype=bool)
+        documents[self.documents_with([term_id])] = True
+        rows = np.flatnonzero(documents[self.codes] & np.asarray(mask, dtype=bool))[:limit]
+        return [str(self.names[self.codes[row]]) for row in rows]
+
+def rank_separating_terms(dtm: NgramDocumentTermMatrix, positive: np.ndarray, negative: Optional[np.ndarray] = None,
+                          min_count: int = MIN_COUNT, smoothing: float = SMOOTHING) -> pd.DataFrame:
+    """
+    Every term's row counts in the two sets and how strongly it leans towards the positive set
+
+    z is the smoothed log-odds ratio over its standard error; positive
+    values lean towards the positive set.
+    """
+    positive = np.asarray(positive, dtype=bool)
+    negative = ~positive if negative is None else np.asarray(negative, dtype=bool)
+    a = dtm.row_counts(positive).astype(float)
+    b = dtm.row_counts(negative).astype(float)
+    total_a, total_b = positive.sum(), negative.sum()
+    cells = [a + smoothing, total_a - a + smoothing, b + smoothing, total_b - b + smoothing]
+    log_odds = np.log(cells[0] / cells[1]) - np.log(cells[2] / cells[3])
+    z = log_odds / np.sqrt(sum(1 / cell for cell in cells))
+    ranked = pd.DataFrame({'term': dtm.terms, 'positive_count': a.astype(int), 'negative_count': b.astype(int),
+                           'log_odds': log_odds.round(3), 'z': z.round(3)})
+    ranked = ranked[ranked['positive_count'] + ranked['negative_count'] >= min_count]
+    return ranked.sort_values(['z', 'term'], ascending=[False, True], kind='stable').reset_index(drop=True)
+
+def suggest_exclusions(dtm: NgramDocumentTermMatrix, excluded: np.ndarray, top: int = 20,
+                       min_count: int = MIN_COUNT, known: Iterable[str] = ()) -> List[Dict]:
+    """
+    Terms that lean towards the excluded rows but still occur among the kept ones
+
+    Each suggestion carries its counts and example names from both sets, so
+    the kept names it would remove can be checked before adopting it. Terms
+    containing an already known keyword, terms without a letter or digit,
+    and terms found in exactly the same rows as a better-ranked suggestion
+    ('ris' after 'pasir ris') are skipped.
+    """
+    excluded = np.asarray(excluded, dtype=bool)
+    known = [keyword.lower() for keyword in known]
+    ranked = rank_separating_terms(dtm, excluded, min_count=min_count)
+    ranked = ranked[(ranked['positive_count'] > 0) & (ranked['negative_count'] > 0) & (ranked['z'] > 0)]
+    suggestions = []
+    seen = set()
+    for row in ranked.itertuples(index=False):
+        if any(keyword in row.term for keyword in known) or not any(c.isalnum() for c in row.term):
+            continue
+        term_id = dtm.vocabulary[row.term]
+        documents = dtm.documents_with([term_id]).tobytes()
+        if documents in seen:
+            continue
+        seen.add(documents)
+        suggestions.append({
+            'pattern': row.term,
+            'excluded_count': row.positive_count,
+            'count': row.negative_count,
+            'log_odds': row.log_odds,
+            'z': row.z,
+            'excluded_examples': dtm.examples(term_id, excluded),
+            'examples': dtm.examples(term_id, ~excluded),
+        })
+        if len(suggestions) == top:
+            break
+    return suggestions
+
+def main():
+    """
+    Command line entry point: rank terms separating an excluded file from a kept file
+    """
+    parser = argparse.ArgumentParser(description='Rank name terms separating excluded from kept locations')
+    parser.add_argument('excluded', help='CSV of excluded locations')
+    parser.add_argument('kept', help='CSV of kept locations')
+    parser.add_argument('--top', type=int, default=20, help='Suggestions to show (default: 20)')
+    parser.add_argument('--min-count', type=int, default=MIN_COUNT,
+                       help=f'Ignore terms in fewer rows (default: {MIN_COUNT})')
+
+    args = parser.parse_args()
+
+    for path in (args.excluded, args.kept):
+        if not os.path.exists(path):
+            parser.error(f"File not found: {path}")
+
+    excluded_df, kept_df = pd.read_csv(args.excluded), pd.read_csv(args.kept)
+    names = pd.concat([excluded_df['name'], kept_df['name']], ignore_index=True)
+    excluded = np.arange(len(names)) < len(excluded_df)
+    dtm = NgramDocumentTermMatrix(names)
+    print(f"Tokenized {len(names)} names into {len(dtm.vocabulary)} terms")
+
+    suggestions = suggest_exclusions(dtm, excluded, args.top, args.min_count)
+    for i, item in enumerate(suggestions, 1):
+        print(f"{i:2d}. '{item['pattern']}' - {item['count']} kept, {item['excluded_count']} excluded "
+              f"(z={item['z']:.1f})")
+        print(f"    Kept: {', '.join(item['examples'])}")
+        print(f"    Excluded: {', '.join(item['excluded_examples'])}")
+    return suggestions
+
+if __name__ == "__main__":
+    main()
@@ -2,9 +2,16 @@ import folium
 from folium import plugins
 import pandas as pd
 import numpy as np
-import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 import os
+from aggregate_cube import get_aggregate_cube
+from density_grid import DensityGridBinner
+from tile_export import MapTileExporter
+from report_generator import AnalysisReportGenerator
+from client_filter import FilterSearchPanel, build_search_bundle
+from lazy_popups import LazyPopupLoader, LazyMarkerGroup, write_popup_sidecar, popup_sidecar_path
+from map_engine import get_geo_store, IncomeChoroplethLayer, gradient_income_scale
+from schema import fill_category, load_locations
 from config import COMBINED_DATA_OUTPUT
 
 class FitnessMapVisualizer:
@@ -12,6 +19,9 @@ class FitnessMapVisualizer:
         # Singapore center coordinates
         self.singapore_center = [1.3521, 103.8198]
         
+        # Category layers of the last map's location markers, by category
+        self.location_groups = {}
+        
         # Color scheme for different categories
         self.category_colors = {
             'BFT': '#FF6B6B',  # Red
@@ -47,7 +57,7 @@ class FitnessMapVisualizer:
         """
         final_data_path = "data/final_fitness_locations.csv"
         if os.path.exists(final_data_path):
-            df = pd.read_csv(final_data_path)
+            df = load_locations(final_data_path)
             print(f"Loaded {len(df)} manually edited fitness locations for visualization")
         else:
             print(f"Final data file not found: {final_data_path}")
@@ -56,40 +66,13 @@ class FitnessMapVisualizer:
     
     def load_planning_areas_and_income(self):
         """
-        Load planning area polygons and income data
+        Load planning area polygons and income data from the shared geometry store
         """
-        try:
-            # Load planning areas data
-            planning_areas_path = "data/planning_areas.csv"
-            income_path = "data/household_income.csv"
-            
-            if not os.path.exists(planning_areas_path) or not os.path.exists(income_path):
-                print("Planning areas or income data not found. Skipping polygon overlay.")
-                return None, None
-            
-            planning_areas_df = pd.read_csv(planning_areas_path)
-            income_df = pd.read_csv(income_path)
-            
-            # Normalize planning area names for merging (convert to title case)
-            planning_areas_df['planning_area_normalized'] = planning_areas_df['planning_area_name'].str.title()
-            income_df['planning_area_normalized'] = income_df['planning_area'].str.title()
-            
-            # Merge planning areas with income data
-            merged_df = planning_areas_df.merge(
-                income_df[['planning_area_normalized', 'weighted_average_income']], 
-                left_on='planning_area_normalized', 
-                right_on='planning_area_normalized', 
-                how='left'
-            )
-            
-            # Clean up temporary column
-            merged_df = merged_df.drop(columns=['planning_area_normalized'])
-            
-            return merged_df, income_df
-            
-        except Exception as e:
-            print(f"Error loading planning areas data: {e}")
+        store = get_geo_store()
+        if store.empty:
+            print("Planning areas or income data not found. Skipping polygon overlay.")
             return None, None
+        return store.areas, store.income
     
     def create_base_map(self) -> folium.Map:
         """
@@ -101,37 +84,81 @@ class FitnessMapVisualizer:
             tiles='CartoDB positron'  # Clean black and white map
         )
     
-    def add_fitness_locations(self, map_obj: folium.Map, df: pd.DataFrame) -> folium.Map:
+    def marker_icon(self, category: str):
+        """
+        Return (icon html, icon size, icon anchor) for a category's pin
+        """
+        # Determine marker color based on category
+        if category in self.category_colors:
+            color = self.category_colors[category]
+        else:
+            color = self.category_colors['Others']
+        
+        # Create custom pin marker with colored ball
+        # Make BFT pins 50% larger
+        if category == 'BFT':
+            ball_size = 28  # 50% larger than 19px
+            pin_height = 48  # 50% larger than 32px
+            needle_top = 25  # Adjusted for larger ball
+            icon_size = (45, 48)  # 50% larger than (30, 32)
+            icon_anchor = (22, 48)  # Adjusted anchor
+        else:
+            ball_size = 19
+            pin_height = 32
+            needle_top = 17
+            icon_size = (30, 32)
+            icon_anchor = (15, 32)
+        
+        custom_icon_html = f"""
+            <div style="position: relative; width: {icon_size[0]}px; height: {pin_height}px;">
+                <!-- Colored ball on top -->
+                <div style="position: absolute; top: 0; left: 50%; transform: translateX(-50%); 
+                            width: {ball_size}px; height: {ball_size}px; background-color: {color}; 
+                            border-radius: 50%; border: 1px solid white; box-shadow: 0 2px 4px rgba(0,0,0,0.3);">
+                </div>
+                <!-- Needle/pin body -->
+                <div style="position: absolute; top: {needle_top}px; left: 50%; transform: translateX(-50%); 
+                            width: 2px; height: 15px; background-color: #333; 
+                            border-radius: 1px;">
+                </div>
+            </div>
+            """
+        return custom_icon_html, icon_size, icon_anchor
+    
+    def add_fitness_locations(self, map_obj: folium.Map, df: pd.DataFrame,
+                              popup_sidecar: Optional[str] = None) -> folium.Map:
         """
         Add fitness locations as markers to the map
+        
+        With popup_sidecar set, the page only embeds marker ids and coordinates;
+        popup fields are written to that file and loaded on the first click
+        (see lazy_popups). The sidecar must sit next to the saved map.
         """
         if df.empty:
             return map_obj
         
-        # Create feature groups for each category
-        category_groups = {}
+        # Locations without a category are shown, and counted, as Others
+        df = df.assign(category=fill_category(df['category'], 'Others'))
+        
+        # Create feature groups for each category, with counts from the aggregate cube
+        # (kept on the visualizer so the filter panel can hide them)
+        category_counts = get_aggregate_cube(df).category_totals()['location_count']
+        category_groups = self.location_groups = {}
         for category in df['category'].unique():
-            if category in self.category_colors:
-                color = self.category_colors[category]
-            else:
-                color = self.category_colors['Others']
-            
             category_groups[category] = folium.FeatureGroup(
-                name=f"{category} ({len(df[df['category'] == category])})",
+                name=f"{category} ({category_counts.get(category, 0)})",
                 overlay=True
             )
         
+        if popup_sidecar:
+            return self._add_lazy_fitness_locations(map_obj, df, category_groups, popup_sidecar)
+        
         # Add markers for each location
         for idx, row in df.iterrows():
             if pd.isna(row['latitude']) or pd.isna(row['longitude']):
                 continue
             
-            # Determine marker color based on category
             category = row['category']
-            if category in self.category_colors:
-                color = self.category_colors[category]
-            else:
-                color = self.category_colors['Others']
             
             # Create popup content
             popup_content = f"""
@@ -144,45 +171,16 @@ class FitnessMapVisualizer:
                 <p><strong>Avg Income:</strong> ${row['weighted_average_income']:.0f}</p>
             """
             
-            if row['website'] and pd.notna(row['website']):
+            if pd.notna(row['website']) and row['website']:
                 popup_content += f'<p><strong>Website:</strong> <a href="{row["website"]}" target="_blank">Visit</a></p>'
             
-            if row['phone_number'] and pd.notna(row['phone_number']):
+            if pd.notna(row['phone_number']) and row['phone_number']:
                 popup_content += f'<p><strong>Phone:</strong> {row["phone_number"]}</p>'
             
             popup_content += "</div>"
             
-            # Create custom pin marker with colored ball
-            # Make BFT pins 50% larger
-            if category == 'BFT':
-                ball_size = 28  # 50% larger than 19px
-                pin_height = 48  # 50% larger than 32px
-                needle_top = 25  # Adjusted for larger ball
-                icon_size = (45, 48)  # 50% larger than (30, 32)
-                icon_anchor = (22, 48)  # Adjusted anchor
-            else:
-                ball_size = 19
-                pin_height = 32
-                needle_top = 17
-                icon_size = (30, 32)
-                icon_anchor = (15, 32)
-            
-            custom_icon_html = f"""
-            <div style="position: relative; width: {icon_size[0]}px; height: {pin_height}px;">
-                <!-- Colored ball on top -->
-                <div style="position: absolute; top: 0; left: 50%; transform: translateX(-50%); 
-                            width: {ball_size}px; height: {ball_size}px; background-color: {color}; 
-                            border-radius: 50%; border: 1px solid white; box-shadow: 0 2px 4px rgba(0,0,0,0.3);">
-                </div>
-                <!-- Needle/pin body -->
-                <div style="position: absolute; top: {needle_top}px; left: 50%; transform: translateX(-50%); 
-                            width: 2px; height: 15px; background-color: #333; 
-                            border-radius: 1px;">
-                </div>
-            </div>
-            """
-            
             # Create custom icon
+            custom_icon_html, icon_size, icon_anchor = self.marker_icon(category)
             custom_icon = folium.DivIcon(
                 html=custom_icon_html,
                 icon_size=icon_size,
@@ -208,99 +206,123 @@ class FitnessMapVisualizer:
         
         return map_obj
     
-    def add_planning_area_income_overlay(self, map_obj: folium.Map) -> folium.Map:
+    def _add_lazy_fitness_locations(self, map_obj: folium.Map, df: pd.DataFrame,
+                                    category_groups: Dict[str, folium.FeatureGroup],
+                                    popup_sidecar: str) -> folium.Map:
+        """
+        Add one compact marker array per category and write popup content to the sidecar
+        """
+        df = df[df['latitude'].notna() & df['longitude'].notna()].reset_index(drop=True)
+        sidecar_bytes = write_popup_sidecar(df, popup_sidecar)
+        LazyPopupLoader(os.path.basename(popup_sidecar)).add_to(map_obj)
+        
+        # Marker ids are row positions in the sidecar columns
+        codes, categories = pd.factorize(df['category'], use_na_sentinel=False)
+        lat = df['latitude'].to_numpy(dtype=float)
+        lng = df['longitude'].to_numpy(dtype=float)
+        for code, category in enumerate(categories):
+            ids = np.flatnonzero(codes == code)
+            icon_html, icon_size, icon_anchor = self.marker_icon(category)
+            if category not in category_groups:
+                category_groups.setdefault('Others', folium.FeatureGroup(name='Others', overlay=True))
+                category = 'Others'
+            LazyMarkerGroup(ids, lat[ids], lng[ids], icon_html, icon_size, icon_anchor).add_to(
+                category_groups[category])
+        
+        for group in category_groups.values():
+            group.add_to(map_obj)
+        
+        print(f"Wrote popup content for {len(df)} locations to {popup_sidecar} ({sidecar_bytes / 1024:.0f} KB)")
+        return map_obj
+    
+    def add_filter_panel(self, map_obj: folium.Map, df: pd.DataFrame) -> folium.Map:
         """
-        Add planning area polygons with income data as overlay
+        Add an in-browser filter and search panel over a compact data bundle
+        
+        Filtering by name, category, planning area, income band and minimum
+        rating happens client-side, so it needs no re-run of the pipeline.
+        """
+        if df.empty:
+            return map_obj
+        
+        # The panel hides the regular markers while a filter is active
+        layer_names = [group.get_name() for group in self.location_groups.values()]
+        FilterSearchPanel(build_search_bundle(df, self.category_colors), layer_names).add_to(map_obj)
+        return map_obj
+    
+    def add_planning_area_income_overlay(self, map_obj: folium.Map, method: str = 'linear',
+                                         classes: Optional[int] = None) -> folium.Map:
         """
-        planning_areas_df, income_df = self.load_planning_areas_and_income()
+        Add planning area polygons with income data as overlay, with a matching legend
         
-        if planning_areas_df is None or planning_areas_df.empty:
+        method is any color_scale method: linear, log, quantile, jenks or manual.
+        """
+        store = get_geo_store()
+        if store.empty:
             print("No planning areas data available")
             return map_obj
         
-        print(f"Loaded {len(planning_areas_df)} planning areas")
-        print(f"Planning areas with income data: {planning_areas_df['weighted_average_income'].notna().sum()}")
-        print(f"Available columns: {planning_areas_df.columns.tolist()}")
+        return IncomeChoroplethLayer(
+            color_scale=gradient_income_scale(method, classes),
+            legend_title='Household Income'
+        ).add_to(map_obj, store)
+    
+    def add_density_grid(self, map_obj: folium.Map, df: pd.DataFrame, resolution_m: float = 1000,
+                         show: bool = False) -> folium.Map:
+        """
+        Add a studio density grid as a single GeoJSON layer
+
+        Locations are binned into square cells first, so the layer size depends
+        on the number of occupied cells rather than the number of studios.
+        """
+        if df.empty:
+            return map_obj
         
-        try:
-            # Create a feature group for planning areas
-            planning_areas_group = folium.FeatureGroup(
-                name='Planning Areas - Household Income',
-                overlay=True,
-                control=True
+        binner = DensityGridBinner()
+        grid = binner.bin_locations(df, resolution_m, binner.load_area_income())
+        if grid.empty:
+            return map_obj
+        
+        # Opacity on a log scale so a few dense cells don't wash out the rest
+        log_counts = np.log1p(grid['total_count'].to_numpy())
+        opacity = 0.15 + 0.65 * log_counts / log_counts.max()
+        income = grid['interpolated_income'].to_numpy()
+        
+        features = [
+            {
+                'type': 'Feature',
+                'geometry': {
+                    'type': 'Polygon',
+                    'coordinates': [[[w, s], [e, s], [e, n], [w, n], [w, s]]]
+                },
+                'properties': {
+                    'studios': int(count),
+                    'income': f"${inc:,.0f}" if not np.isnan(inc) else 'n/a',
+                    'opacity': round(float(op), 3)
+                }
+            }
+            for s, w, n, e, count, inc, op in zip(
+                grid['south'], grid['west'], grid['north'], grid['east'],
+                grid['total_count'], income, opacity
             )
-            
-            # Get income range for color scaling
-            income_values = planning_areas_df['weighted_average_income'].dropna()
-            if income_values.empty:
-                return map_obj
-            
-            min_income = income_values.min()
-            max_income = income_values.max()
-            
-            for idx, row in planning_areas_df.iterrows():
-                if pd.isna(row['weighted_average_income']) or pd.isna(row['polygon_coordinates']):
-                    continue
-                
-                try:
-                    # Parse polygon coordinates
-                    import json
-                    coords_str = row['polygon_coordinates']
-                    if isinstance(coords_str, str):
-                        coords = json.loads(coords_str)
-                    else:
-                        coords = coords_str
-                    
-                    if not coords:
-                        print(f"No coordinates for {row['planning_area_name']}")
-                        continue
-                    
-                    print(f"Processing polygon for {row['planning_area_name']} with {len(coords)} coordinates")
-                    
-                    # Calculate color based on income with better color scheme
-                    income = row['weighted_average_income']
-                    if max_income > min_income:
-                        normalized_income = (income - min_income) / (max_income - min_income)
-                    else:
-                        normalized_income = 0.5
-                    
-                    # Color gradient from blue (low) to red (high) - more intuitive
-                    if normalized_income < 0.5:
-                        # Blue to cyan for lower half
-                        red = int(0)
-                        green = int(255 * (normalized_income * 2))
-                        blue = int(255)
-                    else:
-                        # Cyan to red for upper half
-                        red = int(255 * ((normalized_income - 0.5) * 2))
-                        green = int(255 * (1 - (normalized_income - 0.5) * 2))
-                        blue = int(255 * (1 - (normalized_income - 0.5) * 2))
-                    
-                    color = f'#{red:02x}{green:02x}{blue:02x}'
-                    
-                    # Create polygon
-                    polygon = folium.Polygon(
-                        locations=coords,
-                        popup=f"<b>{row['planning_area_name']}</b><br>Avg Income: ${income:,.0f}",
-                        color=color,
-                        fill=True,
-                        fillColor=color,
-                        fillOpacity=0.7,  # Even higher opacity for testing
-                        weight=3  # Thicker border for testing
-                    )
-                    # Add polygon to feature group only
-                    polygon.add_to(planning_areas_group)
-                    print(f"Added polygon for {row['planning_area_name']} with color {color} and income ${income:,.0f}")
-                    
-                except Exception as e:
-                    print(f"Error processing polygon for {row.get('planning_area_name', 'Unknown')}: {e}")
-                    continue
-            
-            planning_areas_group.add_to(map_obj)
-            print(f"Added planning areas feature group with {len(planning_areas_group._children)} polygons to map")
-            
-        except Exception as e:
-            print(f"Error creating planning areas overlay: {e}")
+        ]
+        
+        folium.GeoJson(
+            {'type': 'FeatureCollection', 'features': features},
+            name=f"Studio Density ({resolution_m:g}m grid)",
+            overlay=True,
+            show=show,
+            style_function=lambda feature: {
+                'fillColor': '#E4572E',
+                'color': '#E4572E',
+                'weight': 0,
+                'fillOpacity': feature['properties']['opacity']
+            },
+            tooltip=folium.GeoJsonTooltip(
+                fields=['studios', 'income'],
+                aliases=['Studios:', 'Interpolated income:']
+            )
+        ).add_to(map_obj)
         
         return map_obj
     
@@ -336,9 +358,11 @@ class FitnessMapVisualizer:
         """
         
         # Basic statistics
-        total_locations = len(df)
-        avg_rating = df['rating'].mean()
-        categories = df['category'].value_counts()
+        cube = get_aggregate_cube(df)
+        overall = cube.overall()
+        total_locations = overall['total_locations']
+        avg_rating = overall['average_rating']
+        categories = cube.category_totals()['location_count']
         
         stats_html += f"<p><strong>Total Locations:</strong> {total_locations}</p>"
         stats_html += f"<p><strong>Average Rating:</strong> {avg_rating:.1f} ⭐</p>"
@@ -360,10 +384,9 @@ class FitnessMapVisualizer:
         """
         
         # Get actual categories from data and their colors
-        category_counts = df['category'].value_counts()
-        for category in category_counts.index:
+        for category, count in categories.items():
             color = self.category_colors.get(category, '#F7DC6F')  # Default to light yellow if not found
-            stats_html += f'<li><span style="color: {color}; font-size: 24px;">●</span> {category} ({category_counts[category]} locations)</li>'
+            stats_html += f'<li><span style="color: {color}; font-size: 24px;">●</span> {category} ({count} locations)</li>'
         
         stats_html += """
         </ul>
@@ -386,9 +409,13 @@ class FitnessMapVisualizer:
         
         return stats_html
     
-    def create_visualization(self, output_file: str = "singapore_fitness_map.html") -> str:
+    def create_visualization(self, output_file: str = "singapore_fitness_map.html",
+                             density_resolution_m: Optional[float] = 1000, lazy_popups: bool = False) -> str:
         """
         Create the complete visualization
+        
+        lazy_popups keeps popup content out of the page and in a sidecar file
+        next to it, loaded on the first click.
         """
         print("Creating Singapore fitness map visualization...")
         
@@ -399,11 +426,28 @@ class FitnessMapVisualizer:
             print("No data available for visualization!")
             return ""
         
+        return self.render_map(df, output_file, density_resolution_m, lazy_popups)
+    
+    def render_map(self, df: pd.DataFrame, output_file: str,
+                   density_resolution_m: Optional[float] = 1000, lazy_popups: bool = False,
+                   filter_panel: bool = True) -> str:
+        """
+        Build the full map for an already loaded (possibly filtered) dataset and save it
+        """
         # Create base map
         map_obj = self.create_base_map()
         
         # Add fitness locations
-        map_obj = self.add_fitness_locations(map_obj, df)
+        popup_sidecar = popup_sidecar_path(output_file) if lazy_popups else None
+        map_obj = self.add_fitness_locations(map_obj, df, popup_sidecar)
+        
+        # Add density grid layer (hidden by default, toggle in layer control)
+        if density_resolution_m:
+            map_obj = self.add_density_grid(map_obj, df, density_resolution_m)
+        
+        # Add the client-side filter and search panel
+        if filter_panel:
+            map_obj = self.add_filter_panel(map_obj, df)
         
         # Add layer control - this must be added after all layers
         folium.LayerControl(
@@ -412,137 +456,51 @@ class FitnessMapVisualizer:
             overlay=True
         ).add_to(map_obj)
         
-        # Create statistics panel
+        # Add statistics panel to the page before rendering, so the file is written once
         stats_panel = self.create_statistics_panel(df)
+        if stats_panel:
+            map_obj.get_root().html.add_child(folium.Element(stats_panel))
         
         # Save the map
         map_obj.save(output_file)
         
-        # Add statistics panel to the HTML file
-        with open(output_file, 'r', encoding='utf-8') as f:
-            html_content = f.read()
-        
-        # Insert statistics panel before closing body tag
-        if stats_panel:
-            html_content = html_content.replace('</body>', f'{stats_panel}\n</body>')
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
         print(f"Map saved to {output_file}")
         return output_file
     
-    def create_category_analysis_chart(self, df: pd.DataFrame) -> str:
+    def create_tiled_visualization(self, output_dir: str = "map_tiles", min_zoom: int = 10,
+                                   max_zoom: int = 16) -> str:
         """
-        Create a separate HTML file with category analysis charts
+        Export the map as a static z/x/y tile pyramid plus a small HTML shell
+        
+        Unlike create_visualization, the shell only loads the tiles in view, so
+        its load time does not grow with the dataset.
         """
+        print("Creating tiled Singapore fitness map...")
+        
+        df = self.load_data()
         if df.empty:
+            print("No data available for visualization!")
             return ""
         
-        # Create category analysis
-        category_stats = df.groupby('category').agg({
-            'rating': ['mean', 'count'],
-            'weighted_average_income': 'mean',
-            'user_ratings_total': 'sum'
-        }).round(2)
-        
-        # Flatten column names
-        category_stats.columns = ['avg_rating', 'count', 'avg_income', 'total_reviews']
-        category_stats = category_stats.reset_index()
-        
-        # Create HTML report
-        html_content = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Singapore Fitness Studios Analysis</title>
-            <style>
-                body { font-family: Arial, sans-serif; margin: 20px; }
-                table { border-collapse: collapse; width: 100%; margin: 20px 0; }
-                th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
-                th { background-color: #f2f2f2; }
-                .highlight { background-color: #e6f3ff; }
-            </style>
-        </head>
-        <body>
-            <h1>Singapore Fitness Studios Analysis</h1>
-        """
-        
-        # Summary statistics
-        html_content += f"""
-        <h2>Summary Statistics</h2>
-        <p><strong>Total Locations:</strong> {len(df)}</p>
-        <p><strong>Average Rating:</strong> {df['rating'].mean():.2f} ⭐</p>
-        <p><strong>Average Household Income:</strong> ${df['weighted_average_income'].mean():.0f}</p>
-        """
-        
-        # Category breakdown table
-        html_content += """
-        <h2>Category Breakdown</h2>
-        <table>
-            <tr>
-                <th>Category</th>
-                <th>Count</th>
-                <th>Percentage</th>
-                <th>Avg Rating</th>
-                <th>Avg Income</th>
-                <th>Total Reviews</th>
-            </tr>
-        """
-        
-        for _, row in category_stats.iterrows():
-            percentage = (row['count'] / len(df)) * 100
-            html_content += f"""
-            <tr>
-                <td>{row['category']}</td>
-                <td>{row['count']}</td>
-                <td>{percentage:.1f}%</td>
-                <td>{row['avg_rating']:.1f} ⭐</td>
-                <td>${row['avg_income']:.0f}</td>
-                <td>{row['total_reviews']}</td>
-            </tr>
-            """
+        planning_areas_df, _ = self.load_planning_areas_and_income()
         
-        html_content += "</table>"
-        
-        # Top rated locations
-        top_rated = df.nlargest(10, 'rating')[['name', 'category', 'rating', 'planning_area', 'weighted_average_income']]
-        
-        html_content += """
-        <h2>Top 10 Rated Locations</h2>
-        <table>
-            <tr>
-                <th>Rank</th>
-                <th>Name</th>
-                <th>Category</th>
-                <th>Rating</th>
-                <th>Planning Area</th>
-                <th>Avg Income</th>
-            </tr>
-        """
-        
-        for i, (_, row) in enumerate(top_rated.iterrows(), 1):
-            html_content += f"""
-            <tr class="highlight">
-                <td>{i}</td>
-                <td>{row['name']}</td>
-                <td>{row['category']}</td>
-                <td>{row['rating']:.1f} ⭐</td>
-                <td>{row['planning_area']}</td>
-                <td>${row['weighted_average_income']:.0f}</td>
-            </tr>
-            """
-        
-        html_content += "</table></body></html>"
-        
-        # Save analysis file
-        analysis_file = "fitness_analysis_report.html"
-        with open(analysis_file, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+        exporter = MapTileExporter(output_dir, min_zoom, max_zoom, self.category_colors)
+        return exporter.export(
+            df,
+            planning_areas_df,
+            center=self.singapore_center,
+            stats_panel=self.create_statistics_panel(df)
+        )
+    
+    def create_category_analysis_chart(self, df: pd.DataFrame,
+                                       output_file: str = "fitness_analysis_report.html") -> str:
+        """
+        Create the HTML analysis report with per-category, per-area and income band pages
+        """
+        if df.empty:
+            return ""
         
-        print(f"Analysis report saved to {analysis_file}")
-        return analysis_file
-
+        return AnalysisReportGenerator(output_file).generate(df)
 
 
 def main():